@@ -0,0 +1,48 @@
+"""
+Walk-forward backtest of the FDS model: train on the days before each test day,
+score that day, report daily top-k precision / AUC / calibration.
+
+    python -m scripts.backtest                         # expanding window, all cores
+    python -m scripts.backtest --train-days 7 --workers 2
+    python -m scripts.backtest --exclude ""            # keep the outcome/label features (they see the test day)
+
+Writes backtest_daily.csv, backtest_calibration.csv and backtest_predictions.csv to artifacts/outputs.
+"""
+import argparse
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from src import train, backtest, pipeline
+from src.config import OUTPUTS, BACKTEST_MIN_TRAIN_DAYS, BACKTEST_TOP_K
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--min-train-days", type=int, default=BACKTEST_MIN_TRAIN_DAYS)
+    ap.add_argument("--train-days", type=int, default=None, help="sliding window length (default: expanding)")
+    ap.add_argument("--top-k", type=int, default=BACKTEST_TOP_K)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--saved-features", action="store_true", help="use the saved model's (pruned) feature list")
+    ap.add_argument("--exclude", default=None,
+                    help="comma-separated features to leave out (default: features.leaky_features - actual_*, "
+                         "the medians/rates built from outcomes and `difficult`)")
+    a = ap.parse_args(argv)
+
+    cols = train.saved_feature_cols() if a.saved_features else None
+    daily, calib, preds = backtest.walk_forward(
+        pipeline.load_frame(), feature_cols=cols, min_train_days=a.min_train_days, train_days=a.train_days,
+        top_k=a.top_k, n_workers=a.workers,
+        exclude=None if a.exclude is None else [c for c in a.exclude.split(",") if c])
+
+    OUTPUTS.mkdir(parents=True, exist_ok=True)
+    daily.to_csv(OUTPUTS / "backtest_daily.csv", index=False)
+    calib.to_csv(OUTPUTS / "backtest_calibration.csv", index=False)
+    preds.to_csv(OUTPUTS / "backtest_predictions.csv", index=False)
+    overall = backtest.day_metrics(preds["difficult"].to_numpy(), preds["fds"].to_numpy() / 100.0, a.top_k)
+    print(f"{len(daily)} test days; mean top-{a.top_k} precision {daily[f'top{a.top_k}_precision'].mean():.3f}, "
+          f"pooled AUC {overall['auc']:.3f}, Brier {overall['brier']:.4f}, ECE {overall['ece']:.4f}")
+    print(f"Wrote {OUTPUTS / 'backtest_daily.csv'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Ingest validation overhead: time the CSV read (Arrow read + pandas conversion,
+as load_all does it) against the validate.py pass on the Arrow table, on the
+Flight Level file tiled to --rows rows (keys made unique per copy):
+  checks  - the rules, first load of a file (no cached rule hits)
+  cached  - the rules, repeat load of the unchanged file (validate.cached_rules)
+  apply   - dropping / blanking rows and writing the quarantine file; scales
+            with the violations found, not with the rules
+
+    python -m scripts.bench_validate --rows 1000000
+"""
+import argparse, tempfile, time
+import pandas as pd
+import numpy as np
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from src import load, validate
+from src.config import FLIGHT_FILE
+
+
+def _best(fn, repeat: int):
+    """(best seconds, last result) of `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - t)
+    return min(times), out
+
+
+def main(rows: int = 1_000_000, repeat: int = 3):
+    base = load._read_csv(FLIGHT_FILE)
+    reps = int(np.ceil(rows / len(base)))
+    big = pd.concat([base] * reps, ignore_index=True).iloc[:rows]
+    big["flight_number"] = big["flight_number"].astype(str) + "_" + (np.arange(rows) // len(base)).astype(str)
+    for c in validate.TIME_COLS:  # written back in the source layout
+        big[c] = big[c].dt.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        path = tmp / "flights.csv"
+        big.to_csv(path, index=False)
+        del big
+        # best of `repeat` everywhere, so page cache and warm-up hit all of them alike
+        table = load.read_table(path)
+        t_read, _ = _best(lambda: load._to_frame(load.read_table(path), path), repeat)
+        t_check, rules = _best(lambda: validate.check_flights(table), repeat)
+        validate.cached_rules(table, validate.check_flights, "flights", path, cache_dir=tmp / "cache")
+        t_cached, (cached, hit) = _best(
+            lambda: validate.cached_rules(table, validate.check_flights, "flights", path, cache_dir=tmp / "cache"),
+            repeat)
+        t_apply, (_, summary) = _best(
+            lambda: validate.apply_rules(table, rules, "flights", quarantine=tmp / "quarantine"), repeat)
+        t_reapply, _ = _best(
+            lambda: validate.apply_rules(table, cached, "flights", quarantine=tmp / "quarantine", write=False), repeat)
+    assert hit and [r[:3] for r in cached] == [r[:3] for r in rules]
+
+    print(f"{table.num_rows:,} rows: read {t_read:.2f}s")
+    for label, t_rules, t_act in [("first load", t_check, t_apply), ("repeat load", t_cached, t_reapply)]:
+        t = t_rules + t_act
+        print(f"  {label:12s} rules {1000 * t_rules:6.1f} ms + apply {1000 * t_act:6.1f} ms = {1000 * t:6.1f} ms "
+              f"({100 * t_rules / t_read:4.1f}% + {100 * t_act / t_read:4.1f}% = {100 * t / t_read:4.1f}% of the read)")
+    for r in summary[summary["violations"] > 0].itertuples():
+        print(f"  {r.rule:55s} {r.violations:>9,} ({r.action})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    main(**vars(ap.parse_args()))
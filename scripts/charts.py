@@ -1,125 +1,172 @@
+"""
+Chart pipeline: every figure declares a small summary (a few rows computed from
+the scored frame, written by score_and_write; see src/summaries.py) and a
+renderer that only sees that summary. Renders run in a
+process pool on the Agg backend and are skipped when the summary hash (plus the
+renderer's source) matches the last render recorded in artifacts/cache/chart_manifest.json.
+
+    python -m scripts.charts            # only changed figures
+    python -m scripts.charts --force    # redraw everything
+"""
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import hashlib, inspect, json, os
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 import sys, pathlib
 sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
 
 
-from src import load, features, labeler
-from src.config import OUTPUTS
+from src import load, features, labeler, summaries
+from src.config import OUTPUTS, CACHE
 
 FIGDIR = OUTPUTS.parent / "figures"
 FIGDIR.mkdir(parents=True, exist_ok=True)
+MANIFEST = CACHE / "chart_manifest.json"  # untracked, unlike the figures
+
+
+def _plt():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
 
-def savefig(name):
+def savefig(plt, name):
     plt.tight_layout()
     out = FIGDIR / name
     plt.savefig(out, dpi=160, bbox_inches="tight")
     plt.close()
-    print("Saved", out)
+    return out
 
-def main():
+
+# ---------- summaries (small frames; None = figure not applicable) ----------
+def _summaries():
+    """The summaries score_and_write saved; rebuild the feature frame only when scoring never ran."""
+    saved = summaries.load()
+    if saved is not None:
+        return saved
     flights, pnrfl, bags = load.load_all()
     df = features.merge_all(flights, pnrfl, bags)
     df = labeler.add_difficulty_label(df)
     df = features.add_airport_equipment_flags(df)
-    df = features.add_airport_route_rollups(df)
-    dd = pd.to_numeric(df.get("actual_departure_delay_minutes"), errors="coerce")
-    avg_delay = float(dd.mean()) if dd.notna().any() else np.nan
-    pct_late = float((dd > 0).mean() * 100.0) if dd.notna().any() else np.nan
-
-    plt.figure(figsize=(4.5,3.2))
-    xs = ["Avg dep delay (min)", "% flights late"]
-    ys = [avg_delay, pct_late]
-    plt.bar(xs, ys)
-    plt.title("Delays summary")
-    savefig("eda_delay_summary.png")
-    if "turn_slack" in df.columns:
-        ts = pd.to_numeric(df["turn_slack"], errors="coerce").dropna()
-        if len(ts) > 0:
-            plt.figure(figsize=(5,3.2))
-            plt.hist(ts, bins=40)
-            plt.title("Turn slack (planned - typical minutes)")
-            plt.xlabel("Minutes")
-            plt.ylabel("Flights")
-            savefig("turn_slack_hist.png")
-
-            lt0 = int((ts < 0).sum())
-            le5 = int((ts <= 5).sum())
-            plt.figure(figsize=(4.5,3.2))
-            plt.bar(["< 0", "≤ 5"], [lt0, le5])
-            plt.title("Flights with tight turns")
-            savefig("turn_slack_counts.png")
-
-    if "transfer_checked_ratio" in df.columns:
-        tcr = (df
-               .assign(route=df["scheduled_departure_airport_code"]+"→"+df["scheduled_arrival_airport_code"])
-               .groupby("route")["transfer_checked_ratio"].median().dropna()
-               .sort_values(ascending=False).head(10))
-        if not tcr.empty:
-            plt.figure(figsize=(7,4))
-            tcr.sort_values().plot(kind="barh")
-            plt.xlabel("Median transfer/checked ratio")
-            plt.title("Routes with highest transfer bag pressure (median)")
-            savefig("bags_route_transfer_ratio_top10.png")
-
-    if {"pnr_rows","difficult"}.issubset(df.columns) and df["pnr_rows"].notna().any():
-        tmp = df.copy()
-        tmp = tmp[pd.to_numeric(tmp["pnr_rows"], errors="coerce").notna()]
-        if len(tmp) > 0:
-            tmp["load_bin"] = pd.qcut(tmp["pnr_rows"].astype(float), q=min(8, tmp["pnr_rows"].nunique()), duplicates="drop")
-            by = tmp.groupby("load_bin").agg(mean_diff=("difficult","mean"),
-                                             mean_load=("pnr_rows","mean")).reset_index()
-            plt.figure(figsize=(5.5,3.2))
-            plt.plot(by["mean_load"], by["mean_diff"], marker="o")
-            plt.xlabel("Avg passengers (bin)")
-            plt.ylabel("Share difficult")
-            plt.title("Passenger load vs. difficulty (binned)")
-            savefig("load_vs_difficult.png")
-
-    if {"ssr_wch","pnr_rows","difficult"}.issubset(df.columns):
-        tmp = df.copy()
-        tmp["ssr_dense"] = (pd.to_numeric(tmp["ssr_wch"], errors="coerce")
-                            / tmp["pnr_rows"].replace(0, np.nan)).fillna(0)
-        tmp = tmp[tmp["pnr_rows"].notna()]
-        if len(tmp) > 0:
-            tmp["load_bin"] = pd.qcut(tmp["pnr_rows"].astype(float), q=min(5, tmp["pnr_rows"].nunique()), duplicates="drop")
-            g = (tmp.groupby("load_bin").agg(mean_ssr=("ssr_dense","mean"),
-                                             mean_diff=("difficult","mean")))
-            plt.figure(figsize=(5.5,3.2))
-            plt.plot(g["mean_ssr"], g["mean_diff"], marker="o")
-            plt.xlabel("SSR density (per PNR row)")
-            plt.ylabel("Share difficult")
-            plt.title("SSR vs difficulty (controls for load)")
-            savefig("ssr_vs_difficult_by_load.png")
+    return summaries.compute(features.add_airport_route_rollups(df))
+
+def sum_importance(fi):
+    if fi is None or fi.empty or "importance_gain" not in fi.columns:
+        return None
+    return fi.sort_values("importance_gain", ascending=False).head(15)[["feature", "importance_gain"]]
+
+
+# ---------- renderers (run in worker processes; see only the summary) ----------
+def draw_bar(s, name, title, figsize=(4.5,3.2)):
+    plt = _plt()
+    plt.figure(figsize=figsize)
+    plt.bar(s["x"], s["y"])
+    plt.title(title)
+    return savefig(plt, name)
+
+def draw_hist(s, name, title, xlabel, figsize):
+    plt = _plt()
+    plt.figure(figsize=figsize)
+    plt.bar(s["left"], s["count"], width=s["width"], align="edge")
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel("Flights")
+    return savefig(plt, name)
+
+def draw_transfer(s, name):
+    plt = _plt()
+    plt.figure(figsize=(7,4))
+    plt.barh(s["route"], s["ratio"])
+    plt.xlabel("Median transfer/checked ratio")
+    plt.title("Routes with highest transfer bag pressure (median)")
+    return savefig(plt, name)
+
+def draw_line(s, name, x, y, xlabel, title):
+    plt = _plt()
+    plt.figure(figsize=(5.5,3.2))
+    plt.plot(s[x], s[y], marker="o")
+    plt.xlabel(xlabel)
+    plt.ylabel("Share difficult")
+    plt.title(title)
+    return savefig(plt, name)
 
+def draw_importance(s, name):
+    plt = _plt()
+    plt.figure(figsize=(7,4))
+    plt.barh(s["feature"][::-1], s["importance_gain"][::-1])
+    plt.title("Feature importance (top 15)")
+    return savefig(plt, name)
+
+def draw_buckets(s, name):
+    plt = _plt()
+    plt.figure(figsize=(5,3.2))
+    s.set_index(s.columns[0])["count"].plot(kind="bar")
+    plt.title("FDS buckets")
+    return savefig(plt, name)
+
+
+# name -> (renderer, extra renderer kwargs); summaries come from src/summaries.py
+CHARTS = {
+    "eda_delay_summary.png": (draw_bar, {"title": "Delays summary"}),
+    "turn_slack_hist.png": (draw_hist, {"title": "Turn slack (planned - typical minutes)",
+                                        "xlabel": "Minutes", "figsize": (5,3.2)}),
+    "turn_slack_counts.png": (draw_bar, {"title": "Flights with tight turns"}),
+    "bags_route_transfer_ratio_top10.png": (draw_transfer, {}),
+    "load_vs_difficult.png": (draw_line, {"x": "mean_load", "y": "mean_diff",
+                                          "xlabel": "Avg passengers (bin)",
+                                          "title": "Passenger load vs. difficulty (binned)"}),
+    "ssr_vs_difficult_by_load.png": (draw_line, {"x": "mean_ssr", "y": "mean_diff",
+                                                 "xlabel": "SSR density (per PNR row)",
+                                                 "title": "SSR vs difficulty (controls for load)"}),
+    "feature_importance_top15.png": (draw_importance, {}),
+    "fds_distribution.png": (draw_hist, {"title": "Flight Difficulty Score distribution",
+                                         "xlabel": "FDS (0–100)", "figsize": (6,3.2)}),
+    "fds_buckets.png": (draw_buckets, {}),
+}
+
+
+def _hash(summary: pd.DataFrame, draw, kw) -> str:
+    h = hashlib.sha1()
+    h.update(pd.util.hash_pandas_object(summary, index=True).to_numpy().tobytes())
+    h.update(",".join(map(str, summary.columns)).encode())
+    h.update(inspect.getsource(draw).encode())
+    h.update(repr(sorted(kw.items())).encode())
+    return h.hexdigest()
+
+def _render(job):
+    name, draw, summary, kw = job
+    return draw(summary, name, **kw)
+
+def main(force: bool = False, n_jobs: int | None = None):
+    sums = _summaries()
     fi_path = OUTPUTS / "feature_importance.csv"
-    if fi_path.exists():
-        fi = pd.read_csv(fi_path)
-        if not fi.empty and "importance_gain" in fi.columns:
-            top = fi.sort_values("importance_gain", ascending=False).head(15)
-            plt.figure(figsize=(7,4))
-            plt.barh(top["feature"][::-1], top["importance_gain"][::-1])
-            plt.title("Feature importance (top 15)")
-            savefig("feature_importance_top15.png")
-
-    fs_path = OUTPUTS / "flight_scores.csv"
-    if fs_path.exists():
-        fs = pd.read_csv(fs_path)
-        if "fds" in fs.columns:
-            plt.figure(figsize=(6,3.2))
-            plt.hist(fs["fds"].dropna(), bins=30)
-            plt.title("Flight Difficulty Score distribution")
-            plt.xlabel("FDS (0–100)")
-            plt.ylabel("Flights")
-            savefig("fds_distribution.png")
-        if "fds_bucket" in fs.columns:
-            counts = fs["fds_bucket"].value_counts().reindex(["Easy","Medium","Difficult"])
-            plt.figure(figsize=(5,3.2))
-            counts.plot(kind="bar")
-            plt.title("FDS buckets")
-            savefig("fds_buckets.png")
+    sums["feature_importance_top15.png"] = sum_importance(pd.read_csv(fi_path) if fi_path.exists() else None)
+
+    manifest = json.loads(MANIFEST.read_text(encoding="utf-8")) if MANIFEST.exists() else {}
+    jobs, hashes = [], {}
+    for name, (draw, kw) in CHARTS.items():
+        summary = sums.get(name)
+        if summary is None:
+            continue
+        hashes[name] = _hash(summary, draw, kw)
+        if not force and manifest.get(name) == hashes[name] and (FIGDIR / name).exists():
+            print("Unchanged", FIGDIR / name)
+            continue
+        jobs.append((name, draw, summary, kw))
+
+    if jobs:
+        workers = min(len(jobs), n_jobs or os.cpu_count() or 1)
+        if workers > 1:
+            with ProcessPoolExecutor(workers) as ex:
+                outs = list(ex.map(_render, jobs))
+        else:
+            outs = [_render(j) for j in jobs]
+        for out in outs:
+            print("Saved", out)
+
+    manifest.update(hashes)
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
 
 if __name__ == "__main__":
-    main()
+    main(force="--force" in sys.argv)
@@ -0,0 +1,74 @@
+"""
+Live ops feed on top of the last batch (flight_scores.csv + saved model):
+actual departure/arrival events update labels and rollups, later flights at
+the affected stations/hours are re-scored, artifacts/outputs/live_scores.csv
+is rewritten as the view.
+
+    python -m scripts.live_feed --replay 2025-08-15 --write-events events.jsonl   # stand-in feed from history
+    python -m scripts.live_feed --replay 2025-08-15 --events events.jsonl --rate 50
+    python -m scripts.live_feed --events events.jsonl --follow                    # tail a file
+    python -m scripts.live_feed --port 8765                                       # JSON lines over TCP
+
+--replay starts the day blank (its actuals cleared, labels 0) so replayed events rebuild it.
+"""
+import argparse, asyncio, json
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from src import score, live, scenarios
+from src.config import LIVE_QUEUE_MAX, LIVE_PORT
+
+
+def _print_batch(info):
+    print(f"batch: {info['events']} events, {info['rescored']} flights re-scored, "
+          f"latency {info['latency_s']:.2f}s")
+
+
+async def run(scorer, a):
+    queue = asyncio.Queue(maxsize=LIVE_QUEUE_MAX)
+    if a.port:
+        feed = asyncio.create_task(live.socket_feed(queue, port=a.port))
+        print(f"listening on 127.0.0.1:{a.port} (Ctrl+C to stop)")
+    else:
+        feed = asyncio.create_task(live.file_feed(a.events, queue, follow=a.follow, rate=a.rate))
+    stats = await scorer.consume(queue, on_batch=_print_batch)
+    await feed
+    return stats
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", default=None, help="JSON-lines event file")
+    ap.add_argument("--follow", action="store_true", help="keep tailing --events")
+    ap.add_argument("--rate", type=float, default=None, help="events per second read from --events")
+    ap.add_argument("--port", type=int, nargs="?", const=LIVE_PORT, default=None)
+    ap.add_argument("--replay", default=None, help="day to blank and rebuild from events (YYYY-MM-DD)")
+    ap.add_argument("--write-events", default=None, help="with --replay: write that day's events and exit")
+    a = ap.parse_args(argv)
+
+    frame = scenarios.load_frame()
+    if a.replay and a.write_events:
+        with open(a.write_events, "w", encoding="utf-8") as f:
+            for ev in live.replay_events(frame, a.replay):
+                f.write(json.dumps(ev) + "\n")
+        print(f"Wrote {a.write_events}")
+        return
+    if not (a.events or a.port):
+        ap.error("give --events FILE or --port")
+
+    try:  # the compiled copy, or the segment router after run_all --segmented (as batch scoring)
+        model, feature_cols = score.load_saved_scorer()
+    except FileNotFoundError as e:
+        raise SystemExit(f"{e}.")
+    scorer = live.LiveScorer(live.blank_day(frame, a.replay) if a.replay else frame, model, feature_cols)
+    try:
+        stats = asyncio.run(run(scorer, a))
+    except KeyboardInterrupt:
+        scorer.publish()
+        stats = scorer.stats
+    print(f"{stats['events']} events ({stats['unmatched']} unmatched), {stats['labels_changed']} labels changed, "
+          f"{stats['rows_rescored']} re-scores in {stats['batches']} batches -> {live.VIEW_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
-from src.config import OUTPUTS
+from src.config import OUTPUTS, BOOT_ALPHA, BOOT_TOP_N
+from src.drivers import destination_drivers, KEY_COLS
+from src.cube import FdsCube
+from src.bootstrap import consistency_intervals
 
 OUT = OUTPUTS
 FIG = OUT.parent / "figures"
-OUT.mkdir(parents=True, exist_ok=True)
-FIG.mkdir(parents=True, exist_ok=True)
 
 
 def _to_num(s):
@@ -39,6 +40,8 @@ def _ensure_cols(df):
     df["dep_date"] = dt.dt.date
     df["dep_month"] = dt.dt.to_period("M").astype(str)
     return df
+
+
 def _corr(a, b):
     a = _to_num(a)
     b = _to_num(b)
@@ -49,124 +52,24 @@ def _corr(a, b):
     return a.corr(b, method="spearman")
 
 
-fs_path = OUT / "flight_scores.csv"
-assert fs_path.exists(), f"Missing: {fs_path}. Run scripts/run_all.py first."
-
-df = pd.read_csv(
-    fs_path,
-    low_memory=False,
-    parse_dates=[
-        "scheduled_departure_datetime_local",
-        "scheduled_arrival_datetime_local",
-    ],
-    infer_datetime_format=True,
-)
-df = _ensure_cols(df)
-
-by_mo = (
-    df.groupby(["arr_ap", "dep_month"], dropna=False)
-    .agg(
-        flights=("flight_number", "count"),
-        pct_difficult=("difficult", "mean"),
-        mean_fds=("fds", "mean"),
-    )
-    .reset_index()
-)
-g = (
-    by_mo.groupby("arr_ap", dropna=False)
-    .agg(
-        flights=("flights", "sum"),
-        mean_fds=("mean_fds", "mean"),
-        pct_difficult=("pct_difficult", "mean"),
-        mo_count=("dep_month", "nunique"),
-        fds_cv=(
-            "mean_fds",
-            lambda x: (
-                float(np.std(x, ddof=0) / (np.mean(x) + 1e-6)) if len(x) > 1 else np.nan
-            ),
-        ),
-        diff_cv=(
-            "pct_difficult",
-            lambda x: (
-                float(np.std(x, ddof=0) / (np.mean(x) + 1e-6)) if len(x) > 1 else np.nan
-            ),
-        ),
-    )
-    .reset_index()
-)
-g["consistency_score"] = (g["pct_difficult"].fillna(0)) * (
-    1 - g["diff_cv"].fillna(0).clip(lower=0, upper=1)
-)
-g = g.sort_values(
-    ["consistency_score", "pct_difficult", "flights"], ascending=[False, False, False]
-)
-
-g.to_csv(OUT / "destination_consistency.csv", index=False)
-
-top = g.head(15).sort_values("pct_difficult")
-plt.figure(figsize=(7, 4))
-plt.barh(top["arr_ap"], top["pct_difficult"] * 100.0)
-plt.xlabel("% of flights Difficult")
-plt.title("Destinations with consistently higher difficulty")
-plt.tight_layout()
-plt.savefig(FIG / "top_difficult_destinations.png", dpi=160)
-plt.close()
-
-
-candidate_drivers = [
-    "turn_slack",
-    "dep_delay_rate_roll28",
-    "arr_delay_rate_roll28",
-    "route_delay_rate_roll28",
-    "route_cxl_rate_roll28",
-    "taxi_out_delta",
-    "arrivals_same_hour",
-    "ssr_rate",
-    "transfer_checked_ratio",
-    "special_bag_ratio",
-    "is_peak_season",
-    "red_eye",
-    "bank_window",
-    "dep_hub_flag",
-    "arr_hub_flag",
-    "type_diff_rate",
-    "total_seats",
-]
-present = [c for c in candidate_drivers if c in df.columns]
-drv_rows = []
-
-focus_aps = g.head(20)["arr_ap"].tolist()
-for ap in focus_aps:
-    sub = df[df["arr_ap"] == ap]
-    for feat in present:
-        val = _corr(sub[feat], sub["difficult"])
-        drv_rows.append({"arr_ap": ap, "feature": feat, "spearman_with_difficult": val})
-
-drivers = (
-    pd.DataFrame(drv_rows)
-    .dropna()
-    .sort_values(["arr_ap", "spearman_with_difficult"], ascending=[True, False])
-)
-drivers.to_csv(OUT / "destination_drivers.csv", index=False)
-
-try:
-    topA = g.head(10)["arr_ap"].tolist()
-    piv = drivers[drivers["arr_ap"].isin(topA)].pivot_table(
-        index="arr_ap", columns="feature", values="spearman_with_difficult"
-    )
-    if not piv.empty:
-        plt.figure(figsize=(min(10, 1.2 + 0.6 * len(present)), 0.7 + 0.5 * len(topA)))
-        im = plt.imshow(piv.fillna(0).to_numpy(), aspect="auto")
-        plt.colorbar(im, fraction=0.046, pad=0.04)
-        plt.yticks(range(len(piv.index)), piv.index)
-        plt.xticks(range(len(piv.columns)), piv.columns, rotation=60, ha="right")
-        plt.title("Driver strength (Spearman corr with Difficult)")
-        plt.tight_layout()
-        plt.savefig(FIG / "driver_heatmap.png", dpi=160)
-        plt.close()
-except Exception:
-    pass
-def reco_lines():
+def destination_consistency(df):
+    """
+    Destination x month consistency ranking of the scored flights in df with
+    bootstrap intervals (src/bootstrap.py). Points come from the saved cube's
+    partitions of df's days, so points and intervals cover the same flights;
+    df is aggregated directly if the saved cube lacks any of those days.
+    """
+    days = set(df["dep_date"].dropna().astype(str))
+    cube = FdsCube.load(days=days)
+    if cube.days != days:
+        cube = FdsCube.from_scores(df)
+    g = cube.consistency("arr_ap", "dep_month")
+    ci = consistency_intervals(df, "arr_ap", "dep_month")
+    return g.merge(ci[["arr_ap", "pct_difficult_lo", "pct_difficult_hi", "consistency_lo", "consistency_hi",
+                       "rank_lo", "rank_hi", f"top{BOOT_TOP_N}_share"]], on="arr_ap", how="left")
+
+
+def reco_lines(g, drivers, shap_dest, top_flights):
     yield "# Operational Recommendations\n"
     yield "These are mapped from statistical drivers to concrete actions.\n\n"
     mapping = [
@@ -224,18 +127,134 @@ def reco_lines():
         yield f"- **{feat}** → {action}\n"
     yield "\n## Destination-specific priorities (top 10)\n"
     for ap in g.head(10)["arr_ap"]:
-        topdrv = (
-            drivers[drivers["arr_ap"] == ap]
-            .sort_values("spearman_with_difficult", ascending=False)
-            .head(3)["feature"]
-            .tolist()
-        )
+        if shap_dest is not None and (shap_dest["arr_ap"] == ap).any():
+            topdrv = shap_dest.loc[shap_dest["arr_ap"] == ap, "feature"].tolist()
+        else:
+            topdrv = (
+                drivers[drivers["arr_ap"] == ap]
+                .sort_values("spearman_with_difficult", ascending=False)
+                .head(3)["feature"]
+                .tolist()
+            )
         yield f"- **{ap}**: focus on {', '.join(topdrv)}\n"
+    if top_flights is not None and not top_flights.empty:
+        yield "\n## Flight-level drivers (highest FDS)\n"
+        for _, r in top_flights.iterrows():
+            drv = ", ".join(str(r[f"driver_{i}"]) for i in (1, 2, 3) if pd.notna(r[f"driver_{i}"]))
+            yield (f"- **{r['company_id']}{r['flight_number']}** "
+                   f"{r['scheduled_departure_airport_code']}→{r['arr_ap']} "
+                   f"{r['scheduled_departure_datetime_local']:%Y-%m-%d %H:%M} "
+                   f"(FDS {r['fds']:.0f}): {drv}\n")
+
+
+def main():
+    OUT.mkdir(parents=True, exist_ok=True)
+    FIG.mkdir(parents=True, exist_ok=True)
+    fs_path = OUT / "flight_scores.csv"
+    assert fs_path.exists(), f"Missing: {fs_path}. Run scripts/run_all.py first."
+
+    df = pd.read_csv(
+        fs_path,
+        low_memory=False,
+        parse_dates=[
+            "scheduled_departure_datetime_local",
+            "scheduled_arrival_datetime_local",
+        ],
+    )
+    df = _ensure_cols(df)
+
+    g = destination_consistency(df)
+    g.to_csv(OUT / "destination_consistency.csv", index=False)
+
+    top = g.head(15).sort_values("pct_difficult")
+    plt.figure(figsize=(7, 4))
+    err = np.vstack([top["pct_difficult"] - top["pct_difficult_lo"], top["pct_difficult_hi"] - top["pct_difficult"]])
+    plt.barh(top["arr_ap"], top["pct_difficult"] * 100.0, xerr=np.nan_to_num(err.clip(min=0)) * 100.0, capsize=2)
+    plt.xlabel(f"% of flights Difficult ({100 * (1 - BOOT_ALPHA):.0f}% bootstrap interval)")
+    plt.title("Destinations with consistently higher difficulty")
+    plt.tight_layout()
+    plt.savefig(FIG / "top_difficult_destinations.png", dpi=160)
+    plt.close()
+
+    candidate_drivers = [
+        "turn_slack",
+        "dep_delay_rate_roll28",
+        "arr_delay_rate_roll28",
+        "route_delay_rate_roll28",
+        "route_cxl_rate_roll28",
+        "taxi_out_delta",
+        "arrivals_same_hour",
+        "ssr_rate",
+        "transfer_checked_ratio",
+        "special_bag_ratio",
+        "is_peak_season",
+        "red_eye",
+        "bank_window",
+        "dep_hub_flag",
+        "arr_hub_flag",
+        "type_diff_rate",
+        "total_seats",
+    ]
+    present = [c for c in candidate_drivers if c in df.columns]
+    drv_rows = []
+
+    focus_aps = g.head(20)["arr_ap"].tolist()
+    for ap in focus_aps:
+        sub = df[df["arr_ap"] == ap]
+        for feat in present:
+            val = _corr(sub[feat], sub["difficult"])
+            drv_rows.append({"arr_ap": ap, "feature": feat, "spearman_with_difficult": val})
+
+    drivers = (
+        pd.DataFrame(drv_rows)
+        .dropna()
+        .sort_values(["arr_ap", "spearman_with_difficult"], ascending=[True, False])
+    )
+    drivers.to_csv(OUT / "destination_drivers.csv", index=False)
+
+    try:
+        topA = g.head(10)["arr_ap"].tolist()
+        piv = drivers[drivers["arr_ap"].isin(topA)].pivot_table(
+            index="arr_ap", columns="feature", values="spearman_with_difficult"
+        )
+        if not piv.empty:
+            plt.figure(figsize=(min(10, 1.2 + 0.6 * len(present)), 0.7 + 0.5 * len(topA)))
+            im = plt.imshow(piv.fillna(0).to_numpy(), aspect="auto")
+            plt.colorbar(im, fraction=0.046, pad=0.04)
+            plt.yticks(range(len(piv.index)), piv.index)
+            plt.xticks(range(len(piv.columns)), piv.columns, rotation=60, ha="right")
+            plt.title("Driver strength (Spearman corr with Difficult)")
+            plt.tight_layout()
+            plt.savefig(FIG / "driver_heatmap.png", dpi=160)
+            plt.close()
+    except Exception:
+        pass
+    # per-flight TreeSHAP drivers (run_all.py --drivers); preferred over Spearman when present
+    shap_dest = None
+    top_flights = None
+    drv_path = OUT / "flight_drivers.csv"
+    if drv_path.exists():
+        fd = pd.read_csv(drv_path, low_memory=False, parse_dates=["scheduled_departure_datetime_local"])
+        shap_dest = destination_drivers(fd)
+        shap_dest.to_csv(OUT / "destination_shap_drivers.csv", index=False)
+        keys = [c for c in KEY_COLS if c != "scheduled_arrival_airport_code"]
+        top_flights = (
+            df[keys + ["arr_ap", "fds"]]
+            .merge(fd.drop(columns=["fds"], errors="ignore").drop_duplicates(subset=keys), on=keys, how="inner")
+            .drop_duplicates(subset=keys)
+            .sort_values("fds", ascending=False)
+            .head(10)
+        )
+
+    (OUT / "ops_recos.md").write_text("".join(reco_lines(g, drivers, shap_dest, top_flights)), encoding="utf-8")
+    print("Wrote:")
+    print(" -", OUT / "destination_consistency.csv")
+    print(" -", OUT / "destination_drivers.csv")
+    print(" -", OUT / "ops_recos.md")
+    if shap_dest is not None:
+        print(" -", OUT / "destination_shap_drivers.csv")
+    print("Also charts (if data available) under:", FIG)
 
 
-(OUT / "ops_recos.md").write_text("".join(reco_lines()), encoding="utf-8")
-print("Wrote:")
-print(" -", OUT / "destination_consistency.csv")
-print(" -", OUT / "destination_drivers.csv")
-print(" -", OUT / "ops_recos.md")
-print("Also charts (if data available) under:", FIG)
+if __name__ == "__main__":  # bootstrap's process pool re-imports this module under spawn
+    main()
@@ -1,23 +1,53 @@
-﻿import sys, pathlib
+import os, sys, pathlib
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
-from src import load, features, labeler, train, score
+from src import load, train, score, drivers, segments
+from src.pipeline import build_frame
 
-# 1) load
-flights = load.load_flight_level()
-pnrfl   = load.load_pnr_flight()
-bags    = load.load_bag_level()
 
-# 2) features
-df = features.merge_all(flights, pnrfl, bags)
-df = labeler.add_difficulty_label(df)
-df = features.add_airport_route_rollups(df)
-df = features.add_airport_equipment_flags(df)
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    incremental = "--incremental" in argv
+    prune = "--prune" in argv
+    segmented = "--segmented" in argv
+    n_workers = (os.cpu_count() or 1) if "--sharded" in argv else None
 
-# 3) train
-model, feat_cols = train.train_and_save(df)
+    # 1) load (the three files are read concurrently, then validated; see validation_summary.csv)
+    flights, pnrfl, bags = load.load_all()
 
-# 4) score
-out_path = score.score_and_write(model, feat_cols, df)
-print(f"Wrote {out_path}")
+    # 2) features (incremental runs only build what the saved model's pruned list needs)
+    keep = set(train.saved_feature_cols() or []) or None if incremental else None
+    df = build_frame(flights, pnrfl, bags, keep=keep, n_workers=n_workers)
+    frames = {}
+
+    def full_frame():
+        """All features, for a full retrain that falls back from --incremental."""
+        frames["full"] = build_frame(flights, pnrfl, bags, n_workers=n_workers) if keep else df
+        return frames["full"]
+
+    # 3) train (--incremental: warm-start from the saved model, full retrain on drift/schema change;
+    #           --prune: drop redundant features when holdout AUC holds;
+    #           --segmented: carrier x hub-tier models in a process pool, global fallback)
+    if incremental:
+        model, feat_cols = train.train_incremental(df, prune_on_fallback=prune, rebuild=full_frame)
+        df = frames.get("full", df)  # a fallback retrain is scored on the frame it was trained on
+    elif segmented:
+        model, feat_cols = segments.train_and_save(df, prune=prune)
+    else:
+        model, feat_cols = train.train_and_save(df, prune=prune)
+
+    # 4) score with the numpy-compiled copy save_model just wrote (same probabilities, no xgboost/sklearn
+    #    in the scoring path); segment routers and constant models score with the fitted objects
+    scorer, feat_cols = score.load_scorer(model, feat_cols)
+    out_path = score.score_and_write(scorer, feat_cols, df)
+    print(f"Wrote {out_path}")
+
+    # 5) (--drivers) per-flight top-3 TreeSHAP drivers from the model that scored the flight, cached per
+    #    model/feature row
+    if "--drivers" in argv:
+        print(f"Wrote {drivers.write_flight_drivers(model, feat_cols, df)}")
+
+
+if __name__ == "__main__":  # worker pools (--sharded, --segmented, --drivers) re-import this file under spawn
+    main()
@@ -0,0 +1,65 @@
+"""
+What-if grid for the actions in ops_recos.md, scored on the cached flight_scores.csv
+with the saved model (run scripts/run_all.py first).
+
+    python -m scripts.run_scenarios                       # default grids
+    python -m scripts.run_scenarios --query "turn_slack < 0" --pads 0,5,10,15 --shifts -10,0,10
+
+Writes scenario_summary.csv, scenario_daily.csv and scenario_flights.parquet to artifacts/outputs.
+"""
+import argparse
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+from src import score, scenarios
+from src.config import OUTPUTS
+
+
+def _nums(s, cast=float):
+    return [cast(x) for x in s.split(",")] if s else None
+
+
+def default_grid():
+    return (
+        # pad ground time on tight turns
+        scenarios.grid("turn_slack < 5", pads=range(0, 31, 5), prefix="pad_tight_")
+        # de-peak banks by moving departures, optionally thinning the inbound bank
+        + scenarios.grid("bank_window > 0", shifts=range(-30, 31, 5), scales=(1.0, 0.9, 0.8), prefix="depeak_")
+        # shift push windows out of the peak hour
+        + scenarios.grid("arrivals_same_hour > 0", shifts=(-10, -5, 5, 10), prefix="push_")
+    )
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--query", default=None)
+    ap.add_argument("--pads", default=None)
+    ap.add_argument("--shifts", default=None)
+    ap.add_argument("--scales", default=None)
+    ap.add_argument("--no-flights", action="store_true", help="skip the per-flight parquet")
+    a = ap.parse_args(argv)
+
+    try:  # the compiled copy, or the segment router after run_all --segmented (as batch scoring)
+        model, feature_cols = score.load_saved_scorer()
+    except FileNotFoundError as e:
+        raise SystemExit(f"{e}.")
+    engine = scenarios.ScenarioEngine(scenarios.load_frame(), model, feature_cols)
+
+    if any([a.query, a.pads, a.shifts, a.scales]):
+        grid = scenarios.grid(a.query, pads=_nums(a.pads) or (0,), shifts=_nums(a.shifts, int) or (0,),
+                              scales=_nums(a.scales) or (1.0,))
+    else:
+        grid = default_grid()
+    summary, daily, flights = engine.run(grid, keep_flights=not a.no_flights)
+
+    summary.to_csv(OUTPUTS / "scenario_summary.csv", index=False)
+    daily.to_csv(OUTPUTS / "scenario_daily.csv", index=False)
+    if not a.no_flights:
+        flights.to_parquet(OUTPUTS / "scenario_flights.parquet", index=False)
+    print(f"{len(grid)} scenarios -> {OUTPUTS / 'scenario_summary.csv'}")
+    print(summary.sort_values("mean_fds_delta_all")[["name", "flights_affected", "mean_fds_delta_affected",
+                                                     "High_base", "High_new"]].head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Compare `difficult` definitions (departure delay >= 15/30/45/60 min): labels for all
+thresholds in one pass, one shared feature matrix and quantile cuts, one model per
+threshold trained in parallel.
+
+    python -m scripts.threshold_sweep
+    python -m scripts.threshold_sweep --thresholds 20,45,90 --workers 2
+
+Writes threshold_sweep.csv (positives, bucket counts, holdout AUC per threshold),
+threshold_agreement.csv (pairwise Spearman of FDS, daily top-10 overlap, same-bucket share)
+and threshold_flights.parquet (per-flight FDS per threshold) to artifacts/outputs.
+"""
+import argparse
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+from src import sweep, pipeline
+from src.config import OUTPUTS, FLIGHT_KEYS, SWEEP_THRESHOLDS, SWEEP_TOP_K
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--thresholds", default=",".join(map(str, SWEEP_THRESHOLDS)))
+    ap.add_argument("--top-k", type=int, default=SWEEP_TOP_K)
+    ap.add_argument("--workers", type=int, default=None)
+    a = ap.parse_args(argv)
+
+    thresholds = [int(t) for t in a.thresholds.split(",") if t]
+    df = pipeline.load_frame()
+    fds, Y, cols, hold_idx, margin = sweep.threshold_sweep(df, thresholds, n_workers=a.workers)
+    summary, agreement = sweep.compare(df, thresholds, fds, Y, hold_idx, margin, top_k=a.top_k)
+
+    OUTPUTS.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(OUTPUTS / "threshold_sweep.csv", index=False)
+    agreement.to_csv(OUTPUTS / "threshold_agreement.csv", index=False)
+    flights = df[[c for c in FLIGHT_KEYS if c in df.columns]].reset_index(drop=True)
+    for j, t in enumerate(thresholds):
+        flights[f"fds_{t}"] = fds[:, j]
+        flights[f"difficult_{t}"] = Y[:, j]
+    flights.to_parquet(OUTPUTS / "threshold_flights.parquet", index=False)
+
+    print(f"{len(thresholds)} thresholds, {len(cols)} shared features -> {OUTPUTS / 'threshold_sweep.csv'}")
+    print(summary.to_string(index=False))
+    print(agreement.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,10 @@
-from . import load, features, labeler, train, score, eda
-__all__ = ["load", "features", "labeler", "train", "score", "eda"]
+import importlib
+
+__all__ = ["load", "features", "labeler", "train", "score", "eda", "prune", "compiled", "drivers", "shard", "drift", "kernels", "airports", "validate", "scenarios", "backtest", "live", "itinerary", "segments", "cube", "bootstrap", "sweep", "pipeline"]
+
+
+def __getattr__(name):
+    # submodules load on first use, so numpy-only consumers (compiled) never pull in xgboost
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
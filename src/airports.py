@@ -0,0 +1,92 @@
+"""
+Airport reference index: IATA code -> dense integer id, with array-backed
+attributes (iso country), loaded once per process and cached on disk as .npz.
+
+The CSV is read once through a shared DuckDB connection and rebuilt only when
+the file changes (size / mtime are stored with the cache). Features look codes
+up per unique value and gather, so no per-call CSV read or frame merge remains.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+import duckdb
+import pandas as pd, numpy as np
+from .config import AP_FILE, CACHE
+
+INDEX_FILE = CACHE / "airports.npz"
+
+
+@lru_cache(maxsize=1)
+def connection():
+    """Process-wide DuckDB connection for reference-data SQL."""
+    return duckdb.connect()
+
+
+@dataclass(frozen=True)
+class AirportIndex:
+    codes: np.ndarray    # str, sorted; id = position
+    country: np.ndarray  # str iso country per id ("" = missing)
+
+    def ids(self, codes) -> np.ndarray:
+        """Dense id per code (-1 when unknown); looks up each distinct code once."""
+        inv, uniq = pd.factorize(pd.Series(codes, copy=False).astype(object), use_na_sentinel=True)
+        u = np.asarray(uniq, dtype=str)
+        pos = np.clip(np.searchsorted(self.codes, u), 0, max(len(self.codes) - 1, 0))
+        uid = np.where(self.codes[pos] == u, pos, -1) if len(self.codes) else np.full(len(u), -1)
+        return np.where(inv >= 0, uid[inv] if len(uid) else -1, -1)
+
+    def gather(self, attr: str, ids: np.ndarray) -> np.ndarray:
+        """Attribute per id as an object array (None for unknown)."""
+        vals = getattr(self, attr).astype(object)
+        vals[vals == ""] = None
+        return np.where(ids >= 0, vals[np.maximum(ids, 0)], None) if len(vals) else np.full(len(ids), None)
+
+
+def _source_stamp() -> np.ndarray:
+    st = AP_FILE.stat()
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def _build() -> AirportIndex:
+    ap = connection().execute(f"SELECT * FROM read_csv_auto('{AP_FILE.as_posix()}', header=True)").df()
+    ap = ap.rename(columns={k: k.strip().lstrip("﻿") for k in ap.columns})
+    codes = ap["airport_iata_code"].to_numpy(dtype=str)  # fixed-width unicode, so the .npz needs no pickle
+    codes, first = np.unique(codes, return_index=True)  # first row wins for duplicated codes
+    return AirportIndex(codes=codes, country=ap["iso_country_code"].fillna("").to_numpy(dtype=str)[first])
+
+
+@lru_cache(maxsize=1)
+def airport_index() -> AirportIndex:
+    stamp = _source_stamp()
+    if INDEX_FILE.exists():
+        z = np.load(INDEX_FILE)
+        if np.array_equal(z["stamp"], stamp):
+            return AirportIndex(codes=z["codes"], country=z["country"])
+    idx = _build()
+    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(INDEX_FILE, stamp=stamp, codes=idx.codes, country=idx.country)
+    return idx
+
+
+def intl_flag(dep_ids: np.ndarray, arr_ids: np.ndarray, index: AirportIndex | None = None) -> np.ndarray:
+    """1 when the countries differ; an unknown airport counts as international (as the old merge did)."""
+    index = index or airport_index()
+    c = np.append(index.country, "")  # id -1 -> "" (unknown)
+    dc, ac = c[dep_ids], c[arr_ids]
+    return ((dc == "") | (ac == "") | (dc != ac)).astype(int)
+
+
+def hub_flags(dep_codes, arr_codes, counted, q: float = 0.95) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Hubs = departure stations whose counted departures are at/above the q-quantile
+    over departure stations. `counted` marks rows that count (non-null flight number).
+    """
+    codes, uniq = pd.factorize(pd.concat([pd.Series(dep_codes), pd.Series(arr_codes)], ignore_index=True))
+    n = len(dep_codes)
+    dep, arr = codes[:n], codes[n:]
+    counts = np.bincount(dep[np.asarray(counted) & (dep >= 0)], minlength=len(uniq))
+    seen = np.zeros(len(uniq), dtype=bool)
+    seen[dep[dep >= 0]] = True
+    hub = np.zeros(len(uniq) + 1, dtype=bool)  # last slot: missing code
+    if seen.any():
+        hub[:-1] = seen & (counts >= np.quantile(counts[seen], q))
+    return hub[dep].astype(int), hub[arr].astype(int)
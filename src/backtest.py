@@ -0,0 +1,152 @@
+"""
+Walk-forward backtest: for each test day, fit the production model
+(train.fit_model) on the preceding days - all of them ("expanding") or the last
+`train_days` ("sliding") - and score that day out of sample.
+
+The feature frame is built once, as in run_all. Its matrix is sorted by departure
+time and saved as a temporary .npy that every worker memory-maps, so a window
+is a contiguous row slice: no per-window feature rebuild and no pickled frames.
+Windows do not depend on each other and run in a process pool.
+
+The *_roll28 rates and the type/station medians are computed over the whole
+frame (as in run_all), so they include the test day's own outcomes. Every
+feature that sees outcomes - the actual_* columns, the medians and deltas built
+from them (features.OUTCOME_FEATURES) and the rates computed from `difficult`
+(features.LABEL_FEATURES) - would leak the test day and is left out by
+default (features.leaky_features); exclude=() keeps them.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd, numpy as np
+from sklearn.metrics import roc_auc_score
+from . import train, matrix
+from .features import leaky_features
+from .score import BUCKET_EDGES
+from .config import FLIGHT_KEYS, BACKTEST_MIN_TRAIN_DAYS, BACKTEST_TOP_K, BACKTEST_CAL_BINS
+
+
+def _time_order(df: pd.DataFrame):
+    """Row order by departure time (undated rows dropped), and the day of each ordered row."""
+    dep = pd.to_datetime(df["scheduled_departure_datetime_local"], errors="coerce", utc=True).dt.tz_localize(None)
+    ns = dep.to_numpy(dtype="datetime64[ns]")
+    order = np.flatnonzero(~np.isnat(ns))
+    order = order[np.argsort(ns[order], kind="stable")]
+    return order, ns[order].astype("datetime64[D]")
+
+
+def windows(days: np.ndarray, min_train_days: int = BACKTEST_MIN_TRAIN_DAYS, train_days: int | None = None):
+    """
+    [(test day, train lo, test lo, test hi)] row bounds over time-sorted `days`.
+    Train rows are [train lo, test lo); test rows [test lo, test hi).
+    """
+    uniq, starts = np.unique(days, return_index=True)
+    bounds = np.append(starts, len(days))
+    out = []
+    for d in range(min_train_days, len(uniq)):
+        lo = 0 if train_days is None else max(0, d - train_days)
+        out.append((uniq[d], int(bounds[lo]), int(bounds[d]), int(bounds[d + 1])))
+    return out
+
+
+def _fit_window(args):
+    x_path, y_path, lo, mid, hi, n_jobs = args
+    X, y = np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+    model = train.fit_model(np.asarray(X[lo:mid]), np.asarray(y[lo:mid]), n_jobs=n_jobs)
+    return model.predict_proba(np.asarray(X[mid:hi]))[:, 1]
+
+
+def _run(jobs, n_workers: int) -> list:
+    if n_workers <= 1 or len(jobs) <= 1:
+        return [_fit_window(j) for j in jobs]
+    with ProcessPoolExecutor(n_workers) as ex:
+        return list(ex.map(_fit_window, jobs))
+
+
+def _ece(y: np.ndarray, p: np.ndarray, n_bins: int = BACKTEST_CAL_BINS) -> float:
+    b = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    n = np.bincount(b, minlength=n_bins)
+    gap = np.abs(np.bincount(b, p, n_bins) - np.bincount(b, y, n_bins))
+    return float(gap.sum() / max(n.sum(), 1))
+
+
+def day_metrics(y: np.ndarray, p: np.ndarray, top_k: int = BACKTEST_TOP_K) -> dict:
+    """Ranking and calibration metrics of one day's out-of-sample scores."""
+    top = np.argsort(-p, kind="stable")[:top_k]  # rank(method="first") as in daily_rank_tables
+    high = p * 100.0 > BUCKET_EDGES[2]
+    base = y.mean()
+    q = np.clip(p, 1e-6, 1 - 1e-6)
+    return {
+        "rows": len(y),
+        "positives": int(y.sum()),
+        "base_rate": base,
+        "mean_pred": p.mean(),
+        f"top{top_k}_precision": y[top].mean(),
+        f"top{top_k}_lift": y[top].mean() / base if base > 0 else np.nan,
+        "high_count": int(high.sum()),
+        "high_precision": y[high].mean() if high.any() else np.nan,
+        "auc": roc_auc_score(y, p) if 0 < y.sum() < len(y) else np.nan,
+        "brier": float(np.mean((p - y) ** 2)),
+        "logloss": float(-np.mean(y * np.log(q) + (1 - y) * np.log(1 - q))),
+        "ece": _ece(y, p),
+    }
+
+
+def calibration_table(y: np.ndarray, p: np.ndarray, n_bins: int = BACKTEST_CAL_BINS) -> pd.DataFrame:
+    b = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    n = np.bincount(b, minlength=n_bins)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({
+            "bin_lo": np.arange(n_bins) / n_bins,
+            "bin_hi": np.arange(1, n_bins + 1) / n_bins,
+            "rows": n,
+            "mean_pred": np.bincount(b, p, n_bins) / n,
+            "observed_rate": np.bincount(b, y, n_bins) / n,
+        })
+
+
+def walk_forward(df: pd.DataFrame, feature_cols=None, min_train_days: int = BACKTEST_MIN_TRAIN_DAYS,
+                 train_days: int | None = None, top_k: int = BACKTEST_TOP_K, n_workers: int | None = None,
+                 exclude=None):
+    """
+    df: labelled feature frame (run_all steps 1-2). feature_cols defaults to
+    train._select_features(df), less `exclude` (default: features.leaky_features).
+    train_days=None -> expanding window.
+    Returns (daily metrics, calibration table, out-of-sample predictions).
+    """
+    feature_cols = feature_cols or train._select_features(df)
+    exclude = set(leaky_features(feature_cols) if exclude is None else exclude)
+    feature_cols = [c for c in feature_cols if c not in exclude]
+    order, days = _time_order(df)
+    wins = windows(days, min_train_days, train_days)
+    if not wins:
+        raise ValueError(f"need more than {min_train_days} days of flights, got {len(np.unique(days))}")
+    n_workers = min(n_workers or os.cpu_count() or 1, len(wins))
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)  # xgboost threads per worker
+
+    y = df["difficult"].astype(int).to_numpy()[order]
+    with tempfile.TemporaryDirectory(prefix="fds_backtest_") as tmp:
+        x_path, y_path = str(Path(tmp) / "X.npy"), str(Path(tmp) / "y.npy")
+        np.save(x_path, matrix.feature_matrix(df, feature_cols)[order])
+        np.save(y_path, y)
+        probas = _run([(x_path, y_path, lo, mid, hi, n_jobs) for _, lo, mid, hi in wins], n_workers)
+
+    daily, preds = [], []
+    for (day, lo, mid, hi), p in zip(wins, probas):
+        yt = y[mid:hi]
+        train_from = days[lo]
+        daily.append({"dep_date": day, "train_from": train_from, "train_days": int((day - train_from).astype(int)),
+                      "train_rows": mid - lo, **day_metrics(yt, p, top_k)})
+        part = df.iloc[order[mid:hi]][[c for c in FLIGHT_KEYS if c in df.columns]].reset_index(drop=True)
+        part["dep_date"] = day
+        part["fds"] = (p * 100.0).clip(0, 100)
+        part["difficult"] = yt
+        preds.append(part)
+
+    preds = pd.concat(preds, ignore_index=True)
+    daily = pd.DataFrame(daily)
+    for c in ("dep_date", "train_from"):
+        daily[c] = pd.to_datetime(daily[c]).dt.date
+    preds["dep_date"] = pd.to_datetime(preds["dep_date"]).dt.date
+    return daily, calibration_table(preds["difficult"].to_numpy(), preds["fds"].to_numpy() / 100.0), preds
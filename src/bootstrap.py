@@ -0,0 +1,133 @@
+"""
+Bootstrap intervals for the destination consistency ranking (cube.consistency).
+
+Replicates are resampling weights rather than resampled frames. A batch of
+BOOT_BATCH replicates is a (batch, flights) weight matrix, either Poisson(1)
+or exact multinomial counts, drawn BOOT_CHUNK_ROWS flights at a time. Two
+sparse products turn each batch into weighted flights and difficult counts
+per (destination, month) cell. A third sums the monthly rates into each
+destination's mean, CV and consistency_score. All replicates of a batch are
+therefore computed at once, and nothing loops over groups.
+
+Batches run in a process pool. Each batch's seed is spawned from one
+SeedSequence, so results depend on `seed` but not on the worker count.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd, numpy as np
+from scipy import sparse
+from .config import (RANDOM_STATE, BOOT_REPLICATES, BOOT_BATCH, BOOT_CHUNK_ROWS, BOOT_ALPHA, BOOT_TOP_N)
+
+_STATE = {}  # per-worker design (set by _init)
+
+
+def _design(df: pd.DataFrame, by: str, over: str):
+    """Cell id per flight, cell -> `by` indicator, and the `by` values."""
+    gb = df.groupby([by, over], dropna=False, sort=True)
+    cell = gb.ngroup().to_numpy()
+    codes, groups = pd.factorize(gb.size().index.get_level_values(0), use_na_sentinel=False)
+    n_cells = len(codes)
+    to_group = sparse.csr_matrix((np.ones(n_cells), (codes, np.arange(n_cells))), shape=(len(groups), n_cells))
+    return cell, to_group, groups
+
+
+def _init(cell, y, to_group, method, chunk_rows):
+    n, n_cells = len(cell), to_group.shape[1]
+    rows = np.arange(n)
+    _STATE.update(
+        ones=sparse.csc_matrix((np.ones(n), (cell, rows)), shape=(n_cells, n)),  # csc: cheap row-chunk slices
+        pos=sparse.csc_matrix((y.astype(float), (cell, rows)), shape=(n_cells, n)),
+        to_group=to_group, method=method, chunk_rows=chunk_rows, n=n,
+    )
+
+
+def _weights(rng, b: int):
+    """Yield (row slice, (b, rows) float32 weights) chunk by chunk."""
+    n, step, method = _STATE["n"], _STATE["chunk_rows"], _STATE["method"]
+    starts = np.arange(0, n, step)
+    if method == "multinomial":  # n draws per replicate: first per chunk, then within it
+        sizes = np.minimum(step, n - starts)
+        per_chunk = rng.multinomial(n, sizes / n, size=b)
+    for j, s in enumerate(starts):
+        m = min(step, n - s)
+        if method == "multinomial":
+            w = rng.multinomial(per_chunk[:, j], np.full(m, 1.0 / m))
+        else:
+            w = rng.poisson(1.0, (b, m))
+        yield slice(s, s + m), w.astype(np.float32)
+
+
+def _consistency(flights: np.ndarray, positives: np.ndarray, to_group):
+    """(pct_difficult, consistency_score, weighted flights) per group; arrays are (cells, b) -> (groups, b)."""
+    valid = flights > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rate = np.where(valid, positives / flights, 0.0)
+        n = to_group @ valid.astype(float)
+        mean = (to_group @ rate) / n
+        std = np.sqrt(np.maximum((to_group @ (rate * rate)) / n - mean ** 2, 0))
+        cv = np.where(n > 1, std / (mean + 1e-6), 0.0)
+    score = np.nan_to_num(mean) * (1 - np.clip(np.nan_to_num(cv), 0, 1))
+    return mean, score, to_group @ flights
+
+
+def _ranks(pct: np.ndarray, score: np.ndarray, flights: np.ndarray) -> np.ndarray:
+    """1-based rank per group (rows) within each replicate (columns), as consistency() sorts."""
+    order = np.lexsort((-flights.T, -np.nan_to_num(pct.T, nan=-1), -score.T), axis=-1)
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(1, order.shape[1] + 1)[None, :], axis=-1)
+    return ranks.T
+
+
+def _batch(args):
+    seed, b = args
+    rng = np.random.default_rng(seed)
+    ones, pos = _STATE["ones"], _STATE["pos"]
+    flights = np.zeros((ones.shape[0], b))
+    positives = np.zeros((ones.shape[0], b))
+    for rows, w in _weights(rng, b):
+        flights += ones[:, rows] @ w.T
+        positives += pos[:, rows] @ w.T
+    pct, score, n = _consistency(flights, positives, _STATE["to_group"])
+    return pct, score, _ranks(pct, score, n)
+
+
+def consistency_intervals(df: pd.DataFrame, by: str = "arr_ap", over: str = "dep_month",
+                          n_boot: int = BOOT_REPLICATES, alpha: float = BOOT_ALPHA, top_n: int = BOOT_TOP_N,
+                          method: str = "poisson", seed: int = RANDOM_STATE, batch: int = BOOT_BATCH,
+                          n_workers: int | None = None, chunk_rows: int = BOOT_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Per `by` value: point pct_difficult / consistency_score / rank (as in
+    cube.consistency), their (alpha/2, 1 - alpha/2) bootstrap percentiles and
+    the share of replicates ranking it in the top `top_n`. df holds one row per
+    flight with `by`, `over` and difficult.
+    """
+    if method not in ("poisson", "multinomial"):
+        raise ValueError(f"method must be 'poisson' or 'multinomial', got {method!r}")
+    cell, to_group, groups = _design(df, by, over)
+    y = pd.to_numeric(df["difficult"], errors="coerce").fillna(0).to_numpy()
+    init = (cell, y, to_group, method, chunk_rows)
+
+    _init(*init)
+    pct0, score0, n0 = _consistency(_STATE["ones"] @ np.ones((len(y), 1)), _STATE["pos"] @ np.ones((len(y), 1)),
+                                    to_group)
+    rank0 = _ranks(pct0, score0, n0)
+
+    sizes = [min(batch, n_boot - s) for s in range(0, n_boot, batch)]
+    jobs = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    n_workers = min(n_workers or os.cpu_count() or 1, len(jobs))
+    if n_workers <= 1:
+        parts = [_batch(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(n_workers, initializer=_init, initargs=init) as ex:
+            parts = list(ex.map(_batch, jobs))
+    pct, score, rank = (np.concatenate(p, axis=1) for p in zip(*parts))
+
+    q = [alpha / 2, 1 - alpha / 2]
+    out = pd.DataFrame({by: groups, "flights": n0[:, 0].astype(int), "pct_difficult": pct0[:, 0]})
+    out["pct_difficult_lo"], out["pct_difficult_hi"] = np.nanquantile(pct, q, axis=1)
+    out["consistency_score"] = score0[:, 0]
+    out["consistency_lo"], out["consistency_hi"] = np.quantile(score, q, axis=1)
+    out["rank"] = rank0[:, 0]
+    out["rank_lo"], out["rank_hi"] = np.quantile(rank, q, axis=1, method="nearest").astype(int)
+    out[f"top{top_n}_share"] = (rank <= top_n).mean(axis=1)
+    return out.sort_values("rank").reset_index(drop=True)
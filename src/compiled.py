@@ -0,0 +1,216 @@
+"""
+Compile the trained FDS model into flat NumPy arrays and evaluate it without
+xgboost/sklearn. Each fold booster becomes dense (tree, node) arrays of
+split feature, threshold, NaN direction and leaf value, walked level by level
+for a whole block of rows at once; isotonic layers become (x, y) knots
+for np.interp. Evaluation holds no mutable state, so one CompiledModel can be
+shared by any number of scoring threads.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+import numpy as np
+from .config import MODELS
+
+COMPILED_FILE = MODELS / "fds_model.npz"
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    """
+    Trees padded to perfect binary trees of `depth` levels in heap order, so a
+    row's position is advanced with pos = 2*pos + 1 + went_right and no child
+    arrays are needed. Shallow leaves become +inf splits that always go left.
+    """
+    feature: np.ndarray       # int32 (n_trees, 2**depth - 1)
+    threshold: np.ndarray     # float32 (n_trees, 2**depth - 1), go left when x < threshold
+    default_left: np.ndarray  # bool (n_trees, 2**depth - 1), direction for NaN
+    leaf: np.ndarray          # float32 (n_trees, 2**depth)
+    base_margin: float
+    depth: int
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """(trees, rows) leaf value reached by each row in each tree; X is a float32 block."""
+        n, f = X.shape
+        n_trees, n_inner = self.feature.shape
+        flat_x = X.ravel()
+        row_off = (np.arange(n, dtype=np.int32) * np.int32(f))[None, :]
+        tree_off = (np.arange(n_trees, dtype=np.int32) * np.int32(n_inner))[:, None]
+        feat, thr, dleft = self.feature.ravel(), self.threshold.ravel(), self.default_left.ravel()
+        has_nan = bool(np.isnan(flat_x).any())
+        # g = tree_off + heap position; child = 2*g + (1 - tree_off) + went_right
+        g = np.repeat(tree_off, n, axis=1)
+        step = 1 - tree_off
+        for _ in range(self.depth):
+            idx = feat[g]
+            idx += row_off
+            x = flat_x[idx]
+            right = ~(x < thr[g])
+            if has_nan:
+                right &= ~(np.isnan(x) & dleft[g])
+            g *= 2
+            g += step
+            g += right
+        g += np.arange(n_trees, dtype=np.int32)[:, None] - n_inner  # leaf rows are n_inner + 1 wide
+        return self.leaf.ravel()[g]
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        """float32 sum in tree order, starting from the base margin (as xgboost does)."""
+        acc = np.full(X.shape[0], np.float32(self.base_margin), dtype=np.float32)
+        for v in self.leaf_values(X):
+            acc += v
+        return acc
+
+
+@dataclass(frozen=True)
+class CompiledMember:
+    forest: CompiledForest | None
+    iso_x: np.ndarray | None  # isotonic knots; None = uncalibrated
+    iso_y: np.ndarray | None
+    constant: float | None = None
+
+    def proba(self, X: np.ndarray) -> np.ndarray:
+        if self.constant is not None:
+            return np.full(X.shape[0], self.constant)
+        e = np.exp(-self.forest.margin(X).astype(np.float64)).astype(np.float32)
+        p = np.float32(1.0) / (np.float32(1.0) + e)
+        return p if self.iso_x is None else np.interp(p, self.iso_x, self.iso_y)
+
+
+@dataclass(frozen=True)
+class CompiledModel:
+    """Drop-in for the fitted model in score.score_and_write (predict_proba on a float32 block)."""
+    members: tuple
+    n_features: int
+    feature_cols: tuple = ()
+    block_rows: int = 4096
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = self.fds(X) / 100.0
+        return np.column_stack([1 - p, p])
+
+    def fds(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"expected {self.n_features} features, got {X.shape[1]}")
+        out = np.empty(X.shape[0])
+        for s in range(0, X.shape[0], self.block_rows):
+            blk = X[s:s + self.block_rows]
+            acc = np.zeros(blk.shape[0])
+            for m in self.members:  # same accumulation order as CalibratedClassifierCV
+                acc += m.proba(blk)
+            out[s:s + self.block_rows] = acc / len(self.members)
+        return (out * 100.0).clip(0, 100)
+
+
+# ---------- compile ----------
+def _parse_float(v) -> float:
+    return float(str(v).strip("[]"))
+
+
+def compile_booster(booster) -> CompiledForest:
+    """booster: xgboost.Booster or XGBClassifier (only its JSON dump is read)."""
+    if hasattr(booster, "get_booster"):
+        booster = booster.get_booster()
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"unsupported objective {learner['objective']['name']}")
+    trees = learner["gradient_booster"]["model"]["trees"]
+    base = float(np.float32(_parse_float(learner["learner_model_param"]["base_score"])))  # xgboost keeps it float32
+    base = min(max(base, 1e-7), 1 - 1e-7)
+
+    # first pass: heap position of every node, to get the common depth
+    placed = []
+    depth = 0
+    for t in trees:
+        lc, rc = t["left_children"], t["right_children"]
+        heap = {0: 0}
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            if lc[i] != -1:
+                heap[lc[i]], heap[rc[i]] = 2 * heap[i] + 1, 2 * heap[i] + 2
+                stack += [lc[i], rc[i]]
+        placed.append(heap)
+        depth = max(depth, max(int(np.log2(h + 1)) for h in heap.values()))
+    if depth > 16:
+        raise ValueError(f"tree depth {depth} too large for the padded layout")
+
+    n_inner = 2 ** depth - 1
+    feature = np.zeros((len(trees), n_inner), dtype=np.int32)
+    threshold = np.full((len(trees), n_inner), np.inf, dtype=np.float32)
+    default_left = np.ones((len(trees), n_inner), dtype=bool)
+    leaf = np.zeros((len(trees), n_inner + 1), dtype=np.float32)
+    for k, (t, heap) in enumerate(zip(trees, placed)):
+        for i, h in heap.items():
+            if t["left_children"][i] != -1:
+                feature[k, h] = t["split_indices"][i]
+                threshold[k, h] = t["split_conditions"][i]
+                default_left[k, h] = bool(t["default_left"][i])
+            else:  # shallow leaf: all-left padding lands on its leftmost bottom slot
+                d = int(np.log2(h + 1))
+                slot = (h + 1) * 2 ** (depth - d) - 1 - n_inner
+                leaf[k, slot] = t["split_conditions"][i]
+
+    return CompiledForest(feature=feature, threshold=threshold, default_left=default_left, leaf=leaf,
+                          base_margin=float(np.float32(np.log(base / (1 - base)))), depth=depth)
+
+
+def _iso_knots(iso):
+    return np.asarray(iso.X_thresholds_, dtype=np.float64), np.asarray(iso.y_thresholds_, dtype=np.float64)
+
+
+def compile_model(model, feature_cols) -> CompiledModel:
+    """CalibratedClassifierCV (isotonic) / WarmStartModel / ConstantProbModel / bare XGBClassifier."""
+    if hasattr(model, "calibrated_classifiers_"):
+        members = []
+        for c in model.calibrated_classifiers_:
+            if c.method != "isotonic":
+                raise ValueError(f"unsupported calibration {c.method}")
+            members.append(CompiledMember(compile_booster(c.estimator), *_iso_knots(c.calibrators[0])))
+    elif hasattr(model, "booster") and hasattr(model, "calibrator"):
+        members = [CompiledMember(compile_booster(model.booster), *_iso_knots(model.calibrator))]
+    elif hasattr(model, "get_booster"):
+        members = [CompiledMember(compile_booster(model), None, None)]
+    elif hasattr(model, "p"):
+        members = [CompiledMember(None, None, None, constant=float(model.p))]
+    else:
+        raise TypeError(f"cannot compile {type(model).__name__}")
+    return CompiledModel(members=tuple(members), n_features=len(feature_cols), feature_cols=tuple(feature_cols))
+
+
+# ---------- persistence (numpy only) ----------
+_FOREST_FIELDS = ["feature", "threshold", "default_left", "leaf"]
+
+
+def save_compiled(cm: CompiledModel, path: Path = COMPILED_FILE) -> Path:
+    arrays = {"n_features": np.int64(cm.n_features), "n_members": np.int64(len(cm.members)),
+              "feature_cols": np.array(cm.feature_cols, dtype=str)}
+    for i, m in enumerate(cm.members):
+        arrays[f"m{i}_constant"] = np.float64(np.nan if m.constant is None else m.constant)
+        if m.forest is not None:
+            for f in _FOREST_FIELDS:
+                arrays[f"m{i}_{f}"] = getattr(m.forest, f)
+            arrays[f"m{i}_meta"] = np.array([m.forest.base_margin, m.forest.depth])
+        if m.iso_x is not None:
+            arrays[f"m{i}_iso_x"], arrays[f"m{i}_iso_y"] = m.iso_x, m.iso_y
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **arrays)
+    return path
+
+
+def load_compiled(path: Path = COMPILED_FILE) -> CompiledModel:
+    z = np.load(path)
+    members = []
+    for i in range(int(z["n_members"])):
+        const = float(z[f"m{i}_constant"])
+        if not np.isnan(const):
+            members.append(CompiledMember(None, None, None, constant=const))
+            continue
+        base_margin, depth = z[f"m{i}_meta"]
+        forest = CompiledForest(**{f: z[f"m{i}_{f}"] for f in _FOREST_FIELDS},
+                                base_margin=float(base_margin), depth=int(depth))
+        iso = (z[f"m{i}_iso_x"], z[f"m{i}_iso_y"]) if f"m{i}_iso_x" in z else (None, None)
+        members.append(CompiledMember(forest, *iso))
+    return CompiledModel(members=tuple(members), n_features=int(z["n_features"]),
+                         feature_cols=tuple(z["feature_cols"].tolist()))
@@ -5,6 +5,8 @@ DATA = ROOT / "data"
 ARTIFACTS = ROOT / "artifacts"
 PLOTS = ARTIFACTS / "eda_plots"
 OUTPUTS = ARTIFACTS / "outputs"
+MODELS = ARTIFACTS / "models"
+CACHE = ARTIFACTS / "cache"        # derived reference data (airports.npz)
 FLIGHT_FILE = DATA / "Flight Level Data.csv"
 PNRFL_FILE  = DATA / "PNR+Flight+Level+Data.csv"
 PNRRMK_FILE = DATA / "PNR Remark Level Data.csv"   
@@ -20,3 +22,61 @@ FLIGHT_KEYS = [
 
 DELAY_THRESHOLD_MIN = 45
 RANDOM_STATE = 42
+
+# warm-start (incremental) retraining
+WARM_WINDOW_DAYS = 28      # recent days used to continue boosting
+WARM_NEW_TREES = 50        # trees added per incremental retrain
+WARM_MAX_TREES = 800       # above this, fall back to a full retrain
+DRIFT_PSI_MAX = 0.25       # any feature above this PSI forces a full retrain
+
+# feature pruning (train_and_save(prune=True))
+PRUNE_CONST_SHARE = 0.999  # one value covering this share of rows = near-constant
+PRUNE_CORR_MAX = 0.98      # |pearson| at/above this drops the lower-gain column
+PRUNE_AUC_TOL = 0.005      # max holdout AUC loss to accept the reduced list
+
+# drift monitoring (drift.py)
+DRIFT_BINS = 20            # fixed-edge bins per feature, frozen at training time
+DRIFT_STATION_COLS = ["scheduled_departure_airport_code", "scheduled_arrival_airport_code"]
+DRIFT_MIN_STATION_ROWS = 200  # fewer training flights: compare the station with the overall reference
+DRIFT_BATCH_ROWS = 50000   # rows sketched per batch while scoring
+
+# ingest validation (validate.py)
+GROUND_MAX_MIN = 24 * 60       # ground/turn minutes above this are flagged as implausible
+BLOCK_LOCAL_MIN_MIN = -26 * 60 # scheduled arr - dep on local clocks; allows for the zone spread
+BLOCK_LOCAL_MAX_MIN = 46 * 60
+BLOCK_DEV_MAX_MIN = 6 * 60     # |actual - scheduled| block minutes flagged above this
+
+# walk-forward backtest (backtest.py)
+BACKTEST_MIN_TRAIN_DAYS = 7  # first test day needs this many days of history
+BACKTEST_TOP_K = 10          # daily top-k precision, as in daily_rank_tables
+BACKTEST_CAL_BINS = 10       # equal-width probability bins for ECE / reliability
+
+# model input matrix (matrix.py)
+MATRIX_CHUNK_ROWS = 65536  # rows written per pass when filling the float32 matrix
+
+# live ops feed (live.py)
+LIVE_QUEUE_MAX = 10000     # queued events before the feed waits (back-pressure)
+LIVE_BATCH_EVENTS = 2000   # most events applied per re-score
+LIVE_PUBLISH_S = 1.0       # min seconds between rewrites of live_scores.csv
+LIVE_PORT = 8765
+
+# connecting itineraries (itinerary.py)
+CONN_MAX_MIN = 6 * 60      # next leg of a PNR within this many minutes of arrival = a connection
+CONN_TIGHT_MIN = 45        # connections shorter than this count as tight
+ITIN_PARTITIONS = 64       # locator-hash spill partitions when PNR rows are streamed in chunks
+
+# segmented models (segments.py)
+SEGMENT_MIN_ROWS = 1500      # smaller carrier x hub-tier segments are scored by the global fallback
+SEGMENT_MIN_POSITIVES = 50   # ... as are segments with fewer difficult (or non-difficult) flights
+SEGMENT_FALLBACK_SAMPLE = 20000  # at most this many rows of own-model segments (strided) join the fallback's fit
+
+# bootstrap intervals for the destination ranking (bootstrap.py)
+BOOT_REPLICATES = 2000     # resamples
+BOOT_BATCH = 250           # replicates per weight matrix / pool task
+BOOT_CHUNK_ROWS = 65536    # flights per weight block (memory: batch x chunk float32)
+BOOT_ALPHA = 0.05          # 95% percentile intervals
+BOOT_TOP_N = 15            # top{N}_share: how often a destination ranks in the charted top N
+
+# delay-threshold sweep (sweep.py)
+SWEEP_THRESHOLDS = (15, 30, 45, 60)   # departure delay minutes that make a flight "difficult"
+SWEEP_TOP_K = 10                      # daily top-k overlap between thresholds
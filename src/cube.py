@@ -0,0 +1,138 @@
+"""
+Pre-aggregated FDS cube: scored flights summed per departure station x arrival
+station x month x hour x fleet x carrier.
+
+Each cell holds
+  - flights
+  - sum of difficult
+  - sum of fds
+  - sum of fds^2
+These are additive, so any roll-up (for example destination x month, or
+carrier x hour) is a groupby-sum over the cells rather than a rescan of
+flight_scores.csv. Means, standard deviations and the destination
+consistency/CV ranking follow from the sums. Cubes over disjoint days merge
+by adding cells.
+
+On disk the cube is one parquet file per departure day (CUBE_DIR/<day>.parquet,
+flights without a departure time in undated.parquet), each holding that day's
+cells. Days are only a storage partition: load() sums the partitions back to
+month cells. score_and_write rewrites the partitions of the days a batch
+scores, so a re-score replaces those days and keeps the rest.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+import pandas as pd, numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .config import OUTPUTS
+
+CUBE_DIR = OUTPUTS / "fds_cube"
+UNDATED = "undated"
+DIMS = ["dep_ap", "arr_ap", "dep_month", "dep_hour", "fleet_type", "carrier"]
+MEASURES = ["flights", "difficult_sum", "fds_sum", "fds_sq_sum"]
+_SOURCES = {
+    "dep_ap": ["scheduled_departure_airport_code", "scheduled_departure_station_code"],
+    "arr_ap": ["arr_ap", "scheduled_arrival_airport_code", "scheduled_arrival_station_code"],
+    "fleet_type": ["fleet_type"],
+    "carrier": ["carrier"],
+}
+
+
+def _dep_time(df: pd.DataFrame) -> pd.Series:
+    col = "scheduled_departure_datetime_local" if "scheduled_departure_datetime_local" in df.columns \
+        else "scheduled_departure_date_local"
+    t = pd.to_datetime(df[col], errors="coerce")
+    return t.dt.tz_localize(None) if getattr(t.dt, "tz", None) is not None else t
+
+
+@dataclass
+class FdsCube:
+    cells: pd.DataFrame                        # DIMS + MEASURES, one row per non-empty cell
+    days: set = field(default_factory=set)     # departure dates (ISO) the cells cover
+
+    @classmethod
+    def from_scores(cls, df: pd.DataFrame) -> "FdsCube":
+        """Cube of a scored frame (needs fds and difficult)."""
+        t = _dep_time(df)
+        keys = {}
+        for d, cands in _SOURCES.items():
+            c = next((c for c in cands if c in df.columns), None)
+            keys[d] = df[c].astype("string").to_numpy(dtype=object, na_value=None) if c else np.full(len(df), None)
+        keys["dep_month"] = t.dt.to_period("M").astype(str).to_numpy(dtype=object)
+        keys["dep_hour"] = t.dt.hour.to_numpy(dtype=float)
+        fds = pd.to_numeric(df["fds"], errors="coerce").to_numpy(dtype=float)
+        vals = pd.DataFrame({
+            **keys,
+            "flights": 1,
+            "difficult_sum": pd.to_numeric(df["difficult"], errors="coerce").to_numpy(dtype=float),
+            "fds_sum": fds,
+            "fds_sq_sum": fds * fds,
+        })
+        cells = vals.groupby(DIMS, dropna=False, sort=False)[MEASURES].sum().reset_index()
+        return cls(cells, set(t.dt.date.dropna().astype(str)))
+
+    def merge(self, other: "FdsCube") -> "FdsCube":
+        overlap = self.days & other.days
+        if overlap:
+            raise ValueError(f"cubes overlap on {len(overlap)} day(s), e.g. {min(overlap)}")
+        cells = (pd.concat([self.cells, other.cells], ignore_index=True)
+                 .groupby(DIMS, dropna=False, sort=False)[MEASURES].sum().reset_index())
+        return FdsCube(cells, self.days | other.days)
+
+    def rollup(self, dims) -> pd.DataFrame:
+        """flights, pct_difficult, mean_fds, fds_std per combination of `dims` (any subset of DIMS)."""
+        dims = [dims] if isinstance(dims, str) else list(dims)
+        g = self.cells.groupby(dims, dropna=False)[MEASURES].sum().reset_index()
+        n = g["flights"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            g["pct_difficult"] = g["difficult_sum"] / n
+            g["mean_fds"] = g["fds_sum"] / n
+            g["fds_std"] = np.sqrt(np.maximum(g["fds_sq_sum"] / n - g["mean_fds"] ** 2, 0))
+        return g.drop(columns=MEASURES[1:])
+
+    def consistency(self, by: str = "arr_ap", over: str = "dep_month") -> pd.DataFrame:
+        """
+        post_ops_insights' destination ranking for any pair of dims: per `by`, the
+        mean and CV of the per-`over` rates, consistency_score = pct_difficult x
+        (1 - clipped diff_cv), sorted best (most consistently difficult) first.
+        """
+        per = self.rollup([by, over])
+        n_over = "mo_count" if over == "dep_month" else f"{over}_count"
+        gb = per.groupby(by, dropna=False)
+        g = gb.agg(flights=("flights", "sum"), mean_fds=("mean_fds", "mean"),
+                   pct_difficult=("pct_difficult", "mean"), **{n_over: (over, "nunique")})
+        multi = gb.size() > 1
+        g["fds_cv"] = (gb["mean_fds"].std(ddof=0) / (g["mean_fds"] + 1e-6)).where(multi)
+        g["diff_cv"] = (gb["pct_difficult"].std(ddof=0) / (g["pct_difficult"] + 1e-6)).where(multi)
+        g = g.reset_index()
+        g["consistency_score"] = g["pct_difficult"].fillna(0) * (1 - g["diff_cv"].fillna(0).clip(lower=0, upper=1))
+        return g.sort_values(["consistency_score", "pct_difficult", "flights"], ascending=[False, False, False])
+
+    @classmethod
+    def load(cls, path: Path = CUBE_DIR, days=None) -> "FdsCube":
+        """The saved cube summed over its day partitions (only `days`, ISO dates, when given)."""
+        files = sorted(path.glob("*.parquet")) if path.is_dir() else []
+        if days is not None:
+            files = [f for f in files if f.stem in set(days)]
+        frames = [pq.read_table(f).to_pandas() for f in files]
+        frames = [f for f in frames if len(f)]
+        if not frames:
+            return cls(pd.DataFrame(columns=DIMS + MEASURES))
+        cells = (pd.concat(frames, ignore_index=True)
+                 .groupby(DIMS, dropna=False, sort=False)[MEASURES].sum().reset_index())
+        return cls(cells, {f.stem for f in files} - {UNDATED})
+
+
+def _partitions(df: pd.DataFrame) -> dict:
+    """Scored rows per partition name: ISO departure day, or UNDATED."""
+    day = _dep_time(df).dt.strftime("%Y-%m-%d").fillna(UNDATED)
+    return df.groupby(day.to_numpy(), sort=True).indices
+
+
+def update_saved(df: pd.DataFrame, path: Path = CUBE_DIR) -> Path:
+    """Write the day partitions of a scored batch; each replaces the saved partition of that day."""
+    path.mkdir(parents=True, exist_ok=True)
+    for day, idx in _partitions(df).items():
+        cells = FdsCube.from_scores(df.iloc[idx]).cells
+        pq.write_table(pa.Table.from_pandas(cells, preserve_index=False), path / f"{day}.parquet")
+    return path
@@ -0,0 +1,160 @@
+"""
+Feature drift monitoring with fixed-edge histogram sketches.
+
+Bin edges are frozen at training time (quantiles of the training frame), so a
+sketch is just an integer count array per (station, feature): memory does not
+grow with the number of flights, and sketches built on different batches or by
+different workers merge exactly by adding counts. The last bin of every row
+counts missing values.
+
+PSI and KS are computed from the binned distributions (KS on the bin edges is a
+lower bound of the exact statistic). Stations are keyed "dep:ORD" / "arr:LAX".
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+import pandas as pd, numpy as np
+from .config import MODELS, OUTPUTS, DRIFT_BINS, DRIFT_STATION_COLS, DRIFT_MIN_STATION_ROWS, DRIFT_BATCH_ROWS
+
+REFERENCE_FILE = MODELS / "drift_reference.npz"
+CURRENT_FILE = OUTPUTS / "drift_sketch.npz"
+ALL = "all"
+
+
+def bin_shares(col: np.ndarray, edges) -> np.ndarray:
+    """Share of values per bin of `edges` (last share = missing)."""
+    counts = bin_counts(col, np.asarray(edges, dtype=float)).astype(float)
+    return counts / max(1.0, counts.sum())
+
+
+def bin_counts(col: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    miss = np.isnan(col)
+    counts = np.bincount(np.searchsorted(edges, col[~miss], side="right"), minlength=len(edges) + 1)
+    return np.append(counts, miss.sum()).astype(np.int64)
+
+
+def psi(ref_share, cur_share, eps: float = 1e-4) -> float:
+    r = np.clip(np.asarray(ref_share, dtype=float), eps, None)
+    c = np.clip(np.asarray(cur_share, dtype=float), eps, None)
+    return float(np.sum((c - r) * np.log(c / r)))
+
+
+def ks(ref_counts, cur_counts) -> float:
+    r = np.cumsum(ref_counts) / max(1, np.sum(ref_counts))
+    c = np.cumsum(cur_counts) / max(1, np.sum(cur_counts))
+    return float(np.max(np.abs(c - r)))
+
+
+@dataclass
+class DriftSketch:
+    feature_cols: tuple
+    edges: np.ndarray                            # float64 (features, bins - 1), repeated edges allowed
+    counts: dict = field(default_factory=dict)   # station key -> int64 (features, bins + 1)
+
+    @classmethod
+    def fit_edges(cls, df: pd.DataFrame, feature_cols, n_bins: int = DRIFT_BINS) -> "DriftSketch":
+        q = np.linspace(0, 1, n_bins + 1)[1:-1]
+        edges = np.zeros((len(feature_cols), len(q)))
+        for j, c in enumerate(feature_cols):
+            col = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+            ok = col[~np.isnan(col)]
+            edges[j] = np.quantile(ok, q) if ok.size else np.inf
+        return cls(tuple(feature_cols), edges)
+
+    def empty(self) -> "DriftSketch":
+        """Same edges, no counts (for a new scoring batch or worker)."""
+        return DriftSketch(self.feature_cols, self.edges)
+
+    def _add(self, key: str, c: np.ndarray):
+        if key in self.counts:
+            self.counts[key] += c
+        else:
+            self.counts[key] = c.copy()
+
+    def update(self, df: pd.DataFrame) -> "DriftSketch":
+        """Count df's rows, overall and per station; df is processed DRIFT_BATCH_ROWS at a time."""
+        for s in range(0, len(df), DRIFT_BATCH_ROWS):
+            blk = df.iloc[s:s + DRIFT_BATCH_ROWS]
+            X = np.column_stack([pd.to_numeric(blk[c], errors="coerce").to_numpy(dtype=float)
+                                 if c in blk.columns else np.full(len(blk), np.nan)
+                                 for c in self.feature_cols])
+            B = self._bins(X)
+            self._add(ALL, self._count(B, np.zeros(len(B), dtype=np.int64), 1)[0])
+            for col in DRIFT_STATION_COLS:
+                if col not in blk.columns:
+                    continue
+                prefix = col.split("_")[1][:3]  # departure -> dep, arrival -> arr
+                codes, stations = pd.factorize(blk[col].astype(str), sort=True)
+                for code, c in zip(stations, self._count(B, codes, len(stations))):
+                    self._add(f"{prefix}:{code}", c)
+        return self
+
+    def _bins(self, X: np.ndarray) -> np.ndarray:
+        """(rows, features) bin index per value; missing values go to the last bin."""
+        B = np.empty(X.shape, dtype=np.int64)
+        for j, e in enumerate(self.edges):
+            B[:, j] = np.searchsorted(e, X[:, j], side="right")
+        B[np.isnan(X)] = self.edges.shape[1] + 1
+        return B
+
+    def _count(self, B: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+        """int64 (groups, features, bins + 1) counts: one bincount over combined (group, feature, bin) ids."""
+        n_feat, width = B.shape[1], self.edges.shape[1] + 2
+        ids = (groups[:, None] * n_feat + np.arange(n_feat)) * width + B
+        return np.bincount(ids.ravel(), minlength=n_groups * n_feat * width).reshape(n_groups, n_feat, width)
+
+    def merge(self, other: "DriftSketch") -> "DriftSketch":
+        if self.feature_cols != other.feature_cols or not np.array_equal(self.edges, other.edges):
+            raise ValueError("cannot merge sketches with different features or bin edges")
+        out = self.empty()
+        for sk in (self, other):
+            for k, c in sk.counts.items():
+                out._add(k, c)
+        return out
+
+    # ---------- persistence ----------
+    def save(self, path: Path) -> Path:
+        keys = sorted(self.counts)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, feature_cols=np.array(self.feature_cols, dtype=str), edges=self.edges,
+                 keys=np.array(keys, dtype=str),
+                 counts=np.stack([self.counts[k] for k in keys]) if keys else
+                 np.zeros((0, len(self.feature_cols), self.edges.shape[1] + 2), dtype=np.int64))
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "DriftSketch":
+        z = np.load(path)
+        return cls(tuple(z["feature_cols"].tolist()), z["edges"],
+                   {k: c for k, c in zip(z["keys"].tolist(), z["counts"])})
+
+
+def drift_report(ref: DriftSketch, cur: DriftSketch, min_rows: int = DRIFT_MIN_STATION_ROWS) -> pd.DataFrame:
+    """
+    PSI / KS per station and feature. A station is compared with its own training
+    distribution when it had at least `min_rows` training flights, else with the
+    overall one (ref_scope says which).
+    """
+    rows = []
+    for key, cc in cur.counts.items():
+        own = key in ref.counts and ref.counts[key][0].sum() >= min_rows
+        rc = ref.counts[key] if own else ref.counts[ALL]
+        for j, c in enumerate(cur.feature_cols):
+            rows.append((key, c, "station" if own or key == ALL else "overall",
+                         int(rc[j].sum()), int(cc[j].sum()),
+                         psi(rc[j] / max(1, rc[j].sum()), cc[j] / max(1, cc[j].sum())), ks(rc[j], cc[j])))
+    out = pd.DataFrame(rows, columns=["station", "feature", "ref_scope", "n_ref", "n_cur", "psi", "ks"])
+    return out.sort_values(["station", "psi"], ascending=[True, False]).reset_index(drop=True)
+
+
+def monitor(df: pd.DataFrame, feature_cols) -> Path | None:
+    """Sketch a scored frame, save the sketch and write feature_drift.csv (None without a reference)."""
+    if not REFERENCE_FILE.exists():
+        return None
+    ref = DriftSketch.load(REFERENCE_FILE)
+    if ref.feature_cols != tuple(feature_cols):
+        print("Drift: reference sketch is for a different feature list; skipped")
+        return None
+    cur = ref.empty().update(df)
+    cur.save(CURRENT_FILE)
+    drift_report(ref, cur).to_csv(OUTPUTS / "feature_drift.csv", index=False)
+    return OUTPUTS / "feature_drift.csv"
@@ -0,0 +1,147 @@
+"""
+Per-flight "top 3 drivers" from TreeSHAP over the trained boosters.
+
+Attributions are on the log-odds scale of each fold booster, averaged across
+folds (the isotonic layer is monotone, so it does not change the ordering).
+Results are cached per model hash in artifacts/outputs/shap_cache/, keyed by a
+hash of the feature row, so re-runs only explain new or changed flights.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd, numpy as np
+from . import matrix
+from .config import OUTPUTS
+
+CACHE_DIR = OUTPUTS / "shap_cache"
+TOP_K = 3
+KEY_COLS = [
+    "company_id", "flight_number",
+    "scheduled_departure_airport_code", "scheduled_arrival_airport_code",
+    "scheduled_departure_datetime_local",
+]
+
+
+def _boosters(model) -> list:
+    if hasattr(model, "calibrated_classifiers_"):
+        return [c.estimator for c in model.calibrated_classifiers_]
+    if hasattr(model, "booster"):
+        return [model.booster]
+    if hasattr(model, "get_booster"):
+        return [model]
+    return []  # ConstantProbModel: nothing to attribute
+
+
+def model_hash(model) -> str:
+    h = hashlib.sha1()
+    for b in _boosters(model):
+        h.update(b.get_booster().save_raw("ubj"))
+    return h.hexdigest()[:16]
+
+
+def row_hashes(df: pd.DataFrame, feature_cols) -> np.ndarray:
+    return pd.util.hash_pandas_object(df[feature_cols], index=False).to_numpy()  # NaN hashes apart from 0
+
+
+# ---------- workers ----------
+_EXPLAINERS = None
+
+
+def _init_worker(boosters):
+    global _EXPLAINERS
+    import shap
+    _EXPLAINERS = [shap.TreeExplainer(b) for b in boosters]
+
+
+def _top_k(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(rows, k) feature indices and SHAP values, strongest push towards Difficult first."""
+    sv = np.mean([np.asarray(e.shap_values(X)) for e in _EXPLAINERS], axis=0)
+    k = min(TOP_K, sv.shape[1])
+    idx = np.argsort(-sv, axis=1, kind="stable")[:, :k]
+    return idx, np.take_along_axis(sv, idx, axis=1)
+
+
+def _explain(boosters, X: np.ndarray, chunk_rows: int, n_jobs: int):
+    chunks = [X[s:s + chunk_rows] for s in range(0, len(X), chunk_rows)]
+    if n_jobs <= 1 or len(chunks) == 1:
+        _init_worker(boosters)
+        parts = [_top_k(c) for c in chunks]
+    else:
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(boosters,)) as ex:
+            parts = list(ex.map(_top_k, chunks))
+    return np.vstack([p[0] for p in parts]), np.vstack([p[1] for p in parts])
+
+
+# ---------- public ----------
+def flight_drivers(model, feature_cols, df: pd.DataFrame, chunk_rows: int = 2000,
+                   n_jobs: int | None = None) -> pd.DataFrame:
+    """
+    One row per flight in df order: driver_1..3 (feature names) and shap_1..3.
+    Rows whose (model, feature row) pair is already cached are not recomputed.
+    Uncached rows are explained in chunk_rows blocks across n_jobs worker
+    processes (default: all cores). A segments.SegmentedModel explains each row
+    with the model that scored it (model_segment column, as in flight_scores.csv).
+    """
+    if hasattr(model, "route") and len(df):
+        from .segments import segment_labels
+        routed = model.route(segment_labels(df))
+        rows = [np.flatnonzero(routed == seg) for seg in np.unique(routed)]
+        parts = [flight_drivers(model.models.get(routed[r[0]], model.fallback), feature_cols, df.iloc[r],
+                                chunk_rows=chunk_rows, n_jobs=n_jobs) for r in rows]
+        out = pd.concat(parts, ignore_index=True).iloc[np.argsort(np.concatenate(rows), kind="stable")]
+        out.index = df.index
+        out["model_segment"] = routed
+        return out
+    model = getattr(model, "fallback", model)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    boosters = _boosters(model)
+    names = [f"driver_{i+1}" for i in range(TOP_K)]
+    vals = [f"shap_{i+1}" for i in range(TOP_K)]
+    if not boosters:
+        return pd.DataFrame({**{c: "" for c in names}, **{c: 0.0 for c in vals}}, index=df.index)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path = CACHE_DIR / f"{model_hash(model)}.parquet"
+    cache = pd.read_parquet(cache_path) if cache_path.exists() else pd.DataFrame(columns=["row_hash"] + names + vals)
+
+    hashes = row_hashes(df, feature_cols)
+    todo = ~np.isin(hashes, cache["row_hash"].to_numpy(dtype=np.uint64))
+    if todo.any():
+        new_hash, first = np.unique(hashes[todo], return_index=True)
+        X = matrix.feature_matrix(df.iloc[np.flatnonzero(todo)[first]], feature_cols)
+        idx, sv = _explain(boosters, X, chunk_rows, n_jobs)
+        fresh = pd.DataFrame(np.asarray(feature_cols, dtype=object)[idx], columns=names)
+        fresh[vals] = sv
+        fresh.insert(0, "row_hash", new_hash)
+        cache = pd.concat([cache, fresh], ignore_index=True) if len(cache) else fresh
+        cache.to_parquet(cache_path, index=False)
+        print(f"SHAP: explained {len(fresh)} new rows, {int((~todo).sum())} from cache")
+
+    out = cache.set_index("row_hash").reindex(hashes)[names + vals]
+    out.index = df.index
+    return out
+
+
+def write_flight_drivers(model, feature_cols, df: pd.DataFrame, **kw):
+    drv = flight_drivers(model, feature_cols, df, **kw)
+    keys = df[[c for c in KEY_COLS if c in df.columns]]
+    out = pd.concat([keys, drv], axis=1)
+    if "fds" in df.columns:
+        out.insert(len(keys.columns), "fds", df["fds"])
+    OUTPUTS.mkdir(parents=True, exist_ok=True)
+    out.to_csv(OUTPUTS / "flight_drivers.csv", index=False)
+    return OUTPUTS / "flight_drivers.csv"
+
+
+def destination_drivers(drivers: pd.DataFrame, top: int = TOP_K) -> pd.DataFrame:
+    """Rank features per arrival airport by summed positive SHAP across its flights."""
+    long = pd.concat([
+        drivers[["scheduled_arrival_airport_code", f"driver_{i+1}", f"shap_{i+1}"]]
+        .set_axis(["arr_ap", "feature", "shap"], axis=1)
+        for i in range(TOP_K)
+    ])
+    long = long[long["shap"] > 0]
+    agg = (long.groupby(["arr_ap", "feature"], as_index=False)
+               .agg(shap_sum=("shap", "sum"), flights=("shap", "size"))
+               .sort_values(["arr_ap", "shap_sum"], ascending=[True, False]))
+    return agg.groupby("arr_ap").head(top)
@@ -1,8 +1,8 @@
 # src/features.py
 import pandas as pd, numpy as np, re
-import duckdb
-from .config import FLIGHT_KEYS, AP_FILE
+from .config import FLIGHT_KEYS
 from .utils import add_time_parts, bank_window
+from . import kernels, airports
 
 # Join keys for non-flight tables (no datetime needed)
 KEY4 = FLIGHT_KEYS[:4]  # company_id, flight_number, dep_code, arr_code
@@ -19,6 +19,11 @@ def _find_col(df, patterns):
     return None
 
 
+def _wants(keep, *cols) -> bool:
+    """True when no feature list is pinned or any of `cols` survived pruning."""
+    return keep is None or any(c in keep for c in cols)
+
+
 def ensure_keys(d: pd.DataFrame, what: str, require_datetime: bool = True) -> pd.DataFrame:
     """
     Normalize to canonical columns and types:
@@ -157,7 +162,18 @@ def add_time_features(flights: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def add_turn_features(flights: pd.DataFrame) -> pd.DataFrame:
+STD_TURN_KEYS = ["aircraft_type","scheduled_departure_airport_code","dep_hour"]
+
+
+def _std_turn_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Median actual ground time per aircraft type x dep station x dep hour."""
+    df = df.assign(dep_hour=df.get("dep_hour", pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.hour))
+    return (df.groupby(STD_TURN_KEYS, dropna=False)["actual_ground_time_minutes"].median()
+              .rename("std_turn_minutes").reset_index())
+
+
+def add_turn_features(flights: pd.DataFrame, keep=None, std_table=None) -> pd.DataFrame:
+    """std_table: precomputed _std_turn_table (e.g. from shard.py); computed here when None."""
     df = flights.copy()
     numeric_cols = ["planned_ground_time_minutes", "scheduled_ground_time_minutes", "actual_ground_time_minutes"]
     for col in numeric_cols:
@@ -170,12 +186,11 @@ def add_turn_features(flights: pd.DataFrame) -> pd.DataFrame:
     else:
         df["planned_turn_minutes"] = np.nan
 
+    if not _wants(keep, "std_turn_minutes", "turn_slack"):
+        return df
     if "actual_ground_time_minutes" in df.columns:
-        std = (df.assign(dep_hour=df.get("dep_hour", pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.hour))
-                 .groupby(["aircraft_type","scheduled_departure_airport_code","dep_hour"], dropna=False)
-                 ["actual_ground_time_minutes"].median()
-                 .rename("std_turn_minutes").reset_index())
-        df = df.merge(std, on=["aircraft_type","scheduled_departure_airport_code","dep_hour"], how="left")
+        std = _std_turn_table(df) if std_table is None else std_table
+        df = df.merge(std, on=STD_TURN_KEYS, how="left")
     else:
         df["std_turn_minutes"] = np.nan
 
@@ -183,21 +198,25 @@ def add_turn_features(flights: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def add_airport_equipment_flags(flights: pd.DataFrame) -> pd.DataFrame:
+def add_airport_equipment_flags(flights: pd.DataFrame, keep=None) -> pd.DataFrame:
+    """keep: optional set of surviving feature names; blocks nobody needs are skipped."""
     df = flights.copy()
-    con = duckdb.connect()
-    ap = con.execute(f"SELECT * FROM read_csv_auto('{AP_FILE.as_posix()}', header=True)").df()
-    ap = ap.rename(columns={k:k.strip() for k in ap.columns}).drop_duplicates(subset=["airport_iata_code"])
-    df = df.merge(ap.add_prefix("dep_"), left_on="scheduled_departure_airport_code", right_on="dep_airport_iata_code", how="left")
-    df = df.merge(ap.add_prefix("arr_"), left_on="scheduled_arrival_airport_code",   right_on="arr_airport_iata_code", how="left")
-    df["intl_flag"] = (df["dep_iso_country_code"] != df["arr_iso_country_code"]).astype(int)
-
-    dep_counts = df.groupby("scheduled_departure_airport_code")["flight_number"].count()
-    cutoff = dep_counts.quantile(0.95)
-    hubs = set(dep_counts[dep_counts >= cutoff].index)
-    df["dep_hub_flag"] = df["scheduled_departure_airport_code"].isin(hubs).astype(int)
-    df["arr_hub_flag"] = df["scheduled_arrival_airport_code"].isin(hubs).astype(int)
-
+    if _wants(keep, "intl_flag"):
+        ap = airports.airport_index()  # loaded once per process (see airports.py)
+        ids = {}
+        for side, col in (("dep", "scheduled_departure_airport_code"), ("arr", "scheduled_arrival_airport_code")):
+            ids[side] = ap.ids(df[col])
+            df[f"{side}_airport_iata_code"] = pd.Series(ap.gather("codes", ids[side]), index=df.index)
+            df[f"{side}_iso_country_code"] = pd.Series(ap.gather("country", ids[side]), index=df.index)
+        df["intl_flag"] = airports.intl_flag(ids["dep"], ids["arr"], ap)
+
+    if _wants(keep, "dep_hub_flag", "arr_hub_flag"):
+        df["dep_hub_flag"], df["arr_hub_flag"] = airports.hub_flags(
+            df["scheduled_departure_airport_code"], df["scheduled_arrival_airport_code"],
+            df["flight_number"].notna().to_numpy())
+
+    if not _wants(keep, "type_diff_rate"):
+        return df
     if "aircraft_type" in df.columns and "difficult" in df.columns:
         if "dep_month" not in df.columns:
             df["dep_month"] = pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.month
@@ -210,19 +229,11 @@ def add_airport_equipment_flags(flights: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def add_airport_route_rollups(flights: pd.DataFrame) -> pd.DataFrame:
-    """
-    Rolling difficulty rates by dep/arr airport-hour and by route.
-    Taxi-out deltas are included only if 'actual_taxi_out_minutes' exists.
-    """
-    df = flights.copy()
-    assert "difficult" in df.columns, "Run labeler.add_difficulty_label first."
-    df = df.sort_values("scheduled_departure_datetime_local").reset_index(drop=True)
-
-    df["dep_date"] = pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.date
-    df["dep_hour"] = pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.hour
-    df["arr_hour"] = pd.to_datetime(df["scheduled_arrival_datetime_local"]).dt.hour
-
+# ---------- airport / route rollups ----------
+# Each table function reads only flights of one group family (a dep station, an
+# arr station, a route) and returns per-(group, day) values, so shard.py can run
+# it on station/route partitions and concatenate the results unchanged.
+def _dep_rollup_table(df: pd.DataFrame) -> pd.DataFrame:
     has_taxi_out = "actual_taxi_out_minutes" in df.columns
     grp = ["scheduled_departure_airport_code", "dep_hour"]
 
@@ -239,16 +250,15 @@ def add_airport_route_rollups(flights: pd.DataFrame) -> pd.DataFrame:
 
     if has_taxi_out:
         tmp["taxi_out_roll7"] = tmp.groupby(grp)["taxi_out_avg"].transform(lambda s: s.rolling(7, min_periods=3).mean())
-        tmp["taxi_out_long"] = tmp.groupby(grp)["taxi_out_avg"].transform(lambda s: s.rolling(90, min_periods=30).median())
+        tmp["taxi_out_long"] = kernels.rolling_median(tmp["taxi_out_avg"], kernels.group_codes(tmp, grp)[0],
+                                                      window=90, min_periods=30)
         tmp["taxi_out_delta"] = tmp["taxi_out_roll7"] - tmp["taxi_out_long"]
     else:
         tmp["taxi_out_delta"] = np.nan
+    return tmp[["scheduled_departure_airport_code","dep_hour","dep_date","dep_delay_rate_roll28","taxi_out_delta"]]
 
-    df = df.merge(
-        tmp[["scheduled_departure_airport_code","dep_hour","dep_date","dep_delay_rate_roll28","taxi_out_delta"]],
-        on=["scheduled_departure_airport_code","dep_hour","dep_date"], how="left"
-    )
 
+def _arr_rollup_table(df: pd.DataFrame) -> pd.DataFrame:
     agrp = ["scheduled_arrival_airport_code","arr_hour"]
     atmp = (df.groupby(agrp + ["dep_date"], as_index=False)
               .agg(arr_count=("flight_number","count"), arr_diff_sum=("difficult","sum"))
@@ -257,16 +267,13 @@ def add_airport_route_rollups(flights: pd.DataFrame) -> pd.DataFrame:
         atmp.groupby(agrp)["arr_diff_sum"].transform(lambda s: s.rolling(28, min_periods=7).sum())
         / atmp.groupby(agrp)["arr_count"].transform(lambda s: s.rolling(28, min_periods=7).sum())
     )
-    df = df.merge(
-        atmp[["scheduled_arrival_airport_code","arr_hour","dep_date","arr_delay_rate_roll28"]],
-        on=["scheduled_arrival_airport_code","arr_hour","dep_date"], how="left"
-    )
+    return atmp[["scheduled_arrival_airport_code","arr_hour","dep_date","arr_delay_rate_roll28"]]
 
-    if "cancellation_flag" not in df.columns:
-        df["cancellation_flag"] = 0
 
+def _route_rollup_table(df: pd.DataFrame) -> pd.DataFrame:
     rgrp = ["scheduled_departure_airport_code","scheduled_arrival_airport_code"]
-    rtmp = (df.groupby(rgrp + ["dep_date"], as_index=False)
+    rtmp = (df.assign(cancellation_flag=df.get("cancellation_flag", 0))
+              .groupby(rgrp + ["dep_date"], as_index=False)
               .agg(route_count=("flight_number","count"),
                    route_diff_sum=("difficult","sum"),
                    route_cxl=("cancellation_flag","sum"))
@@ -279,33 +286,112 @@ def add_airport_route_rollups(flights: pd.DataFrame) -> pd.DataFrame:
         rtmp.groupby(rgrp)["route_cxl"].transform(lambda s: s.rolling(28, min_periods=7).sum())
         / rtmp.groupby(rgrp)["route_count"].transform(lambda s: s.rolling(28, min_periods=7).sum())
     )
-    df = df.merge(
-        rtmp[rgrp + ["dep_date","route_delay_rate_roll28","route_cxl_rate_roll28"]],
-        on=rgrp + ["dep_date"], how="left"
-    )
+    return rtmp[rgrp + ["dep_date","route_delay_rate_roll28","route_cxl_rate_roll28"]]
+
+
+def _same_hour_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Arrivals per arrival station and clock hour (joined to departures in _attach_rollups)."""
     arrivals = (df[["scheduled_arrival_airport_code","scheduled_arrival_datetime_local"]]
                 .rename(columns={"scheduled_arrival_airport_code":"ap",
                                  "scheduled_arrival_datetime_local":"arr_time"}))
-    arrivals["arr_hour"] = pd.to_datetime(arrivals["arr_time"]).dt.floor("h")
-    same_hour = arrivals.groupby(["ap","arr_hour"]).size().rename("arrivals_same_hour").reset_index()
-    df = df.merge(
-        same_hour,
-        left_on=["scheduled_departure_airport_code",
-                 pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.floor("h")],
-        right_on=["ap","arr_hour"], how="left"
-    ).drop(columns=["ap","arr_hour"])
-    df["arrivals_same_hour"] = df["arrivals_same_hour"].fillna(0).astype(int)
+    arrivals["ap_hour"] = pd.to_datetime(arrivals["arr_time"]).dt.floor("h")
+    return arrivals.groupby(["ap","ap_hour"]).size().rename("arrivals_same_hour").reset_index()
+
+
+# features computed from `difficult` itself: they encode the label threshold, and
+# over a whole frame they include each day's own outcomes (sweep.py, backtest.py)
+LABEL_FEATURES = ("dep_delay_rate_roll28", "arr_delay_rate_roll28", "route_delay_rate_roll28", "type_diff_rate")
+# computed from post-departure outcomes (actual times, cancellations), the test day's included
+OUTCOME_FEATURES = ("std_turn_minutes", "turn_slack", "taxi_out_delta", "route_cxl_rate_roll28")
+
+
+def leaky_features(cols) -> list:
+    """The columns of `cols` that see outcomes: actual_* values, LABEL_FEATURES and OUTCOME_FEATURES."""
+    return [c for c in cols if c.startswith("actual_") or c in LABEL_FEATURES or c in OUTCOME_FEATURES]
+
+
+# name -> (table fn, partition key, input columns, output features)
+ROLLUPS = {
+    "dep": (_dep_rollup_table, ["scheduled_departure_airport_code"],
+            ["scheduled_departure_airport_code","dep_hour","dep_date","flight_number","difficult",
+             "actual_taxi_out_minutes"],
+            ("dep_delay_rate_roll28", "taxi_out_delta")),
+    "arr": (_arr_rollup_table, ["scheduled_arrival_airport_code"],
+            ["scheduled_arrival_airport_code","arr_hour","dep_date","flight_number","difficult"],
+            ("arr_delay_rate_roll28",)),
+    "route": (_route_rollup_table, ["scheduled_departure_airport_code","scheduled_arrival_airport_code"],
+              ["scheduled_departure_airport_code","scheduled_arrival_airport_code","dep_date","flight_number",
+               "difficult","cancellation_flag"],
+              ("route_delay_rate_roll28", "route_cxl_rate_roll28")),
+    "same_hour": (_same_hour_table, ["scheduled_arrival_airport_code"],
+                  ["scheduled_arrival_airport_code","scheduled_arrival_datetime_local"],
+                  ("arrivals_same_hour",)),
+}
+
+
+def _prep_rollups(flights: pd.DataFrame) -> pd.DataFrame:
+    df = flights.copy()
+    assert "difficult" in df.columns, "Run labeler.add_difficulty_label first."
+    df = df.sort_values("scheduled_departure_datetime_local").reset_index(drop=True)
+
+    df["dep_date"] = pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.date
+    df["dep_hour"] = pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.hour
+    df["arr_hour"] = pd.to_datetime(df["scheduled_arrival_datetime_local"]).dt.hour
+    return df
+
 
+def _wanted_rollups(keep=None) -> list:
+    return [name for name, (_, _, _, outs) in ROLLUPS.items() if _wants(keep, *outs)]
+
+
+def _attach_rollups(df: pd.DataFrame, tables: dict) -> pd.DataFrame:
+    if "dep" in tables:
+        df = df.merge(tables["dep"], on=["scheduled_departure_airport_code","dep_hour","dep_date"], how="left")
+    if "arr" in tables:
+        df = df.merge(tables["arr"], on=["scheduled_arrival_airport_code","arr_hour","dep_date"], how="left")
+    if "route" in tables:
+        if "cancellation_flag" not in df.columns:
+            df["cancellation_flag"] = 0
+        rgrp = ["scheduled_departure_airport_code","scheduled_arrival_airport_code"]
+        df = df.merge(tables["route"], on=rgrp + ["dep_date"], how="left")
+    if "same_hour" in tables:
+        # cross-station exchange: arrivals counted at station X feed departures from X
+        df = df.merge(
+            tables["same_hour"],
+            left_on=["scheduled_departure_airport_code",
+                     pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.floor("h")],
+            right_on=["ap","ap_hour"], how="left"
+        ).drop(columns=["ap","ap_hour"])
+        df["arrivals_same_hour"] = df["arrivals_same_hour"].fillna(0).astype(int)
     return df
 
-def merge_all(flights, pnr_fl, bags):
+
+def add_airport_route_rollups(flights: pd.DataFrame, keep=None) -> pd.DataFrame:
+    """
+    Rolling difficulty rates by dep/arr airport-hour and by route.
+    Taxi-out deltas are included only if 'actual_taxi_out_minutes' exists.
+    keep: optional set of surviving feature names; rollups nobody needs are skipped.
+    (shard.add_airport_route_rollups is the station-sharded parallel equivalent.)
+    """
+    df = _prep_rollups(flights)
+    tables = {name: ROLLUPS[name][0](df) for name in _wanted_rollups(keep)}
+    return _attach_rollups(df, tables)
+
+def merge_all(flights, pnr_fl, bags, keep=None, n_workers=None):
+    """n_workers: run the station-keyed turn medians sharded across processes (see shard.py)."""
     flights = ensure_keys(flights, "Flight Level", require_datetime=True)
     pax = agg_pnr_to_flight(pnr_fl)
     bag = agg_bag_to_flight(bags)
 
     df = flights.merge(pax, on=KEY4, how="left")
     df = df.merge(bag, on=KEY4, how="left")
+    from . import itinerary  # imports features; connecting-passenger counts from record locators
+    df = itinerary.add_connection_features(df, pnr_fl, keep=keep)
 
     df = add_time_features(df)
-    df = add_turn_features(df)
+    if n_workers:
+        from . import shard
+        df = shard.add_turn_features(df, keep=keep, n_workers=n_workers)
+    else:
+        df = add_turn_features(df, keep=keep)
     return df
\ No newline at end of file
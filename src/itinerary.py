@@ -0,0 +1,209 @@
+"""
+Connecting itineraries from PNR+Flight rows (record_locator + flight keys +
+departure date). Per flight it counts passengers connecting in (arrived on an
+earlier leg of the same PNR) and out (continuing onto a later leg), and how
+many of those connections are tight.
+
+Legs are not self-joined. Each PNR row becomes a fixed 52-byte record:
+  - hashes of the locator and both stations
+  - the departure day
+  - scheduled times, when the leg maps to a row of the flight table
+  - the flight row and pax
+A connection is the latest earlier arrival of the same PNR at a leg's
+departure station. The gap must be 0-CONN_MAX_MIN minutes when both times are
+known; otherwise the legs must be the same or the next day, and such a
+connection cannot count as tight. Flight Level files that hold one hub's
+departures therefore still get connection counts, but tight counts need both
+legs in the table.
+
+Iterables of frames (e.g. a huge PNR file read with pd.read_csv(chunksize=)) are
+hash-partitioned on the locator into spill files first. Each sort then only
+sees 1/ITIN_PARTITIONS of the rows, and memory stays bounded.
+"""
+import tempfile
+from pathlib import Path
+import numpy as np, pandas as pd
+from . import features as F
+from .config import CONN_MAX_MIN, CONN_TIGHT_MIN, ITIN_PARTITIONS
+
+CONN_COLS = ["conn_in_pax", "conn_out_pax", "tight_conn_in_pax", "tight_conn_out_pax"]
+_REC = np.dtype([("loc", "u8"), ("dep_st", "u8"), ("arr_st", "u8"), ("dep_t", "f8"), ("arr_t", "f8"),
+                 ("day", "i4"), ("fid", "i4"), ("pax", "f4")])
+_KEY_COLS = ["company_id", "flight_number", "scheduled_departure_airport_code"]
+
+
+def _leg_date_col(df: pd.DataFrame):
+    return F._find_col(df, [r"^scheduled_departure_date_local$", r"scheduled.*dep.*date", r"dep.*date"])
+
+
+class FlightIndex:
+    """(company, flight number, dep station, dep day) -> flight row, plus per-flight times and stations as arrays."""
+
+    def __init__(self, flights: pd.DataFrame):
+        dep = pd.to_datetime(flights["scheduled_departure_datetime_local"], errors="coerce")
+        arr = pd.to_datetime(flights["scheduled_arrival_datetime_local"], errors="coerce")
+        self.dep = _epoch_min(dep)
+        self.arr = _epoch_min(arr)
+        st, _ = pd.factorize(pd.concat([flights["scheduled_departure_airport_code"],
+                                        flights["scheduled_arrival_airport_code"]], ignore_index=True))
+        n = len(flights)
+        self.dep_st, self.arr_st = st[:n], st[n:]
+        self.n = n
+        self.uniques = [pd.Index(pd.unique(flights[c].astype(str))) for c in _KEY_COLS]
+        day = np.floor(self.dep / 1440)
+        self.day0 = np.nanmin(day) if n and np.isfinite(day).any() else 0.0
+        self.n_days = int(np.nanmax(day) - self.day0) + 1 if n and np.isfinite(day).any() else 1
+        key = self._key([flights[c].astype(str) for c in _KEY_COLS], day)
+        order = np.argsort(key, kind="stable")
+        self.keys, first = np.unique(key[order], return_index=True)  # first flight wins for duplicated keys
+        self.rows = order[first]
+
+    def _key(self, cols, day) -> np.ndarray:
+        key = np.zeros(len(day), dtype=np.int64)
+        bad = ~np.isfinite(day)
+        for u, c in zip(self.uniques, cols):
+            code = u.get_indexer(c)
+            bad |= code < 0
+            key = key * len(u) + np.maximum(code, 0)
+        d = np.where(bad, 0, day - self.day0)
+        bad |= (d < 0) | (d >= self.n_days)
+        key = key * self.n_days + d.astype(np.int64)
+        return np.where(bad, -1, key)
+
+    def lookup(self, legs: pd.DataFrame, date_col: str) -> np.ndarray:
+        """Flight row per leg (-1 when no flight matches)."""
+        day = np.floor(_epoch_min(pd.to_datetime(legs[date_col], errors="coerce")) / 1440)
+        key = self._key([legs[c].astype(str) for c in _KEY_COLS], day)  # normalized by ensure_keys
+        if not len(self.keys):
+            return np.full(len(legs), -1)
+        i = np.clip(np.searchsorted(self.keys, key), 0, len(self.keys) - 1)
+        return np.where((key >= 0) & (self.keys[i] == key), self.rows[i], -1).astype(np.int32)
+
+
+def _epoch_min(t: pd.Series) -> np.ndarray:
+    t = t.dt.tz_localize(None) if getattr(t.dt, "tz", None) is not None else t
+    m = t.to_numpy(dtype="datetime64[m]").astype(np.int64).astype(float)
+    m[t.isna().to_numpy()] = np.nan
+    return m
+
+
+def _hash(s: pd.Series) -> np.ndarray:
+    return pd.util.hash_array(s.astype(str).to_numpy(dtype=object))
+
+
+def _records(legs: pd.DataFrame, index: FlightIndex) -> np.ndarray:
+    legs = F.ensure_keys(legs, "PNR+Flight", require_datetime=False)
+    date_col = _leg_date_col(legs)
+    if "record_locator" not in legs.columns or date_col is None:
+        raise KeyError("itineraries need record_locator and a departure date column in the PNR+Flight rows")
+    day = np.floor(_epoch_min(pd.to_datetime(legs[date_col], errors="coerce")) / 1440)
+    loc = legs["record_locator"]
+    rec = np.empty(len(legs), dtype=_REC)
+    rec["loc"] = _hash(loc.astype(str).str.strip())
+    rec["dep_st"] = _hash(legs["scheduled_departure_airport_code"])
+    rec["arr_st"] = _hash(legs["scheduled_arrival_airport_code"])
+    rec["day"] = np.nan_to_num(day, nan=-1)
+    fid = index.lookup(legs, date_col)
+    rec["fid"] = fid
+    known = fid >= 0
+    rec["dep_t"] = np.where(known, index.dep[np.maximum(fid, 0)], np.nan) if index.n else np.nan
+    rec["arr_t"] = np.where(known, index.arr[np.maximum(fid, 0)], np.nan) if index.n else np.nan
+    pax = pd.to_numeric(legs["total_pax"], errors="coerce").fillna(1) if "total_pax" in legs.columns else 1
+    rec["pax"] = np.asarray(pax, dtype=np.float32)
+    return rec[loc.notna().to_numpy() & np.isfinite(day)]
+
+
+def _link(rec: np.ndarray, index: FlightIndex, out: np.ndarray):
+    """
+    Add one partition's connections to out (4, n_flights), rows ordered as CONN_COLS.
+    Each departing leg is matched (as-of) to the latest arrival of the same PNR
+    at its departure station: arrivals and departures are sorted on
+    (locator x station, time) and joined with one searchsorted. A leg without a
+    flight-table match only has its date, so it counts as arriving at the start
+    and departing at the end of that day.
+    """
+    if len(rec) < 2:
+        return
+    o = np.lexsort((rec["fid"], rec["day"], rec["arr_st"], rec["dep_st"], rec["loc"]))
+    rec = rec[o]
+    dup = np.zeros(len(rec), dtype=bool)  # repeated rows of one PNR leg
+    dup[1:] = ((rec["loc"][1:] == rec["loc"][:-1]) & (rec["dep_st"][1:] == rec["dep_st"][:-1])
+               & (rec["arr_st"][1:] == rec["arr_st"][:-1]) & (rec["day"][1:] == rec["day"][:-1])
+               & (rec["fid"][1:] == rec["fid"][:-1]))
+    rec = rec[~dup]
+
+    # key = (locator, station): arrivals by arr_st, departures by dep_st; dense ids from one sort
+    odd = np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over="ignore"):
+        k_arr, k_dep = rec["loc"] + rec["arr_st"] * odd, rec["loc"] + rec["dep_st"] * odd
+    uniq, inv = np.unique(np.concatenate([k_arr, k_dep]), return_inverse=True)
+    n = len(rec)
+    ka, kd = inv[:n].astype(np.int64), inv[n:].astype(np.int64)
+    day0 = rec["day"].min()
+    base = (rec["day"] - day0).astype(np.int64) * 1440
+    t_arr = np.where(np.isnan(rec["arr_t"]), base, np.nan_to_num(rec["arr_t"] - day0 * 1440)).astype(np.int64)
+    t_dep = np.where(np.isnan(rec["dep_t"]), base + 1439, np.nan_to_num(rec["dep_t"] - day0 * 1440)).astype(np.int64)
+    span = np.int64(max(t_arr.max(), t_dep.max()) + 2 * 1440)
+    a_val = ka * span + t_arr
+    a_ord = np.argsort(a_val, kind="stable")
+    i = np.searchsorted(a_val[a_ord], kd * span + t_dep, side="right") - 1
+    x = a_ord[np.maximum(i, 0)]  # arriving leg, y = departing leg (every record)
+    y = np.arange(n)
+    gap = rec["dep_t"] - rec["arr_t"][x]
+    days = rec["day"] - rec["day"][x]
+    timed = np.isfinite(gap)
+    with np.errstate(invalid="ignore"):
+        link = ((i >= 0) & (ka[x] == kd) & (x != y)
+                & np.where(timed, (gap >= 0) & (gap <= CONN_MAX_MIN), (days >= 0) & (days <= 1)))
+    x, y, gap, timed = x[link], y[link], gap[link], timed[link]
+    pax = np.minimum(rec["pax"][x], rec["pax"][y]).astype(float)
+    with np.errstate(invalid="ignore"):
+        tight = timed & (gap < CONN_TIGHT_MIN)
+    n_fl = index.n
+    for row, legs, sel in ((0, y, slice(None)), (1, x, slice(None)), (2, y, tight), (3, x, tight)):
+        fid = rec["fid"][legs][sel]
+        m = fid >= 0
+        out[row] += np.bincount(fid[m], pax[sel][m], n_fl)
+
+
+def connection_counts(flights: pd.DataFrame, legs, n_parts: int = ITIN_PARTITIONS) -> pd.DataFrame:
+    """
+    CONN_COLS per flight row (aligned with flights.index). `legs` is one
+    PNR+Flight frame, or an iterable of frames streamed through locator-hash
+    spill partitions.
+    """
+    index = FlightIndex(flights)
+    out = np.zeros((len(CONN_COLS), index.n))
+    if isinstance(legs, pd.DataFrame):
+        _link(_records(legs, index), index, out)
+    else:
+        with tempfile.TemporaryDirectory(prefix="fds_itin_") as tmp:
+            files = [open(Path(tmp) / f"{p}.bin", "wb") for p in range(n_parts)]
+            try:
+                for chunk in legs:
+                    rec = _records(chunk, index)
+                    part = (rec["loc"] % np.uint64(n_parts)).astype(np.int64)
+                    order = np.argsort(part, kind="stable")
+                    bounds = np.searchsorted(part[order], np.arange(n_parts + 1))
+                    for p in range(n_parts):
+                        if bounds[p + 1] > bounds[p]:
+                            rec[order[bounds[p]:bounds[p + 1]]].tofile(files[p])
+            finally:
+                for f in files:
+                    f.close()
+            for p in range(n_parts):
+                _link(np.fromfile(Path(tmp) / f"{p}.bin", dtype=_REC), index, out)
+    return pd.DataFrame(out.T, columns=CONN_COLS, index=flights.index)
+
+
+def add_connection_features(df: pd.DataFrame, legs, keep=None) -> pd.DataFrame:
+    """CONN_COLS on the flight frame; NaN when the PNR rows carry no record_locator / departure date."""
+    if not F._wants(keep, *CONN_COLS):
+        return df
+    df = df.copy()
+    has = isinstance(legs, pd.DataFrame) and "record_locator" in legs.columns and _leg_date_col(legs) is not None
+    if has or not isinstance(legs, pd.DataFrame):
+        df[CONN_COLS] = connection_counts(df, legs)
+    else:
+        df[CONN_COLS] = np.nan
+    return df
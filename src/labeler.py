@@ -1,6 +1,10 @@
-import pandas as pd
+import pandas as pd, numpy as np
 from .config import DELAY_THRESHOLD_MIN
 
+# FDS (0-100) buckets written to flight_scores.csv; charts and scenarios read the same labels
+BUCKET_EDGES = [-1, 33.33, 66.66, 100.0]
+BUCKET_LABELS = ["Low", "Medium", "High"]
+
 def _series_or_zeros(df: pd.DataFrame, colname: str):
     if colname in df.columns:
         return pd.to_numeric(df[colname], errors="coerce").fillna(0)
@@ -23,12 +27,14 @@ def _ensure_delay_minutes(df: pd.DataFrame) -> pd.DataFrame:
         out["actual_arrival_delay_minutes"] = pd.to_numeric(arr_delay, errors="coerce")
     return out
 
+def difficulty_labels(df: pd.DataFrame, thresholds) -> np.ndarray:
+    """(rows, thresholds) int8: departure delay >= each threshold, or cancelled / diverted."""
+    delay = _series_or_zeros(df, "actual_departure_delay_minutes").to_numpy(dtype=float)
+    other = ((_series_or_zeros(df, "cancellation_flag") == 1) | (_series_or_zeros(df, "diversion_flag") == 1)).to_numpy()
+    th = np.asarray(thresholds, dtype=float)
+    return ((delay[:, None] >= th[None, :]) | other[:, None]).astype(np.int8)
+
 def add_difficulty_label(flights: pd.DataFrame) -> pd.DataFrame:
     df = _ensure_delay_minutes(flights)
-
-    delay = _series_or_zeros(df, "actual_departure_delay_minutes")
-    cxl   = _series_or_zeros(df, "cancellation_flag")
-    div   = _series_or_zeros(df, "diversion_flag")
-
-    df["difficult"] = ((delay >= DELAY_THRESHOLD_MIN) | (cxl == 1) | (div == 1)).astype(int)
+    df["difficult"] = difficulty_labels(df, [DELAY_THRESHOLD_MIN])[:, 0].astype(int)
     return df
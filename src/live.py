@@ -0,0 +1,336 @@
+"""
+Live ops feed. Actual departure and arrival events update the labels and the
+in-memory station-hour and route rollup state. Only the later flights whose
+features moved are re-scored; there is no CSV rebuild and no batch run.
+
+State starts from the last batch (flight_scores.csv + the saved model). Each
+label-derived family is held as the batch's per-(group, day) table of flight
+counts and sums:
+  - the dep / arr / route roll28 rates of features.ROLLUPS
+  - type_diff_rate, one (type, month) cell wide
+An event changes one cell, and only the windows that contain it are re-summed.
+Features fed by other actuals (turn medians, taxi-out, ground times) stay as
+the batch left them.
+
+Events wait on a bounded asyncio.Queue, so a fast feed blocks on put
+(back-pressure) instead of growing memory. The consumer drains what is queued
+(up to LIVE_BATCH_EVENTS), applies it, and re-scores all touched rows in one
+predict_proba call off the event loop.
+
+Stand-in feeds:
+  - file_feed tails a JSON-lines file
+  - socket_feed serves JSON lines over TCP
+  - replay_events turns one day of the batch frame into events
+"""
+import asyncio, json, os, time
+import pandas as pd, numpy as np
+from . import kernels, matrix
+from .score import BUCKET_EDGES, BUCKET_LABELS, predict, row_segments
+from .config import OUTPUTS, DELAY_THRESHOLD_MIN, LIVE_QUEUE_MAX, LIVE_BATCH_EVENTS, LIVE_PUBLISH_S, LIVE_PORT
+
+ROLL_WINDOW, ROLL_MIN = 28, 7  # features._*_rollup_table: rolling(28, min_periods=7) over a group's days
+KEY_COLS = ["company_id", "flight_number", "scheduled_departure_airport_code", "scheduled_departure_datetime_local"]
+ACTUAL_COLS = ["actual_departure_datetime_local", "actual_arrival_datetime_local"]
+VIEW_FILE = OUTPUTS / "live_scores.csv"
+
+
+def _minutes(s) -> np.ndarray:
+    """Naive-UTC epoch minutes as float (NaN when missing), from strings or datetimes."""
+    t = pd.to_datetime(pd.Series(s), errors="coerce", utc=True).dt.tz_localize(None)
+    m = t.to_numpy(dtype="datetime64[m]").astype(np.int64).astype(float)
+    m[t.isna().to_numpy()] = np.nan
+    return m
+
+
+def _flag(df: pd.DataFrame, col: str) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[col], errors="coerce").fillna(0).to_numpy(dtype=float)
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(s, e) for each pair."""
+    lens = np.maximum(ends - starts, 0)
+    if not lens.sum():
+        return np.empty(0, dtype=np.int64)
+    off = np.repeat(starts - np.concatenate([[0], np.cumsum(lens)[:-1]]), lens)
+    return off + np.arange(lens.sum())
+
+
+class _Rollup:
+    """
+    Per-cell count and numerator sums of one family, cells in groupby order
+    (group columns, then day). rates[name] for a cell = sums over the last
+    `window` cells of its group / counts, NaN below `min_periods` cells.
+    """
+
+    def __init__(self, df, cell_cols, n_group_cols, counted, sums: dict, rates: dict, window, min_periods):
+        valid = df[cell_cols].notna().all(axis=1).to_numpy()  # groupby drops NaN keys
+        codes, table = kernels.group_codes(df[valid], cell_cols)
+        self.cell = np.full(len(df), -1, dtype=np.int64)
+        self.cell[valid] = codes
+        n = len(table)
+        keys = table[cell_cols[:n_group_cols]]
+        new_group = np.ones(n, dtype=bool)
+        if n > 1:
+            new_group[1:] = (keys.iloc[1:].to_numpy() != keys.iloc[:-1].to_numpy()).any(axis=1)
+        starts = np.flatnonzero(new_group)
+        self.group_start = np.repeat(starts, np.diff(np.append(starts, n)))
+        self.group_end = np.repeat(np.append(starts[1:], n), np.diff(np.append(starts, n)))  # exclusive
+        self.window, self.min_periods = window, min_periods
+        ok = self.cell >= 0
+        self.count = np.bincount(self.cell[ok], weights=counted[ok], minlength=n)
+        self.sums = {k: np.bincount(self.cell[ok], weights=v[ok], minlength=n) for k, v in sums.items()}
+        self.rate_of = rates  # feature -> numerator name
+        order = np.argsort(self.cell, kind="stable")
+        self.rows = order[np.count_nonzero(~ok):]
+        self.cell_start = np.searchsorted(self.cell[self.rows], np.arange(n + 1))
+        self.rates = {f: self._rates(np.arange(n), num) for f, num in rates.items()}
+        self.dirty = set()
+
+    def _rates(self, cells: np.ndarray, num: str) -> np.ndarray:
+        lo = np.maximum(self.group_start[cells], cells - self.window + 1)
+        cs = np.concatenate([[0.0], np.cumsum(self.sums[num])])
+        cc = np.concatenate([[0.0], np.cumsum(self.count)])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = (cs[cells + 1] - cs[lo]) / (cc[cells + 1] - cc[lo])
+        return np.where(cells - lo + 1 >= self.min_periods, r, np.nan)
+
+    def add(self, row: int, num: str, delta: float):
+        c = self.cell[row]
+        if c >= 0 and delta and num in self.sums:
+            self.sums[num][c] += delta
+            self.dirty.add(int(c))
+
+    def refresh(self) -> dict:
+        """{feature: (rows, new values)} for rows whose rate changed since the last refresh."""
+        if not self.dirty:
+            return {}
+        d = np.fromiter(self.dirty, dtype=np.int64)
+        self.dirty.clear()
+        cells = np.unique(_ranges(d, np.minimum(d + self.window, self.group_end[d])))
+        out = {}
+        for f, num in self.rate_of.items():
+            new = self._rates(cells, num)
+            moved = ~((new == self.rates[f][cells]) | (np.isnan(new) & np.isnan(self.rates[f][cells])))
+            cells_m = cells[moved]
+            self.rates[f][cells_m] = new[moved]
+            rows = self.rows[_ranges(self.cell_start[cells_m], self.cell_start[cells_m + 1])]
+            out[f] = (rows, self.rates[f][self.cell[rows]])
+        return out
+
+
+class LiveScorer:
+    """Labels, rollup state, feature matrix and FDS of the batch frame, updated per event batch."""
+
+    def __init__(self, df: pd.DataFrame, model, feature_cols):
+        self.df = df.reset_index(drop=True).copy()
+        d = self.df
+        self.model, self.feature_cols = model, list(feature_cols)
+        self.cols = {c: j for j, c in enumerate(feature_cols)}
+        self.X = matrix.feature_matrix(d, feature_cols)
+        self.dep_min = _minutes(d["scheduled_departure_datetime_local"])
+        self.act_dep = _minutes(d.get("actual_departure_datetime_local", pd.Series(np.nan, index=d.index)))
+        self.cxl, self.div = _flag(d, "cancellation_flag"), _flag(d, "diversion_flag")
+        self.label = d["difficult"].astype(int).to_numpy().copy()
+
+        keys = [d[c].astype(str).to_numpy() for c in KEY_COLS[:3]]
+        self.index = {(a, b, c, m): i for i, (a, b, c, m) in enumerate(zip(*keys, self.dep_min))}
+
+        counted = d["flight_number"].notna().to_numpy(dtype=float)
+        lab, cxl = self.label.astype(float), self.cxl
+        self.rollups = {}
+        if "dep_date" not in d.columns:
+            d["dep_date"] = pd.to_datetime(d["scheduled_departure_datetime_local"]).dt.date
+        specs = {
+            "dep": (["scheduled_departure_airport_code", "dep_hour", "dep_date"], 2, counted,
+                    {"dep_delay_rate_roll28": "difficult"}),
+            "arr": (["scheduled_arrival_airport_code", "arr_hour", "dep_date"], 2, counted,
+                    {"arr_delay_rate_roll28": "difficult"}),
+            "route": (["scheduled_departure_airport_code", "scheduled_arrival_airport_code", "dep_date"], 2, counted,
+                      {"route_delay_rate_roll28": "difficult", "route_cxl_rate_roll28": "cancellation_flag"}),
+        }
+        for name, (cells, n_grp, cnt, rates) in specs.items():
+            rates = {f: n for f, n in rates.items() if f in self.cols}
+            if rates and all(c in d.columns for c in cells):
+                self.rollups[name] = _Rollup(d, cells, n_grp, cnt, {"difficult": lab, "cancellation_flag": cxl},
+                                             rates, ROLL_WINDOW, ROLL_MIN)
+        if "type_diff_rate" in self.cols and {"aircraft_type", "dep_month"} <= set(d.columns):
+            self.rollups["type"] = _Rollup(d, ["aircraft_type", "dep_month"], 2, np.ones(len(d)),
+                                           {"difficult": lab}, {"type_diff_rate": "difficult"}, 1, 1)
+
+        self.segments = row_segments(model, d)  # segment router: carrier / hub tier, fixed per flight
+        self.fds = self._predict(self.X, self.segments)
+        self.stats = {"events": 0, "unmatched": 0, "labels_changed": 0, "batches": 0, "rows_rescored": 0}
+
+    def _predict(self, X: np.ndarray, segments=None) -> np.ndarray:
+        return (predict(self.model, X, segments) * 100.0).clip(0, 100)
+
+    def _row(self, ev: dict):
+        m = _minutes([ev.get("scheduled_departure_datetime_local")])[0]
+        return self.index.get((str(ev.get("company_id")), str(ev.get("flight_number")),
+                               str(ev.get("scheduled_departure_airport_code")), m))
+
+    # ---------- events ----------
+    def apply(self, events) -> tuple[np.ndarray, float]:
+        """Apply a batch of events; returns (rows whose features changed, earliest departure touched)."""
+        cutoff = np.inf
+        for ev in events:
+            self.stats["events"] += 1
+            i = self._row(ev)
+            if i is None:
+                self.stats["unmatched"] += 1
+                continue
+            for c in ACTUAL_COLS:
+                if ev.get(c) is not None and c in self.df.columns:
+                    self.df.at[i, c] = ev[c]
+            if ev.get("actual_departure_datetime_local") is not None:
+                self.act_dep[i] = _minutes([ev["actual_departure_datetime_local"]])[0]
+                self.df.at[i, "actual_departure_delay_minutes"] = self.act_dep[i] - self.dep_min[i]
+            for arr, c in ((self.cxl, "cancellation_flag"), (self.div, "diversion_flag")):
+                if ev.get(c) is not None and float(ev[c]) != arr[i]:
+                    if c == "cancellation_flag":
+                        for r in self.rollups.values():
+                            r.add(i, c, float(ev[c]) - arr[i])
+                    arr[i] = float(ev[c])
+            delay = self.act_dep[i] - self.dep_min[i]  # labeler: NaN delay counts as 0
+            new = int((delay >= DELAY_THRESHOLD_MIN) | (self.cxl[i] == 1) | (self.div[i] == 1))
+            if new != self.label[i]:
+                for r in self.rollups.values():
+                    r.add(i, "difficult", new - self.label[i])
+                self.label[i] = new
+                self.stats["labels_changed"] += 1
+            cutoff = min(cutoff, self.dep_min[i])
+
+        touched = []
+        for r in self.rollups.values():
+            for f, (rows, vals) in r.refresh().items():
+                self.X[rows, self.cols[f]] = vals
+                self.df.loc[rows, f] = vals
+                touched.append(rows)
+        rows = np.unique(np.concatenate(touched)) if touched else np.empty(0, dtype=np.int64)
+        return rows, cutoff
+
+    async def process(self, items) -> dict:
+        """items: [(received monotonic time, event)]. Re-scores later flights among the touched rows."""
+        rows, cutoff = self.apply([e for _, e in items])
+        rows = rows[self.dep_min[rows] > cutoff]  # departed flights keep their score
+        if len(rows):
+            seg = None if self.segments is None else self.segments[rows]
+            self.fds[rows] = await asyncio.to_thread(self._predict, self.X[rows], seg)
+        self.stats["batches"] += 1
+        self.stats["rows_rescored"] += len(rows)
+        return {"events": len(items), "rescored": len(rows),
+                "latency_s": time.monotonic() - min(t for t, _ in items)}
+
+    async def consume(self, queue: asyncio.Queue, on_batch=None, publish_s: float = LIVE_PUBLISH_S):
+        """Drain the queue in batches until a None sentinel; publishes the view at most every publish_s."""
+        last = 0.0
+        while True:
+            batch = [await queue.get()]
+            while batch[-1] is not None and len(batch) < LIVE_BATCH_EVENTS and not queue.empty():
+                batch.append(queue.get_nowait())
+            done = batch[-1] is None
+            items = [b for b in batch if b is not None]
+            if items:
+                info = await self.process(items)
+                if on_batch:
+                    on_batch(info)
+            if time.monotonic() - last >= publish_s or done:
+                self.publish()
+                last = time.monotonic()
+            if done:
+                return self.stats
+
+    # ---------- view ----------
+    def view(self) -> pd.DataFrame:
+        cols = [c for c in ["company_id", "flight_number", "scheduled_departure_airport_code",
+                            "scheduled_arrival_airport_code", "scheduled_departure_datetime_local",
+                            *ACTUAL_COLS] if c in self.df.columns]
+        out = self.df[cols].copy()
+        out["difficult"] = self.label
+        out["fds"] = self.fds
+        out["fds_bucket"] = pd.cut(self.fds, bins=BUCKET_EDGES, labels=BUCKET_LABELS).astype(str)
+        return out
+
+    def publish(self, path=VIEW_FILE):
+        """Atomic rewrite of the live view (readers never see a half-written file)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        self.view().to_csv(tmp, index=False)
+        os.replace(tmp, path)
+
+
+# ---------- stand-in feeds ----------
+def _parse(line):
+    """Event dict of one JSON line; None (with a warning) when the line is blank or malformed."""
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        print(f"live: skipped malformed event line {line[:80]!r}")
+        return None
+
+
+async def file_feed(path, queue: asyncio.Queue, follow: bool = False, poll_s: float = 0.2,
+                    rate: float | None = None):
+    """Put each JSON line of `path` on the queue (awaits when full); follow=True keeps tailing the file."""
+    with open(path, encoding="utf-8") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    break
+                await asyncio.sleep(poll_s)
+                continue
+            ev = _parse(line)
+            if ev is not None:
+                await queue.put((time.monotonic(), ev))
+                if rate:
+                    await asyncio.sleep(1.0 / rate)
+    await queue.put(None)
+
+
+async def socket_feed(queue: asyncio.Queue, host: str = "127.0.0.1", port: int = LIVE_PORT):
+    """JSON lines over TCP (e.g. `nc 127.0.0.1 8765 < events.jsonl`); runs until cancelled."""
+    async def handle(reader, writer):
+        async for line in reader:
+            ev = _parse(line.decode("utf-8", errors="replace"))
+            if ev is not None:
+                await queue.put((time.monotonic(), ev))
+        writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def blank_day(df: pd.DataFrame, day) -> pd.DataFrame:
+    """Copy of df as it stood before `day` started: its actual times cleared, its labels 0."""
+    out = df.copy()
+    on_day = (pd.to_datetime(out["scheduled_departure_datetime_local"]).dt.date == pd.Timestamp(day).date()).to_numpy()
+    for c in ACTUAL_COLS + ["actual_departure_delay_minutes", "actual_arrival_delay_minutes"]:
+        if c in out.columns:
+            out[c] = out[c].astype(object)
+            out.loc[on_day, c] = np.nan
+    out.loc[on_day, "difficult"] = 0
+    return out
+
+
+def replay_events(df: pd.DataFrame, day) -> list:
+    """Departure and arrival events of the flights departing on `day`, in actual-time order."""
+    d = df[(pd.to_datetime(df["scheduled_departure_datetime_local"]).dt.date == pd.Timestamp(day).date()).to_numpy()]
+    key = {c: d[c].astype(str).to_numpy() for c in KEY_COLS[:3]}
+    sched = pd.to_datetime(d["scheduled_departure_datetime_local"]).dt.strftime("%Y-%m-%dT%H:%M:%S").to_numpy()
+    events = []
+    for kind, col in (("departure", "actual_departure_datetime_local"), ("arrival", "actual_arrival_datetime_local")):
+        if col not in d.columns:
+            continue
+        t = _minutes(d[col])
+        for j in np.flatnonzero(~np.isnan(t)):
+            ev = {"event": kind, **{c: key[c][j] for c in key}, "scheduled_departure_datetime_local": sched[j],
+                  col: str(d[col].iloc[j])}
+            events.append((t[j], ev))
+    events.sort(key=lambda e: e[0])
+    return [e for _, e in events]
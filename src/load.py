@@ -1,6 +1,10 @@
 from __future__ import annotations
+import codecs, csv
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 try:
     from .config import DATA_DIR as _DATA_DIR 
@@ -34,49 +38,134 @@ def _find_file(candidates: list[str]) -> Path:
     )
 
 
-def _read_csv(path: Path) -> pd.DataFrame:
-    """Read CSV permissively, keeping strings; dates are parsed later in features/labeler."""
+# same strings pd.read_csv treats as missing, so Arrow-read frames null the same cells
+NULL_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+               "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+SAMPLE_BYTES = 1 << 20
+_TS = pa.timestamp("us", tz="UTC")  # values end in Z; same dtype pd.to_datetime gives them
+# columns the reader converts itself; anything else stays string
+COLUMN_TYPES = {
+    "scheduled_departure_datetime_local": _TS,
+    "scheduled_arrival_datetime_local": _TS,
+    "actual_departure_datetime_local": _TS,
+    "actual_arrival_datetime_local": _TS,
+    "total_seats": pa.float64(),
+    "scheduled_ground_time_minutes": pa.float64(),
+    "actual_ground_time_minutes": pa.float64(),
+    "minimum_turn_minutes": pa.float64(),
+    "total_pax": pa.float64(),
+    "lap_child_count": pa.float64(),
+}
+
+
+def detect_encoding(path: Path, sample_bytes: int = SAMPLE_BYTES) -> str:
+    """'utf-8' when the first `sample_bytes` decode as UTF-8 (a cut multi-byte tail is fine), else 'latin-1'."""
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
     try:
-        return pd.read_csv(path, dtype="object", low_memory=False, encoding="utf-8")
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
     except UnicodeDecodeError:
-        return pd.read_csv(path, dtype="object", low_memory=False, encoding="latin-1")
+        return "latin-1"
+
+
+def _header(path: Path, encoding: str) -> list[str]:
+    with open(path, encoding=encoding, newline="") as f:
+        return [c.lstrip("\ufeff") for c in next(csv.reader(f), [])]
+
+
+def _options(path: Path, columns, types, encoding: str) -> dict:
+    names = _header(path, encoding)
+    wanted = names if columns is None else [c for c in names if c in set(columns)]
+    types = {c: (types or {}).get(c, pa.string()) for c in wanted}
+    return {"read_options": pacsv.ReadOptions(encoding=encoding, use_threads=True),
+            "convert_options": pacsv.ConvertOptions(column_types=types, include_columns=wanted,
+                                                    null_values=NULL_VALUES, strings_can_be_null=True)}
+
+
+def read_table(path: Path, columns: list[str] | None = None, types: dict | None = None,
+               encoding: str | None = None) -> pa.Table:
+    """
+    Multi-threaded Arrow CSV read. Every column is typed explicitly: COLUMN_TYPES
+    (updated by `types`) for the known numeric and timestamp columns, string for
+    the rest. If a typed column holds a value the reader cannot convert, the file
+    is re-read with every column as string, so one bad cell cannot fail the read
+    (validate.py then parses, nulls or quarantines it). `columns` is pushed down:
+    other columns are skipped by the reader, requested ones the file lacks are ignored.
+    """
+    encoding = encoding or detect_encoding(path)
+    types = {**COLUMN_TYPES, **(types or {})}
+    try:
+        return pacsv.read_csv(path, **_options(path, columns, types, encoding))
+    except pa.ArrowInvalid as e:
+        msg = str(e)
+        if "conversion error" in msg and any(t != pa.string() for t in types.values()):
+            return read_table(path, columns, {c: pa.string() for c in types}, encoding)
+        if encoding == "latin-1" or "UTF8" not in msg.upper().replace("-", ""):  # invalid UTF-8 past the sample
+            raise
+        return read_table(path, columns, types, encoding="latin-1")
+
+
+def read_tables(paths: dict, columns: dict | None = None, n_threads: int | None = None) -> dict:
+    """{name: path} -> {name: pa.Table}, files read concurrently (Arrow parses outside the GIL)."""
+    columns = columns or {}
+    with ThreadPoolExecutor(n_threads or len(paths) or 1) as ex:
+        futs = {name: ex.submit(read_table, Path(p), columns.get(name)) for name, p in paths.items()}
+        return {name: f.result() for name, f in futs.items()}
 
 
-def load_all() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+def _to_frame(table: pa.Table, path: Path) -> pd.DataFrame:
+    df = table.to_pandas()  # Arrow-backed str columns, not object
+    df.attrs["source_path"] = str(path)
+    return df
+
+
+def _read_csv(path: Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read CSV with COLUMN_TYPES converted, other columns as strings."""
+    return _to_frame(read_table(path, columns), path)
+
+
+SOURCES = {
+    "flights": ["Flight Level Data", "FlightLevelData", "flights"],
+    "pnr_flight": ["PNR+Flight+Level+Data", "PNR Flight Level", "PNRFlight"],
+    "bags": ["Bag+Level+Data", "Bag Level Data", "bags"],
+}
+
+
+def load_all(validate: bool = True, columns: dict | None = None) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """
     Returns:
         flights, pnr_flight, bags  (as DataFrames)
+    The three files are read concurrently by read_tables; columns={"flights": [...], ...}
+    restricts what each one materializes.
+    validate=True runs the ingest checks in validate.py (rows that cannot be used
+    are dropped and written to outputs/quarantine/, see validation_summary.csv).
     Looks for your actual filenames case/spacing-independently, e.g.:
       - 'Flight Level Data.csv'
       - 'PNR+Flight+Level+Data.csv'
       - 'Bag+Level+Data.csv'
     """
-    flights_path = _find_file([
-        "Flight Level Data",
-        "FlightLevelData",
-        "flights"
-    ])
-    pnrfl_path = _find_file([
-        "PNR+Flight+Level+Data",
-        "PNR Flight Level",
-        "PNRFlight"
-    ])
-    bag_path = _find_file([
-        "Bag+Level+Data",
-        "Bag Level Data",
-        "bags"
-    ])
-
-    flights = _read_csv(flights_path)
-    pnr_fl  = _read_csv(pnrfl_path)
-    bags    = _read_csv(bag_path)
-
-    # helpful for debugging
-    flights.attrs["source_path"] = str(flights_path)
-    pnr_fl.attrs["source_path"]  = str(pnrfl_path)
-    bags.attrs["source_path"]    = str(bag_path)
-
+    paths = {name: _find_file(keys) for name, keys in SOURCES.items()}
+    tables = read_tables(paths, columns)
+    if validate:  # on the Arrow tables, before the pandas conversion
+        from .validate import validate_all
+        cleaned = validate_all(*(tables[n] for n in SOURCES), sources=[paths[n] for n in SOURCES])
+        tables = dict(zip(SOURCES, cleaned))
+    flights, pnr_fl, bags = (_to_frame(tables[n], paths[n]) for n in SOURCES)
     return flights, pnr_fl, bags
 
 
-__all__ = ["DATA_DIR", "load_all"]
+def load_flight_level(columns: list[str] | None = None) -> pd.DataFrame:
+    return _read_csv(_find_file(SOURCES["flights"]), columns)
+
+
+def load_pnr_flight(columns: list[str] | None = None) -> pd.DataFrame:
+    return _read_csv(_find_file(SOURCES["pnr_flight"]), columns)
+
+
+def load_bag_level(columns: list[str] | None = None) -> pd.DataFrame:
+    return _read_csv(_find_file(SOURCES["bags"]), columns)
+
+
+__all__ = ["DATA_DIR", "load_all", "read_table", "read_tables", "load_flight_level", "load_pnr_flight",
+           "load_bag_level"]
@@ -0,0 +1,46 @@
+"""
+Model input matrix: one preallocated, C-contiguous float32 (rows, features)
+array in feature_cols order, each column written once straight from the frame.
+Missing values stay NaN, so xgboost sends them down the learned default branch
+instead of treating "unknown" as a real 0 (the old fillna(0.0) float64 copy).
+
+Rows are filled in chunks of MATRIX_CHUNK_ROWS so the block being written stays
+in cache.
+"""
+import numpy as np, pandas as pd
+from .config import MATRIX_CHUNK_ROWS
+
+# saved with the model (train.save_model); 1 = float64 with NaN -> 0,
+# 2 = pax_proxy / infants summed as strings (total_pax / lap_child_count read untyped)
+MATRIX_VERSION = 3
+
+
+def _column(s: pd.Series) -> np.ndarray:
+    """float view of a feature column (no copy for numpy float/int columns)."""
+    if isinstance(s.dtype, np.dtype) and s.dtype.kind in "fiub":
+        return s.to_numpy()
+    return s.to_numpy(dtype=np.float64, na_value=np.nan)  # nullable / Arrow-backed numerics
+
+
+def _columns(df: pd.DataFrame, feature_cols) -> list:
+    missing = [c for c in feature_cols if c not in df.columns]
+    if missing:
+        raise KeyError(f"feature columns not in frame: {missing[:5]}")
+    return [_column(df[c]) for c in feature_cols]
+
+
+def feature_matrix(df: pd.DataFrame, feature_cols, chunk_rows: int = MATRIX_CHUNK_ROWS,
+                   out: np.ndarray | None = None) -> np.ndarray:
+    """(len(df), len(feature_cols)) float32, NaN where the frame is missing. `out` is filled if given."""
+    cols = _columns(df, feature_cols)
+    n = len(df)
+    if out is None:
+        out = np.empty((n, len(cols)), dtype=np.float32)
+    elif out.shape != (n, len(cols)) or out.dtype != np.float32:
+        raise ValueError(f"out must be float32 {(n, len(cols))}, got {out.dtype} {out.shape}")
+    for s in range(0, n, chunk_rows):
+        blk = out[s:s + chunk_rows]
+        for j, v in enumerate(cols):
+            blk[:, j] = v[s:s + chunk_rows]
+    return out
+
@@ -0,0 +1,25 @@
+"""
+The labelled feature frame of run_all steps 1-2, shared by run_all, the
+walk-forward backtest and the threshold sweep.
+"""
+from . import load, features, labeler, shard
+
+
+def build_frame(flights, pnrfl, bags, keep=None, n_workers=None):
+    """
+    Merged features, `difficult`, airport/route rollups and equipment flags.
+    keep: only the features a (pruned) model needs; n_workers: station-sharded
+    rollups in a process pool (shard.py, same output).
+    """
+    df = features.merge_all(flights, pnrfl, bags, keep=keep, n_workers=n_workers)
+    df = labeler.add_difficulty_label(df)
+    if n_workers:
+        df = shard.add_airport_route_rollups(df, keep=keep, n_workers=n_workers)
+    else:
+        df = features.add_airport_route_rollups(df, keep=keep)
+    return features.add_airport_equipment_flags(df, keep=keep)
+
+
+def load_frame(keep=None, n_workers=None):
+    """build_frame over load.load_all() (read concurrently, validated)."""
+    return build_frame(*load.load_all(), keep=keep, n_workers=n_workers)
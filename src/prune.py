@@ -0,0 +1,111 @@
+import pandas as pd, numpy as np
+from sklearn.metrics import roc_auc_score
+from . import matrix
+from .config import OUTPUTS, PRUNE_CONST_SHARE, PRUNE_CORR_MAX, PRUNE_AUC_TOL
+
+
+def prune_features(df: pd.DataFrame, feature_cols, gain: pd.Series | None = None,
+                   corr_max: float = PRUNE_CORR_MAX, sample: int = 50_000):
+    """
+    Drop near-constant, duplicate, highly correlated and zero-gain columns.
+    `gain` (per feature, from a model fit on exactly these columns) ranks pairs -
+    the lower-gain one goes, ties: later column - and drives the zero-gain stage,
+    which is skipped without it.
+    Returns (kept, report) where report has one row per dropped feature (stage, reason).
+    """
+    if gain is not None and not (gain.fillna(0.0) > 0).any():
+        gain = None  # no signal (e.g. a constant model)
+    rank = (gain.fillna(0.0) if gain is not None else pd.Series(0.0, index=feature_cols))
+    X = df[feature_cols]
+    if len(X) > sample:
+        X = X.sample(sample, random_state=0)
+    X = X.apply(pd.to_numeric, errors="coerce")
+    dropped = {}
+
+    # near-constant: one value (NaN counts as a value) covers almost every row
+    for c in feature_cols:
+        top = X[c].value_counts(dropna=False, normalize=True)
+        if top.empty or top.iloc[0] >= PRUNE_CONST_SHARE:
+            dropped[c] = ("near_constant", "top value share >= %g" % PRUNE_CONST_SHARE)
+
+    # exact duplicates: identical column hashes
+    live = [c for c in feature_cols if c not in dropped]
+    by_hash = {}
+    for c in live:
+        h = hash(pd.util.hash_array(X[c].to_numpy(dtype=float)).tobytes())
+        by_hash.setdefault(h, []).append(c)
+    for cols in by_hash.values():
+        for c in sorted(cols, key=lambda k: -rank.get(k, 0.0))[1:]:
+            dropped[c] = ("duplicate", f"same values as {sorted(cols, key=lambda k: -rank.get(k, 0.0))[0]}")
+
+    # highly correlated: greedy, strongest features claim their neighbours first
+    live = sorted([c for c in feature_cols if c not in dropped], key=lambda k: -rank.get(k, 0.0))
+    if len(live) > 1:
+        corr = X[live].corr().abs().fillna(0.0)
+        for i, c in enumerate(live):
+            if c in dropped:
+                continue
+            for o in live[i + 1:]:
+                if o not in dropped and corr.at[c, o] >= corr_max:
+                    dropped[o] = ("correlated", f"|r|={corr.at[c, o]:.3f} with {c}")
+
+    if gain is not None:
+        for c in feature_cols:
+            if c not in dropped and not gain.get(c, 0.0) > 0:
+                dropped[c] = ("zero_gain", "importance_gain == 0")
+
+    kept = [c for c in feature_cols if c not in dropped]
+    report = pd.DataFrame([(c, st, why) for c, (st, why) in dropped.items()],
+                          columns=["feature", "stage", "reason"])
+    return kept, report
+
+
+def _fit_holdout(df: pd.DataFrame, feature_cols, make_model, holdout: float = 0.2):
+    """(AUC on the newest `holdout` share of rows, fitted model or None); df is time-ordered."""
+    n = len(df)
+    cut = int(n * (1 - holdout))
+    X = matrix.feature_matrix(df, feature_cols)
+    y = df["difficult"].astype(int).values
+    if y[:cut].min() == y[:cut].max() or y[cut:].min() == y[cut:].max():
+        return np.nan, None
+    m = make_model(y[:cut])
+    m.fit(X[:cut], y[:cut])
+    return float(roc_auc_score(y[cut:], m.predict_proba(X[cut:])[:, 1])), m
+
+
+def holdout_auc(df: pd.DataFrame, feature_cols, make_model, holdout: float = 0.2) -> float:
+    """AUC on the newest `holdout` share of rows (df is time-ordered)."""
+    return _fit_holdout(df, feature_cols, make_model, holdout)[0]
+
+
+STAGES = ["near_constant", "duplicate", "correlated", "zero_gain"]
+
+
+def select_pruned(df: pd.DataFrame, feature_cols, make_model, tol: float = PRUNE_AUC_TOL):
+    """
+    Prune stage by stage; a stage is applied only if holdout AUC stays within `tol`
+    of the full list. Writes feature_pruning.csv; returns (feature_cols, summary dict).
+    """
+    # gains of the full-list holdout model (not a previous run's feature_importance.csv)
+    auc_full, full_model = _fit_holdout(df, feature_cols, make_model)
+    gain = (pd.Series(full_model.feature_importances_, index=list(feature_cols))
+            if full_model is not None else None)
+    _, report = prune_features(df, feature_cols, gain=gain)
+    report["accepted"] = False
+    kept, auc_kept = list(feature_cols), auc_full
+    for stage in STAGES:
+        drop = set(report.loc[report["stage"] == stage, "feature"])
+        cand = [c for c in kept if c not in drop]
+        if not drop or not cand:
+            continue
+        auc = holdout_auc(df, cand, make_model)
+        if np.isnan(auc_full) or auc >= auc_full - tol:
+            kept, auc_kept = cand, auc
+            report.loc[report["stage"] == stage, "accepted"] = True
+
+    report.to_csv(OUTPUTS / "feature_pruning.csv", index=False)
+    print(f"Pruning: {len(feature_cols)} -> {len(kept)} features, "
+          f"holdout AUC {auc_full:.4f} -> {auc_kept:.4f}")
+    return kept, {"n_candidates": len(feature_cols), "n_kept": len(kept),
+                  "auc_full": auc_full, "auc_pruned": auc_kept,
+                  "stages": report.groupby("stage")["accepted"].first().to_dict()}
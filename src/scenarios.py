@@ -0,0 +1,254 @@
+"""
+What-if scenarios on the scored flight frame (outputs/flight_scores.csv), scored
+with the saved model - no reload, feature rebuild or retrain.
+
+A Scenario perturbs the flights matching its pandas query:
+  turn_pad_min    minutes added to planned_turn_minutes (and the scheduled
+                  ground time it is derived from)
+  dep_shift_min   departure and arrival moved by this many minutes
+  arrivals_scale  multiplies arrivals_same_hour (de-peaking an inbound bank)
+
+Only the columns fed by those inputs are recomputed, vectorized over a batch of
+scenarios x affected flights: time parts, red_eye, bank_window, is_peak_season,
+std_turn_minutes / turn_slack (typical turn at the new hour), the airport-hour /
+route roll28 rates for the new hour and date (latest earlier day when that hour
+had no flights) and arrivals_same_hour at the new hour. Rates and arrival counts
+are history, so moving one flight does not recompute them for others.
+
+arrivals_same_hour counts the frame's own arrivals at the departure station, so
+on a departures-only extract (every flight leaves ORD) it is 0 throughout and
+arrivals_scale changes nothing.
+
+A segment router (run_all --segmented) scores each flight with its segment's
+model; perturbations leave carrier and hub tier, hence the segment, unchanged.
+"""
+from dataclasses import dataclass
+import pandas as pd, numpy as np
+from . import matrix
+from .config import OUTPUTS
+from .score import BUCKET_EDGES, BUCKET_LABELS, predict, row_segments
+from .utils import bank_window
+
+BATCH_ROWS = 500_000  # rows per predict_proba call
+_DAY = 1440
+_KEY = np.int64(2 ** 32)
+_BANK = np.array([bank_window(h) for h in range(24)])  # bank_window by hour, for array gathers
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    query: str | None = None  # None = every flight
+    turn_pad_min: float = 0.0
+    dep_shift_min: int = 0
+    arrivals_scale: float = 1.0
+
+
+def grid(query: str | None = None, pads=(0,), shifts=(0,), scales=(1.0,), prefix: str = "") -> list:
+    """Cartesian product of perturbations on one flight selection."""
+    return [Scenario(f"{prefix}pad{p:+g}_shift{s:+d}_arr{a:g}", query, float(p), int(s), float(a))
+            for p in pads for s in shifts for a in scales]
+
+
+def load_frame(path=OUTPUTS / "flight_scores.csv") -> pd.DataFrame:
+    df = pd.read_csv(path, low_memory=False)
+    for c in ("scheduled_departure_datetime_local", "scheduled_arrival_datetime_local"):
+        df[c] = pd.to_datetime(df[c], errors="coerce", utc=True).dt.tz_localize(None)
+    return df
+
+
+def _bucket(fds: np.ndarray) -> np.ndarray:
+    return np.searchsorted(np.asarray(BUCKET_EDGES[1:-1]), fds, side="left")
+
+
+class _Lookup:
+    """Sorted int64 keys -> value; exact match or as-of (latest key <= query within the same group)."""
+
+    def __init__(self, group: np.ndarray, sub: np.ndarray, value: np.ndarray):
+        key = group * _KEY + sub
+        first = np.unique(key, return_index=True)[1]
+        self.key, self.group, self.value = key[first], group[first], value[first]
+
+    def exact(self, group, sub, default=np.nan):
+        key = group * _KEY + sub
+        i = np.clip(np.searchsorted(self.key, key), 0, max(len(self.key) - 1, 0))
+        return np.where(self.key[i] == key, self.value[i], default) if len(self.key) else np.full(key.shape, default)
+
+    def asof(self, group, sub):
+        i = np.searchsorted(self.key, group * _KEY + sub, side="right") - 1
+        ok = (i >= 0) & (self.group[np.maximum(i, 0)] == group)
+        return np.where(ok, self.value[np.maximum(i, 0)], np.nan) if len(self.key) else np.full(group.shape, np.nan)
+
+
+class ScenarioEngine:
+    """Holds the baseline matrix, model and lookup tables; run() scores lists of Scenarios."""
+
+    def __init__(self, df: pd.DataFrame, model, feature_cols):
+        self.df = df.reset_index(drop=True)
+        self.model = model
+        self.cols = {c: j for j, c in enumerate(feature_cols)}
+        self.X = matrix.feature_matrix(self.df, feature_cols)
+        self.segments = row_segments(model, self.df)
+        self.fds = self._predict(self.X, self.segments)
+        self.bucket = _bucket(self.fds)
+
+        d = self.df
+        self.dep_min = d["scheduled_departure_datetime_local"].to_numpy("datetime64[m]").astype(np.int64)
+        self.arr_min = d["scheduled_arrival_datetime_local"].to_numpy("datetime64[m]").astype(np.int64)
+        self.timed = d["scheduled_departure_datetime_local"].notna().to_numpy() & \
+            d["scheduled_arrival_datetime_local"].notna().to_numpy()
+        self.day = np.where(self.timed, self.dep_min // _DAY, 0)
+        self.days, self.day_id = np.unique(self.day, return_inverse=True)
+
+        n = len(d)
+        st, _ = pd.factorize(pd.concat([d["scheduled_departure_airport_code"],
+                                        d["scheduled_arrival_airport_code"]], ignore_index=True))
+        self.dep_st, self.arr_st = st[:n].astype(np.int64), st[n:].astype(np.int64)
+        self.n_st = int(st.max()) + 1 if n else 1
+        self.type_id = pd.factorize(d.get("aircraft_type", pd.Series("", index=d.index)))[0].astype(np.int64)
+        self._build_tables()
+
+    def _num(self, col) -> np.ndarray:
+        if col not in self.df.columns:
+            return np.full(len(self.df), np.nan)
+        return pd.to_numeric(self.df[col], errors="coerce").to_numpy(dtype=float)
+
+    def _build_tables(self):
+        ok = self.timed
+        dh, ah = (self.dep_min // 60) % 24, (self.arr_min // 60) % 24
+        route = self.dep_st * self.n_st + self.arr_st
+        self.std = _Lookup((self.type_id * self.n_st + self.dep_st)[ok], dh[ok], self._num("std_turn_minutes")[ok])
+        self.roll = {}
+        for cols, group in ((("dep_delay_rate_roll28", "taxi_out_delta"), self.dep_st * 24 + dh),
+                            (("arr_delay_rate_roll28",), self.arr_st * 24 + ah),
+                            (("route_delay_rate_roll28", "route_cxl_rate_roll28"), route)):
+            for c in cols:
+                if c in self.cols:
+                    self.roll[c] = (_Lookup(group[ok], self.day[ok], self._num(c)[ok]), cols[0])
+        # arrivals per (arrival station, clock hour), read at the departure station
+        arr_hour = self.arr_min // 60
+        key, cnt = np.unique(self.arr_st[ok] * _KEY + arr_hour[ok], return_counts=True)
+        self.arrivals = _Lookup(key // _KEY, key % _KEY, cnt.astype(float))
+        peak = self.df.loc[self._num("is_peak_season") == 1, "dep_month"] if "is_peak_season" in self.df else []
+        self.peak_months = np.unique(pd.to_numeric(pd.Series(peak), errors="coerce").dropna().astype(int))
+
+    def _predict(self, X: np.ndarray, segments=None) -> np.ndarray:
+        out = np.empty(len(X))
+        for s in range(0, len(X), BATCH_ROWS):
+            seg = None if segments is None else segments[s:s + BATCH_ROWS]
+            out[s:s + BATCH_ROWS] = predict(self.model, X[s:s + BATCH_ROWS], seg)
+        return (out * 100.0).clip(0, 100)
+
+    # ---------- perturbation ----------
+    def _perturb(self, rows, pad, shift, scale) -> dict:
+        """{feature: (scenarios, rows) values} for the columns the scenario inputs feed."""
+        base = lambda c: self._num(c)[rows][None, :]
+        moved = (shift != 0)[:, None]
+        out = {}
+        planned = base("planned_turn_minutes") + pad[:, None]
+        out["planned_turn_minutes"] = planned
+        if "planned_ground_time_minutes" not in self.df.columns:
+            out["scheduled_ground_time_minutes"] = base("scheduled_ground_time_minutes") + pad[:, None]
+
+        dep = self.dep_min[rows][None, :] + shift[:, None]
+        arr = self.arr_min[rows][None, :] + shift[:, None]
+        dep_hour, arr_hour = (dep // 60) % 24, (arr // 60) % 24
+        dep_day, arr_day = dep // _DAY, arr // _DAY
+        month = lambda day: day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+        derived = {
+            "dep_hour": dep_hour, "dep_dow": (dep_day + 3) % 7, "dep_month": month(dep_day),
+            "arr_hour": arr_hour, "arr_dow": (arr_day + 3) % 7, "arr_month": month(arr_day),
+            "red_eye": ((dep_hour >= 22) | (dep_hour <= 5)).astype(int),
+            "bank_window": _BANK[dep_hour],
+            "is_peak_season": np.isin(month(dep_day), self.peak_months).astype(int),
+            "std_turn_minutes": self.std.exact((self.type_id * self.n_st + self.dep_st)[rows][None, :], dep_hour),
+        }
+        groups = {"dep_delay_rate_roll28": self.dep_st[rows][None, :] * 24 + dep_hour,
+                  "arr_delay_rate_roll28": self.arr_st[rows][None, :] * 24 + arr_hour,
+                  "route_delay_rate_roll28": np.broadcast_to((self.dep_st * self.n_st + self.arr_st)[rows], dep.shape)}
+        for c, (tbl, family) in self.roll.items():
+            derived[c] = tbl.asof(groups[family], dep_day)
+        for c, v in derived.items():
+            out[c] = np.where(moved, v, base(c))
+        out["turn_slack"] = planned - out["std_turn_minutes"]
+
+        arrivals = np.where(moved, self.arrivals.exact(self.dep_st[rows][None, :], dep // 60, default=0.0),
+                            base("arrivals_same_hour"))
+        out["arrivals_same_hour"] = np.round(arrivals * scale[:, None])
+        return out
+
+    # ---------- run ----------
+    def run(self, scenarios, keep_flights: bool = True):
+        """
+        Returns (summary, daily, flights): one row per scenario; per scenario x
+        departure day (FDS change averaged over all flights of the day, bucket counts
+        before/after); per scenario x affected flight (fds_base, fds_new).
+        """
+        n_days, nb = len(self.days), len(BUCKET_LABELS)
+        base_day_bucket = np.bincount(self.day_id * nb + self.bucket, minlength=n_days * nb).reshape(n_days, nb)
+        flights_per_day = base_day_bucket.sum(axis=1)
+        summary, daily, flights = [], [], []
+
+        by_query = {}
+        for sc in scenarios:
+            by_query.setdefault(sc.query, []).append(sc)
+        for query, group in by_query.items():
+            sel = np.ones(len(self.df), dtype=bool) if query is None else \
+                self.df.eval(query).fillna(False).to_numpy(dtype=bool)
+            rows = np.flatnonzero(sel & self.timed)
+            m = len(rows)
+            per_batch = max(1, BATCH_ROWS // max(m, 1))
+            for s in range(0, len(group), per_batch):
+                chunk = group[s:s + per_batch]
+                k = len(chunk)
+                pad = np.array([c.turn_pad_min for c in chunk], dtype=float)
+                shift = np.array([c.dep_shift_min for c in chunk], dtype=np.int64)
+                scale = np.array([c.arrivals_scale for c in chunk], dtype=float)
+
+                Xc = np.tile(self.X[rows], (k, 1))
+                for c, v in self._perturb(rows, pad, shift, scale).items():
+                    if c in self.cols:
+                        Xc[:, self.cols[c]] = np.broadcast_to(v, (k, m)).ravel()
+                seg = None if self.segments is None else np.tile(self.segments[rows], k)
+                fds_new = self._predict(Xc, seg).reshape(k, m)
+                delta = fds_new - self.fds[rows][None, :]
+                b_new = _bucket(fds_new)
+
+                # bucket counts per scenario x day: baseline, minus affected rows' old buckets, plus new ones
+                sid = np.repeat(np.arange(k), m)
+                day = np.tile(self.day_id[rows], k)
+                idx = (sid * n_days + day) * nb
+                change = (np.bincount(idx + b_new.ravel(), minlength=k * n_days * nb)
+                          - np.bincount(idx + np.tile(self.bucket[rows], k), minlength=k * n_days * nb))
+                counts = base_day_bucket[None] + change.reshape(k, n_days, nb)
+                day_delta = np.bincount(sid * n_days + day, weights=delta.ravel(), minlength=k * n_days).reshape(k, n_days)
+
+                for i, sc in enumerate(chunk):
+                    summary.append({**sc.__dict__, "flights_affected": m,
+                                    "mean_fds_delta_affected": float(delta[i].mean()) if m else 0.0,
+                                    "mean_fds_delta_all": float(delta[i].sum() / max(1, len(self.df))),
+                                    **{f"{b}_base": int(base_day_bucket[:, j].sum()) for j, b in enumerate(BUCKET_LABELS)},
+                                    **{f"{b}_new": int(counts[i, :, j].sum()) for j, b in enumerate(BUCKET_LABELS)}})
+                    dd = pd.DataFrame({"scenario": sc.name,
+                                       "dep_date": self.days.astype("datetime64[D]"),
+                                       "flights": flights_per_day,
+                                       "mean_fds_delta": day_delta[i] / np.maximum(flights_per_day, 1)})
+                    for j, b in enumerate(BUCKET_LABELS):
+                        dd[f"{b}_base"] = base_day_bucket[:, j]
+                        dd[f"{b}_new"] = counts[i, :, j]
+                    daily.append(dd)
+                    if keep_flights and m:
+                        flights.append(pd.DataFrame({"scenario": sc.name, "row": rows,
+                                                     "fds_base": self.fds[rows], "fds_new": fds_new[i]}))
+
+        summary = pd.DataFrame(summary)
+        daily = pd.concat(daily, ignore_index=True) if daily else pd.DataFrame()
+        flights = pd.concat(flights, ignore_index=True) if flights else pd.DataFrame(
+            columns=["scenario", "row", "fds_base", "fds_new"])
+        if len(flights):
+            flights["fds_delta"] = flights["fds_new"] - flights["fds_base"]
+            keys = [c for c in ("company_id", "flight_number", "scheduled_departure_airport_code",
+                                "scheduled_arrival_airport_code", "scheduled_departure_datetime_local")
+                    if c in self.df.columns]
+            flights = pd.concat([flights, self.df.loc[flights["row"], keys].reset_index(drop=True)], axis=1)
+        return summary, daily, flights
@@ -1,15 +1,64 @@
 import pandas as pd, numpy as np
 from .config import OUTPUTS
+from .labeler import BUCKET_EDGES, BUCKET_LABELS
+from . import drift, matrix, cube, compiled, summaries
+
+def load_scorer(model=None, feature_cols=None):
+    """
+    (scoring model, feature_cols): the numpy-only copy that save_model compiles
+    (compiled.py, no xgboost/sklearn import) when it exists and matches
+    feature_cols, else `model` - or, given nothing, the saved joblib model.
+    Segment routers and unsaved constant models are returned unchanged.
+    """
+    if model is not None and (hasattr(model, "route") or hasattr(model, "p")):
+        return model, feature_cols
+    if compiled.COMPILED_FILE.exists():
+        cm = compiled.load_compiled()
+        if feature_cols is None or list(cm.feature_cols) == list(feature_cols):
+            return cm, list(cm.feature_cols)
+    if model is None:
+        from .train import load_model  # xgboost/sklearn only when there is no compiled copy
+        saved = load_model()
+        if saved is None:
+            raise FileNotFoundError("no saved model; run scripts/run_all.py first")
+        model, feature_cols = saved[0], saved[1]
+    return model, feature_cols
+
+def load_saved_scorer():
+    """
+    (scoring model, feature_cols) of the last training run, for the scripts that
+    score without training (scenarios, live feed): the segment router when
+    run_all --segmented saved the current model, else load_scorer().
+    """
+    import json
+    from . import segments, train  # the router holds xgboost models
+    routed = segments.load_segmented()
+    if routed is not None and json.loads(train.META_FILE.read_text(encoding="utf-8")).get("mode") == "segmented":
+        return routed
+    return load_scorer()
+
+def row_segments(model, df: pd.DataFrame):
+    """Segment label per row of df when `model` routes by segment (segments.SegmentedModel), else None."""
+    if not hasattr(model, "route"):
+        return None
+    from .segments import segment_labels
+    return segment_labels(df)
+
+def predict(model, X: np.ndarray, segments=None) -> np.ndarray:
+    """P(difficult) per row of X; `segments` (row_segments) sends each row to its segment's model."""
+    return (model.predict_proba(X, segments) if segments is not None else model.predict_proba(X))[:, 1]
 
 def score_and_write(model, feature_cols, df: pd.DataFrame):
-    X = df[feature_cols].fillna(0.0).values
-    proba = model.predict_proba(X)[:, 1]
-    fds = (proba * 100.0).clip(0, 100)
-    bucket = pd.cut(fds, bins=[-1, 33.33, 66.66, 100.0], labels=["Low","Medium","High"])
+    X = matrix.feature_matrix(df, feature_cols)
+    segments = row_segments(model, df)
+    fds = (predict(model, X, segments) * 100.0).clip(0, 100)
+    bucket = pd.cut(fds, bins=BUCKET_EDGES, labels=BUCKET_LABELS)
 
     out = df.copy()
     out["fds"] = fds
     out["fds_bucket"] = bucket.astype(str)
+    if segments is not None:
+        out["model_segment"] = model.route(segments)
 
     cols = [
         "company_id","flight_number",
@@ -21,4 +70,8 @@ def score_and_write(model, feature_cols, df: pd.DataFrame):
         if c not in out.columns: out[c] = ""
     OUTPUTS.mkdir(parents=True, exist_ok=True)
     out[cols + [c for c in out.columns if c not in cols]].to_csv(OUTPUTS / "flight_scores.csv", index=False)
+    drift.monitor(df, feature_cols)  # feature_drift.csv vs the training sketch
+    if "difficult" in out.columns:  # fds_cube.parquet: roll-ups for the insights scripts
+        cube.update_saved(out)
+    summaries.write(out)  # chart_summaries/: what scripts/charts.py draws
     return OUTPUTS / "flight_scores.csv"
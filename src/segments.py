@@ -0,0 +1,156 @@
+"""
+Segmented FDS models: one calibrated booster per carrier (Mainline / Express)
+x hub tier, plus a global model that scores every row whose segment is too
+small to get its own.
+
+Rows are stably sorted by segment, so time order holds inside each segment
+and a segment's rows are one contiguous slice of a temporary .npy that the
+pool workers memory-map (as in backtest.py). All fits run at once. The global
+fallback is one more job, fit in time order on the rows of the small segments
+plus an evenly strided sample of at most SEGMENT_FALLBACK_SAMPLE rows of the
+others (it scores small and unseen segments, and needs no more of the big ones).
+With a worker per job, wall time is the slowest fit: the largest segment, or
+the fallback's (small segments + sample) rows; with fewer workers the fits
+share them.
+
+The fallback is saved as the regular fds_model (compiled copy, drift
+reference, --incremental and scenarios use it). The routed SegmentedModel is
+saved next to it in fds_segments.joblib; scoring and --drivers route each row
+to its segment's model.
+"""
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import joblib
+import pandas as pd, numpy as np
+from . import train, matrix
+from .config import MODELS, SEGMENT_MIN_ROWS, SEGMENT_MIN_POSITIVES, SEGMENT_FALLBACK_SAMPLE
+
+SEGMENTS_FILE = MODELS / "fds_segments.joblib"
+SEGMENTS_META = MODELS / "fds_segments.json"
+GLOBAL = "global"
+_TIERS = np.array(["out-out", "out-hub", "hub-out", "hub-hub"])
+
+
+def segment_labels(df: pd.DataFrame) -> np.ndarray:
+    """'<carrier>|<hub tier>' per row; tier from dep/arr_hub_flag (add_airport_equipment_flags)."""
+    carrier = (df["carrier"].astype(str).str.strip().fillna("unknown") if "carrier" in df.columns
+               else pd.Series("unknown", index=df.index))
+    if {"dep_hub_flag", "arr_hub_flag"} <= set(df.columns):
+        dep = pd.to_numeric(df["dep_hub_flag"], errors="coerce").fillna(0).to_numpy() > 0
+        arr = pd.to_numeric(df["arr_hub_flag"], errors="coerce").fillna(0).to_numpy() > 0
+        tier = _TIERS[dep * 2 + arr]
+    else:
+        tier = np.full(len(df), "na")
+    return (carrier.to_numpy(dtype=object) + "|" + tier.astype(object)).astype(str)
+
+
+@dataclass
+class SegmentedModel:
+    """Routes rows to their segment's model; unknown / small segments go to `fallback`."""
+    fallback: object
+    models: dict = field(default_factory=dict)
+
+    def route(self, segments) -> np.ndarray:
+        """Segment whose model scores each row (GLOBAL for the fallback)."""
+        seg = np.asarray(segments, dtype=str)
+        return np.where(np.isin(seg, list(self.models)), seg, GLOBAL)
+
+    def predict_proba(self, X, segments=None):
+        if segments is None:
+            return self.fallback.predict_proba(X)
+        routed = self.route(segments)
+        p = np.empty(X.shape[0])
+        for seg in np.unique(routed):
+            rows = np.flatnonzero(routed == seg)
+            p[rows] = self.models.get(seg, self.fallback).predict_proba(X[rows])[:, 1]
+        return np.column_stack([1 - p, p])
+
+    @property
+    def base_estimator(self):
+        return self.fallback
+
+
+def _fit_slice(args):
+    x_path, y_path, lo, hi, n_jobs = args
+    X, y = np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+    return train.fit_model(np.asarray(X[lo:hi]), np.asarray(y[lo:hi]), n_jobs=n_jobs)
+
+
+def _fallback_rows(own_row: np.ndarray, sample: int) -> np.ndarray:
+    """Rows for the fallback, in time order: every row of a small segment, every k-th of the rest."""
+    step = max(1, -(-int(own_row.sum()) // max(sample, 1)))
+    own_idx = np.flatnonzero(own_row)[::step][:sample]
+    return np.union1d(np.flatnonzero(~own_row), own_idx)
+
+
+def fit_segmented(X: np.ndarray, y: np.ndarray, segments, min_rows: int = SEGMENT_MIN_ROWS,
+                  min_positives: int = SEGMENT_MIN_POSITIVES, fallback_sample: int = SEGMENT_FALLBACK_SAMPLE,
+                  n_workers: int | None = None):
+    """(SegmentedModel, per-segment summary frame). X/y in time order, `segments` one label per row."""
+    seg = np.asarray(segments, dtype=str)
+    order = np.argsort(seg, kind="stable")
+    uniq, starts = np.unique(seg[order], return_index=True)
+    bounds = np.append(starts, len(seg))
+    ys = y[order]
+    summary = pd.DataFrame({"segment": uniq, "rows": np.diff(bounds),
+                            "positives": [int(ys[a:b].sum()) for a, b in zip(bounds[:-1], bounds[1:])]})
+    own = ((summary["rows"] >= min_rows) & (summary["positives"] >= min_positives)
+           & (summary["rows"] - summary["positives"] >= min_positives)).to_numpy()
+    summary["model"] = np.where(own, summary["segment"], GLOBAL)
+    fb = _fallback_rows(np.isin(seg, uniq[own]), fallback_sample)
+
+    n_workers = min(n_workers or os.cpu_count() or 1, int(own.sum()) + 1)
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)  # xgboost threads per worker
+
+    with tempfile.TemporaryDirectory(prefix="fds_segments_") as tmp:
+        paths = {k: str(Path(tmp) / f"{k}.npy") for k in ("X", "y", "Xg", "yg")}
+        np.save(paths["X"], X[order])
+        np.save(paths["y"], ys)
+        np.save(paths["Xg"], X[fb])  # the fallback's folds need the time order across segments
+        np.save(paths["yg"], y[fb])
+        jobs = [(paths["X"], paths["y"], int(bounds[i]), int(bounds[i + 1]), n_jobs) for i in np.flatnonzero(own)]
+        jobs.append((paths["Xg"], paths["yg"], 0, len(fb), n_jobs))
+        if n_workers <= 1:
+            fitted = [_fit_slice(j) for j in jobs]
+        else:
+            with ProcessPoolExecutor(n_workers) as ex:
+                fitted = list(ex.map(_fit_slice, jobs))
+
+    model = SegmentedModel(fallback=fitted[-1], models=dict(zip(uniq[own].tolist(), fitted[:-1])))
+    return model, summary
+
+
+def train_and_save(df: pd.DataFrame, prune: bool = False, n_workers: int | None = None):
+    """
+    train.train_and_save with segment models. The fallback is saved as fds_model;
+    the SegmentedModel and the segment summary go to fds_segments.joblib/.json.
+    """
+    feature_cols = train._select_features(df)
+    y = df["difficult"].astype(int).values
+    pruning = None
+    if prune and 0 < y.sum() < len(y):
+        feature_cols, pruning = train._prune.select_pruned(df, feature_cols, train._quick_model)
+    X = matrix.feature_matrix(df, feature_cols)
+
+    model, summary = fit_segmented(X, y, segment_labels(df), n_workers=n_workers)
+    train._write_importances(model.fallback, feature_cols)
+    train.save_model(model.fallback, feature_cols, df, mode="segmented", pruning=pruning,
+                     segments=summary["model"].unique().tolist())
+    MODELS.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, SEGMENTS_FILE)
+    SEGMENTS_META.write_text(json.dumps({"feature_cols": list(feature_cols),
+                                         "segments": summary.to_dict(orient="records")}, indent=1),
+                             encoding="utf-8")
+    print(summary.to_string(index=False))
+    return model, feature_cols
+
+
+def load_segmented():
+    """Returns (SegmentedModel, feature_cols) or None if no segmented model has been saved."""
+    if not (SEGMENTS_FILE.exists() and SEGMENTS_META.exists()):
+        return None
+    return joblib.load(SEGMENTS_FILE), json.loads(SEGMENTS_META.read_text(encoding="utf-8"))["feature_cols"]
@@ -0,0 +1,99 @@
+"""
+Station-sharded execution of the per-station feature groupings.
+
+Every rollup in features.ROLLUPS (and the typical-turn median) is keyed by a
+departure station, an arrival station or a route, so flights are hash-partitioned
+on that key, each partition is computed in a worker process, and the per-group
+tables are concatenated - groups never straddle partitions, so the result equals
+the single-pass version exactly.
+
+Workers do not receive pickled frames: the slim input columns are written once
+as an Arrow IPC file sorted by shard, and each worker memory-maps it and slices
+its contiguous row range zero-copy. The one cross-station feature,
+arrivals_same_hour, is counted on arrival-station shards and exchanged to
+departures by the (station, hour) join in features._attach_rollups.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd, numpy as np
+import pyarrow as pa
+from . import features as F
+
+
+def _shard_ids(df: pd.DataFrame, key_cols, n_shards: int) -> np.ndarray:
+    h = pd.util.hash_pandas_object(df[key_cols], index=False).to_numpy()
+    return (h % np.uint64(n_shards)).astype(np.int64)
+
+
+def _write_partitioned(df: pd.DataFrame, key_cols, cols, n_shards: int, path: Path) -> list:
+    """Write df[cols] sorted by shard to an Arrow IPC file; return (offset, length) per non-empty shard."""
+    sid = _shard_ids(df, key_cols, n_shards)
+    order = np.argsort(sid, kind="stable")
+    slim = df[[c for c in cols if c in df.columns]].iloc[order]
+    table = pa.Table.from_pandas(slim, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    bounds = np.searchsorted(sid[order], np.arange(n_shards + 1))
+    return [(int(a), int(b - a)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _run_slice(args):
+    name, path, offset, length = args
+    with pa.memory_map(path, "r") as src:
+        part = pa.ipc.open_file(src).read_all().slice(offset, length).to_pandas()
+    if name == "std_turn":
+        return F._std_turn_table(part)
+    return F.ROLLUPS[name][0](part)
+
+
+def _run(jobs, n_workers: int) -> list:
+    if n_workers <= 1 or len(jobs) <= 1:
+        return [_run_slice(j) for j in jobs]
+    with ProcessPoolExecutor(n_workers) as ex:
+        return list(ex.map(_run_slice, jobs))
+
+
+def sharded_tables(df: pd.DataFrame, names, n_workers: int | None = None, n_shards: int | None = None) -> dict:
+    """
+    names: keys of features.ROLLUPS and/or "std_turn". Returns {name: table}
+    identical (up to row order) to calling each table function on the full frame.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    n_shards = n_shards or 4 * n_workers  # oversplit so one hub station does not idle the rest
+    specs = {n: F.ROLLUPS[n][1:3] for n in names if n in F.ROLLUPS}
+    if "std_turn" in names:
+        specs["std_turn"] = (["scheduled_departure_airport_code"],
+                             F.STD_TURN_KEYS + ["scheduled_departure_datetime_local", "actual_ground_time_minutes"])
+
+    with tempfile.TemporaryDirectory(prefix="fds_shards_") as tmp:
+        jobs, owner = [], []
+        for name, (key_cols, cols) in specs.items():
+            path = Path(tmp) / f"{name}.arrow"
+            for offset, length in _write_partitioned(df, key_cols, cols, n_shards, path):
+                jobs.append((name, str(path), offset, length))
+                owner.append(name)
+        results = _run(jobs, n_workers)
+
+    out = {}
+    for name in specs:
+        parts = [r for r, o in zip(results, owner) if o == name]
+        out[name] = pd.concat(parts, ignore_index=True) if parts else None
+    return {k: v for k, v in out.items() if v is not None}
+
+
+def add_airport_route_rollups(flights: pd.DataFrame, keep=None, n_workers: int | None = None) -> pd.DataFrame:
+    """Sharded equivalent of features.add_airport_route_rollups (same columns, same row order)."""
+    df = F._prep_rollups(flights)
+    return F._attach_rollups(df, sharded_tables(df, F._wanted_rollups(keep), n_workers))
+
+
+def add_turn_features(flights: pd.DataFrame, keep=None, n_workers: int | None = None) -> pd.DataFrame:
+    """Sharded equivalent of features.add_turn_features (median ground time per dep-station shard)."""
+    if not (F._wants(keep, "std_turn_minutes", "turn_slack") and "actual_ground_time_minutes" in flights.columns):
+        return F.add_turn_features(flights, keep=keep)
+    df = flights.copy()
+    df["actual_ground_time_minutes"] = pd.to_numeric(df["actual_ground_time_minutes"], errors="coerce")
+    std = sharded_tables(df, ["std_turn"], n_workers)["std_turn"]
+    return F.add_turn_features(flights, keep=keep, std_table=std)
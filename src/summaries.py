@@ -0,0 +1,120 @@
+"""
+Chart summaries: the few rows each figure in scripts/charts.py draws, computed
+from the scored frame. score_and_write writes them once per scoring run
+(SUMMARY_DIR/<figure>.csv), so the charts never re-read flight_scores.csv.
+A summary that does not apply to the frame (None) removes its file.
+
+Feature importance is not here: charts.py reads feature_importance.csv.
+"""
+import pandas as pd, numpy as np
+from .config import OUTPUTS
+from .labeler import BUCKET_LABELS
+
+SUMMARY_DIR = OUTPUTS / "chart_summaries"
+
+
+def sum_delay(df):
+    dd = pd.to_numeric(df.get("actual_departure_delay_minutes"), errors="coerce")
+    avg_delay = float(dd.mean()) if dd.notna().any() else np.nan
+    pct_late = float((dd > 0).mean() * 100.0) if dd.notna().any() else np.nan
+    return pd.DataFrame({"x": ["Avg dep delay (min)", "% flights late"], "y": [avg_delay, pct_late]})
+
+def sum_turn_hist(df):
+    if "turn_slack" not in df.columns:
+        return None
+    ts = pd.to_numeric(df["turn_slack"], errors="coerce").dropna()
+    if len(ts) == 0:
+        return None
+    counts, edges = np.histogram(ts, bins=40)
+    return pd.DataFrame({"left": edges[:-1], "width": np.diff(edges), "count": counts})
+
+def sum_turn_counts(df):
+    if "turn_slack" not in df.columns:
+        return None
+    ts = pd.to_numeric(df["turn_slack"], errors="coerce").dropna()
+    if len(ts) == 0:
+        return None
+    return pd.DataFrame({"x": ["< 0", "≤ 5"], "y": [int((ts < 0).sum()), int((ts <= 5).sum())]})
+
+def sum_transfer(df):
+    if "transfer_checked_ratio" not in df.columns:
+        return None
+    tcr = (df
+           .assign(route=df["scheduled_departure_airport_code"]+"→"+df["scheduled_arrival_airport_code"])
+           .groupby("route")["transfer_checked_ratio"].median().dropna()
+           .sort_values(ascending=False).head(10))
+    return None if tcr.empty else tcr.sort_values().rename("ratio").reset_index()
+
+def sum_load(df):
+    if not ({"pnr_rows","difficult"}.issubset(df.columns) and df["pnr_rows"].notna().any()):
+        return None
+    tmp = df[pd.to_numeric(df["pnr_rows"], errors="coerce").notna()].copy()
+    if len(tmp) == 0:
+        return None
+    tmp["load_bin"] = pd.qcut(tmp["pnr_rows"].astype(float), q=min(8, tmp["pnr_rows"].nunique()), duplicates="drop")
+    return (tmp.groupby("load_bin", observed=False).agg(mean_diff=("difficult","mean"),
+                                                        mean_load=("pnr_rows","mean"))
+               .reset_index(drop=True))
+
+def sum_ssr(df):
+    if not {"ssr_wch","pnr_rows","difficult"}.issubset(df.columns):
+        return None
+    tmp = df.copy()
+    tmp["ssr_dense"] = (pd.to_numeric(tmp["ssr_wch"], errors="coerce")
+                        / tmp["pnr_rows"].replace(0, np.nan)).fillna(0)
+    tmp = tmp[tmp["pnr_rows"].notna()]
+    if len(tmp) == 0:
+        return None
+    tmp["load_bin"] = pd.qcut(tmp["pnr_rows"].astype(float), q=min(5, tmp["pnr_rows"].nunique()), duplicates="drop")
+    return (tmp.groupby("load_bin", observed=False).agg(mean_ssr=("ssr_dense","mean"),
+                                                        mean_diff=("difficult","mean"))
+               .reset_index(drop=True))
+
+def sum_fds_hist(df):
+    if "fds" not in df.columns:
+        return None
+    counts, edges = np.histogram(pd.to_numeric(df["fds"], errors="coerce").dropna(), bins=30)
+    return pd.DataFrame({"left": edges[:-1], "width": np.diff(edges), "count": counts})
+
+def sum_buckets(df):
+    """Flights per FDS bucket, in the labeler's bucket order (zero for an empty bucket)."""
+    if "fds_bucket" not in df.columns:
+        return None
+    return (df["fds_bucket"].value_counts().reindex(BUCKET_LABELS, fill_value=0)
+            .rename_axis("fds_bucket").rename("count").reset_index())
+
+
+# figure name -> summary fn
+SUMMARIES = {
+    "eda_delay_summary.png": sum_delay,
+    "turn_slack_hist.png": sum_turn_hist,
+    "turn_slack_counts.png": sum_turn_counts,
+    "bags_route_transfer_ratio_top10.png": sum_transfer,
+    "load_vs_difficult.png": sum_load,
+    "ssr_vs_difficult_by_load.png": sum_ssr,
+    "fds_distribution.png": sum_fds_hist,
+    "fds_buckets.png": sum_buckets,
+}
+
+
+def _path(name):
+    return SUMMARY_DIR / f"{name.rsplit('.', 1)[0]}.csv"
+
+def compute(df: pd.DataFrame) -> dict:
+    """figure name -> summary frame (None when the figure does not apply to df)."""
+    return {name: fn(df) for name, fn in SUMMARIES.items()}
+
+def write(df: pd.DataFrame):
+    SUMMARY_DIR.mkdir(parents=True, exist_ok=True)
+    for name, summary in compute(df).items():
+        if summary is None:
+            _path(name).unlink(missing_ok=True)
+        else:
+            summary.to_csv(_path(name), index=False)
+    return SUMMARY_DIR
+
+def load():
+    """figure name -> saved summary (None when absent); None when scoring never wrote any."""
+    if not SUMMARY_DIR.exists():
+        return None
+    return {name: pd.read_csv(_path(name)) if _path(name).exists() else None for name in SUMMARIES}
@@ -0,0 +1,128 @@
+"""
+Delay-threshold sweep: how the FDS ranking changes when `difficult` means a
+departure delay of >= 15 / 30 / 45 / 60 minutes instead of DELAY_THRESHOLD_MIN.
+
+Labels for all thresholds come from one vectorized pass
+(labeler.difficulty_labels). The float32 matrix is built once. XGBoost's
+quantile cuts are sketched once, over the training rows, into a reference
+QuantileDMatrix. Every threshold's training matrix reuses those cuts
+(ref=), so per threshold only the label and the bin pass differ. The boosters
+train in a thread pool; XGBoost releases the GIL, so threads share X without
+copies.
+
+Each threshold gets the production booster parameters (train._make_base) fit
+on the oldest folds, plus an isotonic layer fit on the next fold, as in
+train_incremental. Every flight is then scored, so buckets and daily rankings
+compare like flight_scores.csv. The newest fold is held out from both: the
+holdout AUC is taken there, on the booster's raw margins (isotonic ties would
+flatten the ranking).
+
+Features computed from `difficult` itself (the *_delay_rate_roll28 rates and
+type_diff_rate) encode the production threshold, so they are left out of the
+shared matrix. The sweep's 45-minute model therefore differs slightly from
+the saved one.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+import pandas as pd, numpy as np
+import xgboost as xgb
+from scipy.stats import spearmanr
+from sklearn.isotonic import IsotonicRegression
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import TimeSeriesSplit
+from . import train, matrix, labeler
+from .features import LABEL_FEATURES
+from .score import BUCKET_EDGES, BUCKET_LABELS
+from .config import SWEEP_THRESHOLDS, SWEEP_TOP_K
+
+
+def _fit_threshold(X: np.ndarray, y: np.ndarray, fit_idx, cal_idx, hold_idx, ref, n_jobs: int):
+    """
+    Calibrated probabilities for every row and raw booster margins for the
+    hold_idx rows, trained against one threshold's labels.
+    """
+    yf = y[fit_idx]
+    pos = int(yf.sum())
+    if pos == 0 or pos == len(yf):
+        p = np.full(len(y), float(yf.mean()) if len(yf) else 0.5)
+        return p, p[hold_idx]
+    base = train._make_base(yf.mean(), max(1.0, (len(yf) - pos) / max(1, pos)), n_jobs=n_jobs)
+    params = {k: v for k, v in base.get_xgb_params().items() if v is not None}
+    dtrain = xgb.QuantileDMatrix(X[fit_idx], label=yf, ref=ref, nthread=n_jobs)
+    booster = xgb.train(params, dtrain, num_boost_round=base.n_estimators)
+    raw = booster.inplace_predict(X)
+    iso = IsotonicRegression(out_of_bounds="clip").fit(raw[cal_idx], y[cal_idx])
+    return iso.predict(raw), booster.inplace_predict(X[hold_idx], predict_type="margin")
+
+
+def threshold_sweep(df: pd.DataFrame, thresholds=SWEEP_THRESHOLDS, feature_cols=None, n_workers: int | None = None):
+    """
+    df: feature frame (run_all steps 1-2), in departure order. Returns the
+    (rows, thresholds) fds and labels, the feature columns used, the holdout
+    (newest fold, unseen by booster and calibrator) row ids and their
+    (holdout rows, thresholds) raw booster margins.
+    """
+    thresholds = list(thresholds)
+    feature_cols = [c for c in (feature_cols or train._select_features(df)) if c not in LABEL_FEATURES]
+    Y = labeler.difficulty_labels(df, thresholds)
+    X = matrix.feature_matrix(df, feature_cols)
+    # frame is in departure order: fit on the oldest folds, calibrate on the next, hold out the newest
+    (fit_idx, cal_idx), (_, hold_idx) = list(TimeSeriesSplit(n_splits=4).split(X))[-2:]
+    ref = xgb.QuantileDMatrix(X[fit_idx], max_bin=256)  # cuts sketched once, shared by every threshold
+
+    n_workers = min(n_workers or os.cpu_count() or 1, len(thresholds))
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+    with ThreadPoolExecutor(n_workers) as ex:
+        fits = list(ex.map(lambda j: _fit_threshold(X, Y[:, j], fit_idx, cal_idx, hold_idx, ref, n_jobs),
+                           range(len(thresholds))))
+    fds = (np.column_stack([p for p, _ in fits]) * 100.0).clip(0, 100)
+    return fds, Y, feature_cols, hold_idx, np.column_stack([m for _, m in fits])
+
+
+def _daily_top(days: np.ndarray, fds: np.ndarray, k: int) -> list:
+    """Per day, the set of row ids in the day's top k by fds (rank(method='first') order)."""
+    order = np.lexsort((np.arange(len(fds)), -fds, days))
+    d = days[order]
+    first = np.r_[True, d[1:] != d[:-1]]
+    pos = np.arange(len(d)) - np.maximum.accumulate(np.where(first, np.arange(len(d)), 0))
+    top = order[pos < k]
+    return [set(top[days[top] == day]) for day in np.unique(days)]
+
+
+def compare(df: pd.DataFrame, thresholds, fds: np.ndarray, Y: np.ndarray, hold_idx, margin: np.ndarray,
+            top_k: int = SWEEP_TOP_K):
+    """
+    (per-threshold summary, pairwise ranking agreement) frames. margin: the
+    holdout rows' raw booster margins (threshold_sweep), for holdout_auc.
+    """
+    dep = pd.to_datetime(df["scheduled_departure_datetime_local"], errors="coerce")
+    days = dep.dt.date.astype(str).to_numpy()
+    buckets = np.column_stack([np.asarray(pd.cut(fds[:, j], bins=BUCKET_EDGES, labels=BUCKET_LABELS).astype(str))
+                               for j in range(len(thresholds))])
+    rows = []
+    for j, t in enumerate(thresholds):
+        y, p = Y[:, j], fds[:, j]
+        yh, mh = y[hold_idx], margin[:, j]
+        rows.append({
+            "threshold_min": t,
+            "positives": int(y.sum()),
+            "base_rate": y.mean(),
+            "mean_fds": p.mean(),
+            **{f"{b.lower()}_count": int((buckets[:, j] == b).sum()) for b in BUCKET_LABELS},
+            "holdout_auc": roc_auc_score(yh, mh) if 0 < yh.sum() < len(yh) else np.nan,
+        })
+
+    tops = [_daily_top(days, fds[:, j], top_k) for j in range(len(thresholds))]
+    pairs = []
+    for a, b in combinations(range(len(thresholds)), 2):
+        jac = [len(x & z) / max(1, len(x | z)) for x, z in zip(tops[a], tops[b])]
+        pairs.append({
+            "threshold_a": thresholds[a],
+            "threshold_b": thresholds[b],
+            "spearman_fds": spearmanr(fds[:, a], fds[:, b]).statistic,
+            f"daily_top{top_k}_jaccard": float(np.mean(jac)),
+            "same_bucket_share": float((buckets[:, a] == buckets[:, b]).mean()),
+            "label_agreement": float((Y[:, a] == Y[:, b]).mean()),
+        })
+    return pd.DataFrame(rows), pd.DataFrame(pairs)
@@ -1,12 +1,21 @@
+import json
+import joblib
 import pandas as pd, numpy as np
 from dataclasses import dataclass
 from sklearn.model_selection import TimeSeriesSplit
 from sklearn.calibration import CalibratedClassifierCV
+from sklearn.isotonic import IsotonicRegression
 from xgboost import XGBClassifier
-from .config import OUTPUTS, RANDOM_STATE
+from . import prune as _prune, compiled, matrix
+from .drift import DriftSketch, REFERENCE_FILE, ALL as _ALL, psi as _psi
+from .config import (OUTPUTS, MODELS, RANDOM_STATE, WARM_WINDOW_DAYS, WARM_NEW_TREES,
+                     WARM_MAX_TREES, DRIFT_PSI_MAX)
 
 OUTPUTS.mkdir(parents=True, exist_ok=True)
 
+MODEL_FILE = MODELS / "fds_model.joblib"
+META_FILE = MODELS / "fds_model.json"
+
 @dataclass
 class ConstantProbModel:
     """Fallback model when labels are all one class."""
@@ -16,9 +25,21 @@ class ConstantProbModel:
         n = X.shape[0]
         return np.column_stack([1 - self.p * np.ones(n), self.p * np.ones(n)])
     @property
-    def base_estimator(self): 
+    def base_estimator(self):
         return self
 
+@dataclass
+class WarmStartModel:
+    """Booster continued from a previous model + isotonic layer refit on the newest fold."""
+    booster: XGBClassifier
+    calibrator: IsotonicRegression
+    def predict_proba(self, X):
+        p = self.calibrator.predict(self.booster.predict_proba(X)[:, 1])
+        return np.column_stack([1 - p, p])
+    @property
+    def base_estimator(self):
+        return self.booster
+
 def _select_features(df: pd.DataFrame):
     num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     drop = [
@@ -32,50 +53,190 @@ def _select_features(df: pd.DataFrame):
 
     return [c for c in num_cols if c not in drop and c not in time_cols]
 
-def train_and_save(df: pd.DataFrame):
-    feature_cols = _select_features(df)
-    X = df[feature_cols].fillna(0.0).values
-    y = df["difficult"].astype(int).values
-
-    pos = int(y.sum())
-    neg = int((y == 0).sum())
-    prior = y.mean() if len(y) else 0.5
-    if pos == 0 or neg == 0:
-        prior = float(prior if 0 < prior < 1 else 0.5)
-        const_model = ConstantProbModel(p=prior)
-        pd.DataFrame({"feature": feature_cols, "importance_gain": 0.0}).to_csv(
-            OUTPUTS / "feature_importance.csv", index=False
-        )
-        return const_model, feature_cols
-
-    spw = max(1.0, neg / max(1, pos))  # scale_pos_weight
-
-    base = XGBClassifier(
+def _make_base(prior: float, spw: float, n_estimators: int = 400, n_jobs: int = 4) -> XGBClassifier:
+    return XGBClassifier(
         objective="binary:logistic",
         eval_metric="logloss",
-        n_estimators=400,
+        n_estimators=n_estimators,
         max_depth=6,
         learning_rate=0.05,
         subsample=0.9,
         colsample_bytree=0.9,
         reg_lambda=1.0,
         random_state=RANDOM_STATE,
-        n_jobs=4,
-        base_score=float(min(max(prior, 1e-6), 1-1e-6)),  
+        n_jobs=n_jobs,
+        base_score=float(min(max(prior, 1e-6), 1-1e-6)),
         scale_pos_weight=spw,
-        tree_method="hist",          
+        tree_method="hist",
     )
 
-    tscv = TimeSeriesSplit(n_splits=4)
-    model = CalibratedClassifierCV(base, method="isotonic", cv=tscv)
-    model.fit(X, y)
+def _dep_dates(df: pd.DataFrame) -> pd.Series:
+    return pd.to_datetime(df["scheduled_departure_datetime_local"], errors="coerce").dt.tz_localize(None).dt.normalize()
+
+def _n_trees(model) -> int:
+    if isinstance(model, WarmStartModel):
+        return model.booster.get_booster().num_boosted_rounds()
+    if isinstance(model, CalibratedClassifierCV):
+        return max(c.estimator.get_booster().num_boosted_rounds() for c in model.calibrated_classifiers_)
+    return 0
+
+# ---------- persistence ----------
+def save_model(model, feature_cols, df: pd.DataFrame, mode: str = "full", new_reference: bool = True,
+               **extra):
+    MODELS.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, MODEL_FILE)
+    meta = {
+        "mode": mode,
+        "feature_cols": list(feature_cols),
+        **extra,
+        "trained_through": str(_dep_dates(df).max().date()),
+        "n_trees": _n_trees(model),
+        "matrix_version": matrix.MATRIX_VERSION,
+    }
+    META_FILE.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    if new_reference:  # full retrain: new frozen bins for drift monitoring and warm starts (drift.py)
+        DriftSketch.fit_edges(df, feature_cols).update(df).save(REFERENCE_FILE)
+    # numpy-only copy for slim scoring workers (see compiled.py)
+    compiled.save_compiled(compiled.compile_model(model, feature_cols))
+    return MODEL_FILE
+
+def load_model():
+    """Returns (model, feature_cols, meta) or None if nothing has been saved yet."""
+    if not (MODEL_FILE.exists() and META_FILE.exists()):
+        return None
+    meta = json.loads(META_FILE.read_text(encoding="utf-8"))
+    return joblib.load(MODEL_FILE), meta["feature_cols"], meta
+
+def saved_feature_cols():
+    """Feature list of the saved model (after pruning), or None."""
+    if not META_FILE.exists():
+        return None
+    return json.loads(META_FILE.read_text(encoding="utf-8"))["feature_cols"]
+
+def _gain(model) -> np.ndarray:
+    if isinstance(model, CalibratedClassifierCV):  # no base_estimator on recent sklearn: average the folds
+        return np.mean([c.estimator.feature_importances_ for c in model.calibrated_classifiers_], axis=0)
+    return model.base_estimator.feature_importances_
+
+def _write_importances(model, feature_cols):
     try:
         importances = pd.DataFrame({
             "feature": feature_cols,
-            "importance_gain": model.base_estimator.feature_importances_
+            "importance_gain": _gain(model)
         }).sort_values("importance_gain", ascending=False)
     except Exception:
         importances = pd.DataFrame({"feature": feature_cols, "importance_gain": 0.0})
 
     importances.to_csv(OUTPUTS / "feature_importance.csv", index=False)
+
+# ---------- training ----------
+def _quick_model(y: np.ndarray) -> XGBClassifier:
+    """Smaller booster used to compare feature lists on a holdout."""
+    pos = int(y.sum())
+    return _make_base(y.mean(), max(1.0, (len(y) - pos) / max(1, pos)), n_estimators=200)
+
+def fit_model(X: np.ndarray, y: np.ndarray, n_jobs: int = 4):
+    """Isotonic-calibrated booster over time-ordered folds; ConstantProbModel when y has a single class."""
+    pos = int(y.sum())
+    neg = int((y == 0).sum())
+    prior = y.mean() if len(y) else 0.5
+    if pos == 0 or neg == 0:
+        return ConstantProbModel(p=float(prior if 0 < prior < 1 else 0.5))
+
+    spw = max(1.0, neg / max(1, pos))  # scale_pos_weight
+    base = _make_base(prior, spw, n_jobs=n_jobs)
+    model = CalibratedClassifierCV(base, method="isotonic", cv=TimeSeriesSplit(n_splits=4))
+    model.fit(X, y)
+    return model
+
+def train_and_save(df: pd.DataFrame, prune: bool = False):
+    """
+    prune=True drops near-constant / duplicate / correlated / zero-gain features
+    (see prune.py) when the reduced list holds holdout AUC; the surviving list
+    is saved with the model.
+    """
+    feature_cols = _select_features(df)
+    y = df["difficult"].astype(int).values
+    pruning = None
+    if prune and 0 < y.sum() < len(y):
+        feature_cols, pruning = _prune.select_pruned(df, feature_cols, _quick_model)
+    X = matrix.feature_matrix(df, feature_cols)
+
+    model = fit_model(X, y)
+    _write_importances(model, feature_cols)  # all zero for a ConstantProbModel
+    # saved even when constant: the next --incremental run needs its drift reference
+    save_model(model, feature_cols, df, mode="full", pruning=pruning)
+    return model, feature_cols
+
+def _full_retrain_reason(prev, feature_cols, recent: pd.DataFrame, new_trees: int):
+    """Why the warm start is not safe (None when it is)."""
+    if prev is None:
+        return "no saved model"
+    model, prev_cols, meta = prev
+    if not isinstance(model, (CalibratedClassifierCV, WarmStartModel)):
+        return f"previous model is {type(model).__name__}"
+    if meta.get("matrix_version", 1) != matrix.MATRIX_VERSION:
+        return f"feature matrix version changed ({meta.get('matrix_version', 1)} -> {matrix.MATRIX_VERSION})"
+    missing = [c for c in prev_cols if c not in feature_cols]
+    if missing:
+        return f"feature schema changed (missing {missing[:5]})"
+    if meta.get("n_trees", 0) + new_trees > WARM_MAX_TREES:
+        return f"tree budget reached ({meta.get('n_trees')} trees)"
+    y = recent["difficult"].astype(int).values
+    if y.min() == y.max():
+        return "recent window has a single class"
+    if not REFERENCE_FILE.exists():
+        return "no drift reference"
+    ref = DriftSketch.load(REFERENCE_FILE)
+    if ref.feature_cols != tuple(prev_cols):
+        return "drift reference is for a different feature list"
+    rc, cc = ref.counts[_ALL], ref.empty().update(recent).counts[_ALL]
+    for j, c in enumerate(prev_cols):
+        psi = _psi(rc[j] / max(1, rc[j].sum()), cc[j] / max(1, cc[j].sum()))
+        if psi > DRIFT_PSI_MAX:
+            return f"drift in {c} (PSI={psi:.2f})"
+    return None
+
+def train_incremental(df: pd.DataFrame, window_days: int = WARM_WINDOW_DAYS, new_trees: int = WARM_NEW_TREES,
+                      prune_on_fallback: bool = False, rebuild=None):
+    """
+    Continue boosting the saved model with `new_trees` trees on the last `window_days`
+    days, holding out the newest fold to refit the isotonic layer. Falls back to
+    train_and_save when there is no usable saved model, the schema changed, the
+    recent window drifted from the training reference or the tree budget is spent.
+    `rebuild()` returns the full feature frame for that fallback when df was
+    built with only the saved (pruned) columns, so pruned features can return.
+    """
+    dates = _dep_dates(df)
+    recent = df[dates > dates.max() - pd.Timedelta(days=window_days)]
+
+    prev = load_model()
+    reason = _full_retrain_reason(prev, _select_features(df), recent, new_trees)
+    if reason is not None:
+        print(f"Full retrain: {reason}")
+        return train_and_save(rebuild() if rebuild else df, prune=prune_on_fallback)
+
+    model, feature_cols, meta = prev
+    if isinstance(model, WarmStartModel):
+        init = model.booster
+    else:  # last fold saw the longest history
+        init = model.calibrated_classifiers_[-1].estimator
+
+    X = matrix.feature_matrix(recent, feature_cols)
+    y = recent["difficult"].astype(int).values
+    fit_idx, cal_idx = list(TimeSeriesSplit(n_splits=4).split(X))[-1]
+    if y[fit_idx].min() == y[fit_idx].max():
+        print("Full retrain: boosting window has a single class")
+        return train_and_save(rebuild() if rebuild else df, prune=prune_on_fallback)
+
+    # same params (base_score, scale_pos_weight) as the booster being continued
+    booster = XGBClassifier(**{**init.get_params(), "n_estimators": new_trees})
+    booster.fit(X[fit_idx], y[fit_idx], xgb_model=init.get_booster())
+    calibrator = IsotonicRegression(out_of_bounds="clip")
+    calibrator.fit(booster.predict_proba(X[cal_idx])[:, 1], y[cal_idx])
+
+    model = WarmStartModel(booster=booster, calibrator=calibrator)
+    _write_importances(model, feature_cols)
+    # keep the full-train drift reference; it is what warm starts are judged against
+    save_model(model, feature_cols, df, mode="incremental", new_reference=False, pruning=meta.get("pruning"))
     return model, feature_cols
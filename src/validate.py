@@ -0,0 +1,314 @@
+"""
+Data-quality pass at ingest, on the Arrow tables read_tables returns (before
+the pandas conversion): counts per rule, offending rows written to
+artifacts/outputs/quarantine/<table>.csv.
+
+Rule actions:
+  drop  - the row cannot be used (no key, unparseable departure time, duplicate
+          flight key, PNR/bag row with no matching flight); removed from the table
+  null  - one field is impossible (unparseable, negative); that field is blanked
+  flag  - suspicious but possible (multi-day ground times, local-time block
+          spans); reported and quarantined, the row is kept as is
+
+Rules are Arrow compute kernels over the typed columns (load.COLUMN_TYPES), so
+a rule is a bit-packed boolean array and clean rules are only counted; numpy
+masks are built for the rules that fire. Key columns are dictionary-encoded
+once and normalized on the dictionary, not per row; the codes combine into an
+exact integer id per key tuple, so duplicate and orphan keys are
+Series.duplicated / Series.isin on one column. A file the reader had to
+fall back to strings for is parsed here: timestamps with Arrow's strptime on
+the common ISO layout, and only the rows it rejects go through pandas.
+
+The row ids each rule hit are cached per input file (cached_rules), so the
+repeat loads of unchanged files by run_all, backtest, the charts and the EDA skip
+the checks. scripts/bench_validate.py measures the pass against the CSV read.
+"""
+import hashlib
+import json
+from pathlib import Path
+import numpy as np, pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from .config import (OUTPUTS, CACHE, GROUND_MAX_MIN, BLOCK_LOCAL_MIN_MIN, BLOCK_LOCAL_MAX_MIN,
+                     BLOCK_DEV_MAX_MIN)
+
+QUARANTINE = OUTPUTS / "quarantine"
+CACHE_DIR = CACHE / "validation"
+KEY_ALIASES = {
+    "company_id": ["company_id"],
+    "flight_number": ["flight_number"],
+    "scheduled_departure_airport_code": ["scheduled_departure_airport_code", "scheduled_departure_station_code"],
+    "scheduled_arrival_airport_code": ["scheduled_arrival_airport_code", "scheduled_arrival_station_code"],
+    "scheduled_departure_datetime_local": ["scheduled_departure_datetime_local"],
+}
+TIME_COLS = ["scheduled_departure_datetime_local", "scheduled_arrival_datetime_local",
+             "actual_departure_datetime_local", "actual_arrival_datetime_local"]
+GROUND_COLS = ["scheduled_ground_time_minutes", "actual_ground_time_minutes", "minimum_turn_minutes"]
+_ISO = "%Y-%m-%dT%H:%M:%SZ"
+_MIN_US = 60_000_000  # microseconds per minute
+RULES_VERSION = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:12]  # any edit here invalidates cached hits
+
+
+def _key_cols(table: pa.Table) -> dict:
+    """canonical key -> column present in the table (raw, before features.ensure_keys)."""
+    out = {}
+    for k, names in KEY_ALIASES.items():
+        c = next((n for n in names if n in table.column_names), None)
+        if c is not None:
+            out[k] = c
+    return out
+
+
+def _blank(a) -> pa.Array:
+    """True where a value is missing (strings: also empty / whitespace only)."""
+    if not pa.types.is_string(a.type):
+        return pc.is_null(a)
+    return pc.fill_null(pc.or_(pc.equal(pc.utf8_length(a), 0), pc.utf8_is_space(a)), True)
+
+
+def _mask(m) -> np.ndarray:
+    return pc.fill_null(m, False).to_numpy(zero_copy_only=False)
+
+
+def _filter(table: pa.Table, keep: np.ndarray) -> pa.Table:
+    """table.filter, column by column (about half the time of Table.filter on a many-chunk CSV table)."""
+    keep = pa.array(keep)
+    return pa.Table.from_arrays([c.filter(keep) for c in table.columns], schema=table.schema)
+
+
+def _numeric(a):
+    """(float64, non-numeric mask or None); the reader already typed it unless the file fell back to strings."""
+    if not pa.types.is_string(a.type):
+        return pc.cast(a, pa.float64()), None
+    try:
+        x = pc.cast(pc.utf8_trim_whitespace(a), pa.float64())
+    except pa.ArrowInvalid:
+        x = pa.array(pd.to_numeric(a.to_pandas(), errors="coerce"), type=pa.float64(), from_pandas=True)
+    return x, pc.and_(pc.is_null(x), pc.invert(_blank(a)))
+
+
+def parse_times(a, blank: np.ndarray | None = None) -> np.ndarray:
+    """datetime64[ns] of a string column (NaT when missing or unparseable); Arrow fast path, pandas for the rest."""
+    fast = pc.strptime(a, format=_ISO, unit="s", error_is_null=True)
+    out = fast.to_numpy(zero_copy_only=False).astype("datetime64[ns]")
+    retry = np.isnat(out) & ~(_mask(_blank(a)) if blank is None else blank)
+    if retry.any():
+        s = a.to_pandas()
+        slow = pd.to_datetime(s[retry], errors="coerce", utc=True).dt.tz_localize(None)
+        out[retry] = slow.to_numpy(dtype="datetime64[ns]")
+    return out
+
+
+def _micros(a):
+    """(int64 microseconds since epoch, unparsed mask or None) of a time column."""
+    if pa.types.is_timestamp(a.type):
+        return pc.cast(pc.cast(a, pa.timestamp("us", tz=a.type.tz)), pa.int64()), None
+    blank = _mask(_blank(a))
+    t = parse_times(a, blank)
+    us = pa.array(t.astype("datetime64[us]").astype(np.int64), mask=np.isnat(t))
+    return us, pa.array(np.isnat(t) & ~blank)
+
+
+def _key_codes(parts: list, upper: bool):
+    """
+    [(int64 code, blank mask)] of one key column over several arrays, equal
+    codes for equal values after features.ensure_keys' normalization (strip;
+    upper-case airport codes). The column is dictionary-encoded once and
+    strip/upper and the blank test run on the dictionary only.
+    """
+    if any(pa.types.is_large_string(p.type) or pa.types.is_string_view(p.type) for p in parts):
+        parts = [p.cast(pa.string()) for p in parts]  # tables built from pandas rather than read_table
+    chunks = [c for p in parts for c in (p.chunks if isinstance(p, pa.ChunkedArray) else [p])]
+    enc = pc.dictionary_encode(pa.chunked_array(chunks, type=parts[0].type))
+    dictionary = enc.chunks[-1].dictionary if enc.num_chunks else pa.array([], type=parts[0].type)
+    remap = np.arange(len(dictionary), dtype=np.int64)
+    if pa.types.is_string(dictionary.type):
+        norm = pc.utf8_trim_whitespace(dictionary)
+        if upper:
+            norm = pc.utf8_upper(norm)
+        remap = pc.dictionary_encode(norm).indices.to_numpy(zero_copy_only=False).astype(np.int64)
+        remap[_mask(_blank(dictionary))] = -1
+    remap = np.append(remap, -1)  # null -> -1
+    idx = np.concatenate([pc.fill_null(c.indices, -1).to_numpy(zero_copy_only=False) for c in enc.chunks]
+                         or [np.array([], dtype=np.int64)]).astype(np.int64)
+    codes = remap[idx]
+    split = np.cumsum([len(p) for p in parts])[:-1]
+    return [(c, c < 0) for c in np.split(codes, split)]
+
+
+def _key_ids(tables: list, cols: list):
+    """
+    Per table, (int64 id of the normalized key tuple, blank-key mask); equal
+    tuples get equal ids across `tables`, exactly. The dense per-key codes are
+    combined in mixed radix (id * cardinality + code), re-densified with
+    pd.factorize before a key that would overflow int64: no hashing, no
+    collisions. tables: [(table, {canonical key: column})].
+    """
+    sizes = [t.num_rows for t, _ in tables]
+    ids, blank, span = np.zeros(sum(sizes), np.int64), np.zeros(sum(sizes), bool), 1
+    for k in cols:
+        parts = _key_codes([t[m[k]] for t, m in tables], k.endswith("_code"))
+        codes = np.concatenate([c for c, _ in parts]) + 1  # blank -1 -> 0
+        card = int(codes.max(initial=0)) + 1
+        if span * card >= 1 << 63:
+            ids, uniq = pd.factorize(ids)
+            span = len(uniq)
+        ids = ids * card + codes
+        span *= card
+        blank |= np.concatenate([b for _, b in parts])
+    split = np.cumsum(sizes)[:-1]
+    return list(zip(np.split(ids, split), np.split(blank, split)))
+
+
+def check_flights(table: pa.Table) -> list:
+    """[(rule, action, column or None, Arrow boolean mask or None)] for the Flight Level table."""
+    rules = []
+    keys = _key_cols(table)
+    ids, null_key = _key_ids([(table, keys)], list(keys))[0]
+    rules.append(("key_null", "drop", None, pa.array(null_key)))  # absent key columns are ensure_keys' error
+
+    times = {}
+    for c in TIME_COLS:
+        if c in table.column_names:
+            times[c], bad = _micros(table[c])
+            action = "drop" if c == "scheduled_departure_datetime_local" else "null"
+            rules.append((f"time_unparsed:{c}", action, c, bad))
+
+    for c in GROUND_COLS:
+        if c not in table.column_names:
+            continue
+        x, bad = _numeric(table[c])
+        rules.append((f"non_numeric:{c}", "null", c, bad))
+        rules.append((f"negative:{c}", "null", c, pc.less(x, 0)))
+        rules.append((f"implausible:{c}", "flag", c, pc.greater(x, GROUND_MAX_MIN)))  # overnight parks exist
+
+    sd, sa = "scheduled_departure_datetime_local", "scheduled_arrival_datetime_local"
+    ad, aa = "actual_departure_datetime_local", "actual_arrival_datetime_local"
+    if sd in times and sa in times:
+        blk = pc.subtract(times[sa], times[sd])  # local clocks: includes the time-zone difference
+        rules.append(("block_local_out_of_range", "flag", None,
+                      pc.or_(pc.less(blk, BLOCK_LOCAL_MIN_MIN * _MIN_US), pc.greater(blk, BLOCK_LOCAL_MAX_MIN * _MIN_US))))
+        if ad in times and aa in times:  # same two clocks, so the zone difference cancels
+            dev = pc.subtract(pc.subtract(times[aa], times[ad]), blk)
+            rules.append(("block_actual_vs_scheduled", "flag", None, pc.greater(pc.abs(dev), BLOCK_DEV_MAX_MIN * _MIN_US)))
+
+    if len(keys) == len(KEY_ALIASES):
+        dup = np.zeros(table.num_rows, dtype=bool)
+        dup[~null_key] = pd.Series(ids[~null_key]).duplicated().to_numpy()
+        rules.append(("duplicate_key", "drop", None, pa.array(dup)))
+    return rules
+
+
+def check_orphans(table: pa.Table, flights: pa.Table, name: str) -> list:
+    """Rows whose flight keys (those shared with the flight table, without the datetime) match no flight."""
+    mine, theirs = _key_cols(table), _key_cols(flights)
+    shared = [k for k in list(KEY_ALIASES)[:4] if k in mine and k in theirs]
+    if not shared:
+        return []
+    (known, _), (ids, null_key) = _key_ids([(flights, theirs), (table, mine)], shared)
+    orphan = ~pd.Series(ids).isin(known).to_numpy() & ~null_key
+    return [("key_null", "drop", None, pa.array(null_key)), (f"orphan_{name}", "drop", None, pa.array(orphan))]
+
+
+def _source_stamp(path: Path) -> list:
+    st = Path(path).stat()
+    return [st.st_size, st.st_mtime_ns]
+
+
+def cached_rules(table: pa.Table, check, name: str, source=None, depends=(), cache_dir: Path = CACHE_DIR):
+    """
+    (check(table), cache hit). With a `source` file, the row ids each rule hit
+    are cached per table as .npz and reused while the file (and the `depends`
+    files, e.g. the flight file for orphans), the table schema, the rule
+    thresholds and this module's source (RULES_VERSION) are unchanged, so repeat
+    loads of the same inputs skip the checks.
+    """
+    if source is None:
+        return check(table), False
+    stamp = json.dumps([RULES_VERSION, _source_stamp(source), [_source_stamp(p) for p in depends], str(table.schema),
+                        [GROUND_MAX_MIN, BLOCK_LOCAL_MIN_MIN, BLOCK_LOCAL_MAX_MIN, BLOCK_DEV_MAX_MIN]])
+    path = cache_dir / f"{name}.npz"
+    if path.exists():
+        with np.load(path) as z:
+            if str(z["stamp"]) == stamp:
+                rules = []
+                for i, (rule, action, col) in enumerate(json.loads(str(z["rules"]))):
+                    m = None
+                    if f"hits{i}" in z:
+                        m = np.zeros(table.num_rows, dtype=bool)
+                        m[z[f"hits{i}"]] = True
+                        m = pa.array(m)
+                    rules.append((rule, action, col, m))
+                return rules, True
+    rules = check(table)
+    hits = {f"hits{i}": np.flatnonzero(_mask(m)) for i, (*_, m) in enumerate(rules)
+            if m is not None and pc.any(m).as_py()}
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    np.savez(path, stamp=np.array(stamp), rules=np.array(json.dumps([r[:3] for r in rules])), **hits)
+    return rules, False
+
+
+def apply_rules(table: pa.Table, rules: list, name: str, quarantine: Path = QUARANTINE, write: bool = True):
+    """
+    Quarantine offending rows, blank 'null' fields, drop 'drop' rows. Returns
+    (clean table, summary). write=False keeps an existing quarantine file
+    (rules from the cache: the same rows it was written from).
+    """
+    n = table.num_rows
+    counts = [0 if m is None else int(pc.sum(m).as_py() or 0) for *_, m in rules]
+    summary = pd.DataFrame([(name, rule, action, k, n) for (rule, action, _, _), k in zip(rules, counts)],
+                           columns=["table", "rule", "action", "violations", "rows"])
+    fired = [(rule, action, col, _mask(m)) for (rule, action, col, m), k in zip(rules, counts) if k]
+    path = quarantine / f"{name}.csv"
+    if not fired:
+        path.unlink(missing_ok=True)
+        return table, summary
+
+    hit = np.logical_or.reduce([m for *_, m in fired])
+    drop = np.zeros(n, dtype=bool)
+    out = table
+    for rule, action, col, m in fired:
+        if action == "drop":
+            drop |= m
+        elif action == "null":
+            i = out.schema.get_field_index(col)
+            out = out.set_column(i, col, pc.if_else(pa.array(m), pa.scalar(None, out[col].type), out[col]))
+    if write or not path.exists():
+        labels = np.full(int(hit.sum()), "", dtype=object)
+        for rule, _, _, m in fired:
+            labels[m[hit]] += rule + ";"
+        quarantine.mkdir(parents=True, exist_ok=True)
+        q = _filter(table, hit)
+        q = pa.table([c.cast(pa.timestamp(c.type.unit)) if pa.types.is_timestamp(c.type) else c for c in q.columns],
+                     names=q.column_names)  # UTC wall clock; Arrow formats tz-aware times ~10x slower
+        q = q.add_column(0, "_rules", pa.array([s.rstrip(";") for s in labels], type=pa.string()))
+        pacsv.write_csv(q, path, pacsv.WriteOptions(quoting_style="needed"))
+    return (_filter(out, ~drop) if drop.any() else out), summary
+
+
+def validate_all(flights: pa.Table, *others, names=("flights", "pnr_flight", "bags"), sources=None):
+    """
+    Validate the flight table, then each other table for key nulls / orphans against
+    the cleaned flights. sources: the file each table was read from, to reuse
+    cached rule hits (cached_rules). Writes validation_summary.csv; returns the
+    cleaned tables.
+    """
+    sources = list(sources or [None] * (1 + len(others)))
+    rules, hit = cached_rules(flights, check_flights, names[0], sources[0])
+    flights, summary = apply_rules(flights, rules, names[0], write=not hit)
+    cleaned, parts = [flights], [summary]
+    for name, table, source in zip(names[1:], others, sources[1:]):
+        depends = [sources[0]] if source is not None and sources[0] is not None else []
+        rules, hit = cached_rules(table, lambda t: check_orphans(t, flights, name), name,
+                                  source if depends else None, depends)
+        table, s = apply_rules(table, rules, name, write=not hit)
+        cleaned.append(table)
+        parts.append(s)
+    summary = pd.concat(parts, ignore_index=True)
+    OUTPUTS.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(OUTPUTS / "validation_summary.csv", index=False)
+    bad = summary[summary["violations"] > 0]
+    for r in bad.itertuples():
+        print(f"Validation [{r.table}] {r.rule}: {r.violations} rows ({r.action})")
+    return tuple(cleaned)
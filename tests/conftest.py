@@ -0,0 +1,27 @@
+import sys, pathlib
+sys.path.append(str(pathlib.Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pytest
+
+from src import load
+from src.config import FLIGHT_FILE
+
+
+@pytest.fixture(scope="session")
+def flight_level():
+    """The first 3,000 rows of the Flight Level file, as load_all reads them."""
+    if not FLIGHT_FILE.exists():
+        pytest.skip(f"{FLIGHT_FILE} not found")
+    return load._read_csv(FLIGHT_FILE).iloc[:3000].reset_index(drop=True)
+
+
+@pytest.fixture(scope="session")
+def pnr_and_bags(flight_level):
+    """Stand-in PNR+Flight and Bag frames keyed on the flights (the real files are not in data/)."""
+    pnr = flight_level[["company_id", "flight_number", "scheduled_departure_station_code",
+                        "scheduled_arrival_station_code"]].copy()
+    pnr["total_pax"] = np.random.default_rng(0).integers(20, 200, len(pnr))
+    bags = pnr.copy()
+    bags["bag_count"] = 10
+    return pnr, bags
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src import compiled, train
+
+
+def _data(n=800, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 5)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    y = ((np.nan_to_num(X[:, 0]) + 0.5 * np.nan_to_num(X[:, 1]) + rng.normal(scale=0.7, size=n)) > 0.8).astype(int)
+    return X, y
+
+
+def test_compiled_scorer_matches_predict_proba():
+    X, y = _data()
+    model = train.fit_model(X, y, n_jobs=1)
+    cm = compiled.compile_model(model, [f"f{j}" for j in range(X.shape[1])])
+    np.testing.assert_allclose(cm.predict_proba(X)[:, 1], model.predict_proba(X)[:, 1], atol=1e-6)
+
+
+def test_compiled_round_trip(tmp_path):
+    X, y = _data(seed=1)
+    model = train.fit_model(X, y, n_jobs=1)
+    cm = compiled.compile_model(model, [f"f{j}" for j in range(X.shape[1])])
+    back = compiled.load_compiled(compiled.save_compiled(cm, tmp_path / "model.npz"))
+    np.testing.assert_allclose(back.predict_proba(X), cm.predict_proba(X), atol=1e-12)
+
+
+def test_constant_model_compiles():
+    X, _ = _data(50)
+    model = train.fit_model(X, np.zeros(len(X), dtype=int), n_jobs=1)
+    cm = compiled.compile_model(model, [f"f{j}" for j in range(X.shape[1])])
+    np.testing.assert_allclose(cm.predict_proba(X), model.predict_proba(X))
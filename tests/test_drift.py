@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from src.drift import DriftSketch, ALL
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "a": rng.normal(size=n),
+        "b": rng.gamma(2.0, 3.0, n),
+        "scheduled_departure_airport_code": rng.choice(["ORD", "DEN", "SFO"], n),
+        "scheduled_arrival_airport_code": rng.choice(["LAX", "BOS"], n),
+    })
+    df.loc[rng.random(n) < 0.05, "a"] = np.nan
+    return df
+
+
+def test_merge_equals_one_sketch_of_both_batches():
+    first, second = _frame(700, 0), _frame(500, 1)
+    ref = DriftSketch.fit_edges(first, ["a", "b"])
+    merged = ref.empty().update(first).merge(ref.empty().update(second))
+    whole = ref.empty().update(pd.concat([first, second], ignore_index=True))
+    assert merged.counts.keys() == whole.counts.keys()
+    for key, counts in whole.counts.items():
+        np.testing.assert_array_equal(merged.counts[key], counts)
+    assert merged.counts[ALL][0].sum() == 1200
+
+
+def test_save_load_round_trip(tmp_path):
+    df = _frame(300, 2)
+    sketch = DriftSketch.fit_edges(df, ["a", "b"]).update(df)
+    back = DriftSketch.load(sketch.save(tmp_path / "sketch.npz"))
+    assert back.feature_cols == sketch.feature_cols
+    np.testing.assert_array_equal(back.edges, sketch.edges)
+    for key, counts in sketch.counts.items():
+        np.testing.assert_array_equal(back.counts[key], counts)
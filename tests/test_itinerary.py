@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from src import itinerary
+from src.config import CONN_TIGHT_MIN
+
+
+def _flights():
+    """BOS-ORD arriving 10:00, ORD-SFO leaving 10:30 and ORD-DEN leaving 13:00, same day."""
+    return pd.DataFrame({
+        "company_id": "UA",
+        "flight_number": ["100", "200", "300"],
+        "scheduled_departure_airport_code": ["BOS", "ORD", "ORD"],
+        "scheduled_arrival_airport_code": ["ORD", "SFO", "DEN"],
+        "scheduled_departure_datetime_local": pd.to_datetime(["2025-08-01 07:30", "2025-08-01 10:30",
+                                                              "2025-08-01 13:00"]),
+        "scheduled_arrival_datetime_local": pd.to_datetime(["2025-08-01 10:00", "2025-08-01 13:00",
+                                                            "2025-08-01 15:00"]),
+    })
+
+
+def _legs(second_flight, pax=2):
+    """One PNR: BOS-ORD on 100, then ORD onwards on `second_flight`."""
+    arr = {"200": "SFO", "300": "DEN"}[second_flight]
+    return pd.DataFrame({
+        "record_locator": "ABC123",
+        "company_id": "UA",
+        "flight_number": ["100", second_flight],
+        "scheduled_departure_station_code": ["BOS", "ORD"],
+        "scheduled_arrival_station_code": ["ORD", arr],
+        "scheduled_departure_date_local": "2025-08-01",
+        "total_pax": pax,
+    })
+
+
+def test_two_leg_tight_connection():
+    assert 30 < CONN_TIGHT_MIN
+    got = itinerary.connection_counts(_flights(), _legs("200"))
+    expect = pd.DataFrame({"conn_in_pax": [0.0, 2.0, 0.0], "conn_out_pax": [2.0, 0.0, 0.0],
+                           "tight_conn_in_pax": [0.0, 2.0, 0.0], "tight_conn_out_pax": [2.0, 0.0, 0.0]})
+    pd.testing.assert_frame_equal(got, expect)
+
+
+def test_two_leg_loose_connection():
+    got = itinerary.connection_counts(_flights(), _legs("300", pax=1))
+    np.testing.assert_array_equal(got["conn_in_pax"], [0, 0, 1])
+    np.testing.assert_array_equal(got["conn_out_pax"], [1, 0, 0])
+    assert got[["tight_conn_in_pax", "tight_conn_out_pax"]].to_numpy().sum() == 0
+
+
+def test_streamed_chunks_match_one_frame():
+    legs = pd.concat([_legs("200"), _legs("300", pax=1).assign(record_locator="XYZ789")], ignore_index=True)
+    whole = itinerary.connection_counts(_flights(), legs)
+    streamed = itinerary.connection_counts(_flights(), (legs.iloc[i:i + 1] for i in range(len(legs))), n_parts=4)
+    pd.testing.assert_frame_equal(streamed, whole)
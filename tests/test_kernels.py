@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from src import kernels
+
+
+def test_rolling_median_matches_pandas():
+    rng = np.random.default_rng(0)
+    n = 5000
+    groups = rng.integers(0, 40, n)
+    values = rng.gamma(3.0, 5.0, n)
+    values[rng.random(n) < 0.1] = np.nan
+    ref = (pd.Series(values).groupby(groups)
+           .transform(lambda s: s.rolling(90, min_periods=30).median()).to_numpy())
+    got = kernels.rolling_median(values, groups, 90, 30)
+    np.testing.assert_allclose(got, ref, equal_nan=True)
+
+
+def test_rolling_median_without_groups():
+    values = np.arange(10, dtype=float)[::-1]
+    ref = pd.Series(values).rolling(4, min_periods=2).median().to_numpy()
+    np.testing.assert_allclose(kernels.rolling_median(values, window=4, min_periods=2), ref, equal_nan=True)
+
+
+def test_streaming_median_matches_rolling():
+    values = np.random.default_rng(1).normal(size=300)
+    rm = kernels.RollingMedian(20, 5)
+    streamed = np.array([rm.push(v) for v in values])
+    np.testing.assert_allclose(streamed, kernels.rolling_median(values, window=20, min_periods=5), equal_nan=True)
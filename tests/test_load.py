@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src import load, validate
+
+CSV = """company_id,flight_number,scheduled_departure_station_code,scheduled_arrival_station_code,\
+scheduled_departure_datetime_local,scheduled_arrival_datetime_local,actual_departure_datetime_local,\
+actual_arrival_datetime_local,scheduled_ground_time_minutes,actual_ground_time_minutes,total_seats
+UA,100,ORD,BOS,2025-08-01T07:30:00Z,2025-08-01T10:45:00Z,2025-08-01T07:41:00Z,2025-08-01T10:50:00Z,45,52,150
+UA,101,ORD,SFO,2025-08-01T09:00:00Z,2025-08-01T11:40:00Z,,,-5,4000,
+UA,101,ORD,SFO,2025-08-01T09:00:00Z,2025-08-01T11:40:00Z,2025-08-01T09:10:00Z,2025-08-01T12:05:00Z,60,,76
+UA,102,ord,DEN,2025-08-02T18:15:00Z,2025-08-02T19:50:00Z,2025-08-02T18:15:00Z,2025-08-02T19:48:00Z,NA,38,
+"""
+
+
+def _write(tmp_path, text, name="flights.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _hits(rules, n):
+    """{rule: boolean numpy mask}; a None mask (the check could not fire) is all False."""
+    return {rule: np.zeros(n, dtype=bool) if m is None else validate._mask(m) for rule, _, _, m in rules}
+
+
+def _all_strings(path):
+    return load.read_table(path, types={c: pa.string() for c in load.COLUMN_TYPES})
+
+
+def test_typed_read_matches_string_parse(tmp_path):
+    path = _write(tmp_path, CSV)
+    typed, text = load.read_table(path), _all_strings(path)
+    for c, t in load.COLUMN_TYPES.items():
+        if c in typed.column_names:
+            assert typed.schema.field(c).type == t
+    a, b = typed.to_pandas(), text.to_pandas()
+    for c in validate.TIME_COLS:
+        pd.testing.assert_series_equal(a[c], pd.to_datetime(b[c], utc=True).astype(a[c].dtype), check_names=False)
+    for c in ("scheduled_ground_time_minutes", "actual_ground_time_minutes", "total_seats"):
+        np.testing.assert_array_equal(a[c].to_numpy(dtype=float), pd.to_numeric(b[c]).to_numpy(dtype=float))
+    pd.testing.assert_series_equal(a["flight_number"], b["flight_number"])
+
+
+def test_rules_agree_on_typed_and_string_tables(tmp_path):
+    path = _write(tmp_path, CSV)
+    typed = validate.check_flights(load.read_table(path))
+    text = validate.check_flights(_all_strings(path))
+    assert [r[:3] for r in typed] == [r[:3] for r in text]
+    a, b = _hits(typed, 4), _hits(text, 4)
+    for rule in a:
+        np.testing.assert_array_equal(a[rule], b[rule], err_msg=rule)
+    assert np.flatnonzero(a["duplicate_key"]).tolist() == [2]
+    assert np.flatnonzero(a["negative:scheduled_ground_time_minutes"]).tolist() == [1]
+    assert np.flatnonzero(a["implausible:actual_ground_time_minutes"]).tolist() == [1]
+
+
+def test_unconvertible_cell_falls_back_to_strings(tmp_path):
+    path = _write(tmp_path, CSV.replace(",52,150", ",abc,150"), "bad.csv")
+    table = load.read_table(path)
+    assert all(pa.types.is_string(t) for t in table.schema.types)
+    rules = _hits(validate.check_flights(table), table.num_rows)
+    assert np.flatnonzero(rules["non_numeric:actual_ground_time_minutes"]).tolist() == [0]
+    clean, summary = validate.apply_rules(table, validate.check_flights(table), "bad", quarantine=tmp_path / "q")
+    assert clean["actual_ground_time_minutes"][0].as_py() is None
@@ -0,0 +1,10 @@
+import pandas as pd
+
+from src import pipeline
+
+
+def test_sharded_frame_equals_single_pass(flight_level, pnr_and_bags):
+    pnr, bags = pnr_and_bags
+    single = pipeline.build_frame(flight_level, pnr, bags)
+    sharded = pipeline.build_frame(flight_level, pnr, bags, n_workers=2)
+    pd.testing.assert_frame_equal(sharded, single)
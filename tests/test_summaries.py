@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+
+from src.labeler import BUCKET_EDGES, BUCKET_LABELS
+from src.summaries import sum_buckets
+
+
+def test_bucket_summary_counts_the_labels_scoring_writes():
+    fds = np.array([5.0, 40.0, 50.0, 90.0, 95.0, 99.0])
+    df = pd.DataFrame({"fds_bucket": pd.cut(fds, bins=BUCKET_EDGES, labels=BUCKET_LABELS).astype(str)})
+    s = sum_buckets(df)
+    assert s["fds_bucket"].tolist() == BUCKET_LABELS
+    assert s["count"].tolist() == [1, 2, 3]
+
+
+def test_bucket_summary_keeps_empty_buckets():
+    s = sum_buckets(pd.DataFrame({"fds_bucket": ["High", "High"]}))
+    assert s["count"].tolist() == [0, 0, 2]